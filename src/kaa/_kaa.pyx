@@ -6,6 +6,7 @@ cimport cython.parallel
 
 include "exceptions.pxi"
 include "log.pxi"
+include "arrays.pxi"
 include "vectors.pxi"
 include "easings.pxi"
 include "colors.pxi"
@@ -20,6 +21,11 @@ include "viewports.pxi"
 include "transitions.pxi"
 include "stencil.pxi"
 include "nodes.pxi"
+include "node_batches.pxi"
+include "node_pools.pxi"
+include "node_changes.pxi"
+include "node_data.pxi"
+include "node_freezing.pxi"
 include "fonts.pxi"
 include "custom_transitions.pxi"
 include "physics.pxi"
@@ -0,0 +1,174 @@
+cimport cython
+from libc.stdlib cimport calloc, free
+from libc.string cimport memcpy, memset
+from libc.stdint cimport (
+    int8_t, int16_t, int32_t, int64_t, uint8_t, uint16_t, uint32_t, uint64_t
+)
+from cpython.buffer cimport PyBUF_FORMAT
+
+
+# dtype name -> (buffer format, item size)
+cdef dict _ARRAY_DTYPES = {
+    'bool': (b'?', sizeof(uint8_t)),
+    'int8': (b'b', sizeof(int8_t)),
+    'int16': (b'h', sizeof(int16_t)),
+    'int32': (b'i', sizeof(int32_t)),
+    'int64': (b'q', sizeof(int64_t)),
+    'uint8': (b'B', sizeof(uint8_t)),
+    'uint16': (b'H', sizeof(uint16_t)),
+    'uint32': (b'I', sizeof(uint32_t)),
+    'uint64': (b'Q', sizeof(uint64_t)),
+    'float32': (b'f', sizeof(float)),
+    'float64': (b'd', sizeof(double)),
+}
+
+
+# Contiguous (C-ordered) block of memory with one or two dimensions,
+# exposed through the buffer protocol, so it can be wrapped without
+# copying by `numpy.asarray` or `memoryview`.
+@cython.final
+cdef class _ArrayBuffer:
+    cdef:
+        char* c_data
+        bytes c_format
+        int c_ndim
+        Py_ssize_t c_itemsize
+        Py_ssize_t c_shape[2]
+        Py_ssize_t c_strides[2]
+
+    def __init__(self):
+        raise RuntimeError(f'{self.__class__} must not be instantiated manually!')
+
+    def __dealloc__(self):
+        free(self.c_data)
+
+    @staticmethod
+    cdef _ArrayBuffer create(bytes format, Py_ssize_t itemsize,
+                             Py_ssize_t rows, Py_ssize_t columns=-1):
+        # negative number of columns makes one-dimensional buffer,
+        # zero columns make valid (but empty) rows
+        cdef _ArrayBuffer array_buffer = _ArrayBuffer.__new__(_ArrayBuffer)
+        array_buffer.c_format = format
+        array_buffer.c_itemsize = itemsize
+        array_buffer.c_shape[0] = rows
+        if columns >= 0:
+            array_buffer.c_ndim = 2
+            array_buffer.c_shape[1] = columns
+            array_buffer.c_strides[0] = itemsize * columns
+            array_buffer.c_strides[1] = itemsize
+        else:
+            array_buffer.c_ndim = 1
+            array_buffer.c_strides[0] = itemsize
+        # allocate at least one item so data pointer is always valid
+        array_buffer.c_data = <char*>calloc(
+            max(rows * max(columns, 1), 1), itemsize
+        )
+        if array_buffer.c_data == NULL:
+            raise MemoryError()
+        return array_buffer
+
+    def __getbuffer__(self, Py_buffer* buffer, int flags):
+        buffer.buf = self.c_data
+        buffer.obj = self
+        buffer.len = self.c_shape[0] * self.c_strides[0]
+        buffer.readonly = 0
+        buffer.itemsize = self.c_itemsize
+        if flags & PyBUF_FORMAT:
+            buffer.format = <char*>self.c_format
+        else:
+            buffer.format = NULL
+        buffer.ndim = self.c_ndim
+        buffer.shape = self.c_shape
+        buffer.strides = self.c_strides
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+
+    def __releasebuffer__(self, Py_buffer* buffer):
+        pass
+
+    def __len__(self):
+        return self.c_shape[0]
+
+    def __repr__(self):
+        return '<{}: {}>'.format(self.__class__.__name__, self.tolist())
+
+    @property
+    def shape(self):
+        return tuple(self.c_shape[i] for i in range(self.c_ndim))
+
+    def tolist(self):
+        return memoryview(self).tolist()
+
+    cdef _ArrayBuffer resized(self, Py_ssize_t rows):
+        # new buffer is returned, so views of this one stay valid
+        cdef:
+            _ArrayBuffer array_buffer = _ArrayBuffer.create(
+                self.c_format, self.c_itemsize, rows,
+                self.c_shape[1] if self.c_ndim == 2 else -1
+            )
+            Py_ssize_t copied_rows = min(rows, self.c_shape[0])
+        memcpy(
+            array_buffer.c_data, self.c_data, copied_rows * self.c_strides[0]
+        )
+        return array_buffer
+
+    cdef void clear_row(self, Py_ssize_t index):
+        memset(
+            self.c_data + index * self.c_strides[0], 0, self.c_strides[0]
+        )
+
+    cdef object get_item(self, Py_ssize_t index):
+        cdef char* c_item = self.c_data + index * self.c_strides[0]
+        cdef char c_format = self.c_format[0]
+        if c_format == b'd':
+            return (<double*>c_item)[0]
+        elif c_format == b'f':
+            return (<float*>c_item)[0]
+        elif c_format == b'?':
+            return (<uint8_t*>c_item)[0] != 0
+        elif c_format == b'b':
+            return (<int8_t*>c_item)[0]
+        elif c_format == b'h':
+            return (<int16_t*>c_item)[0]
+        elif c_format == b'i':
+            return (<int32_t*>c_item)[0]
+        elif c_format == b'q':
+            return (<int64_t*>c_item)[0]
+        elif c_format == b'B':
+            return (<uint8_t*>c_item)[0]
+        elif c_format == b'H':
+            return (<uint16_t*>c_item)[0]
+        elif c_format == b'I':
+            return (<uint32_t*>c_item)[0]
+        elif c_format == b'Q':
+            return (<uint64_t*>c_item)[0]
+        raise TypeError(f'Unsupported array format: {self.c_format}.')
+
+    cdef int set_item(self, Py_ssize_t index, object value) except -1:
+        cdef char* c_item = self.c_data + index * self.c_strides[0]
+        cdef char c_format = self.c_format[0]
+        if c_format == b'd':
+            (<double*>c_item)[0] = value
+        elif c_format == b'f':
+            (<float*>c_item)[0] = value
+        elif c_format == b'?':
+            (<uint8_t*>c_item)[0] = 1 if value else 0
+        elif c_format == b'b':
+            (<int8_t*>c_item)[0] = value
+        elif c_format == b'h':
+            (<int16_t*>c_item)[0] = value
+        elif c_format == b'i':
+            (<int32_t*>c_item)[0] = value
+        elif c_format == b'q':
+            (<int64_t*>c_item)[0] = value
+        elif c_format == b'B':
+            (<uint8_t*>c_item)[0] = value
+        elif c_format == b'H':
+            (<uint16_t*>c_item)[0] = value
+        elif c_format == b'I':
+            (<uint32_t*>c_item)[0] = value
+        elif c_format == b'Q':
+            (<uint64_t*>c_item)[0] = value
+        else:
+            raise TypeError(f'Unsupported array format: {self.c_format}.')
+        return 0
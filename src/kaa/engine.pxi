@@ -1,4 +1,7 @@
+import os
 import atexit
+import asyncio
+import weakref
 from enum import IntEnum
 from contextlib import contextmanager
 
@@ -28,6 +31,44 @@ cdef unique_ptr[CEngine] _c_engine_instance
 _c_engine_instance.reset(NULL)
 
 
+# Environment understood by kaacore (renderer selection) and SDL
+# (video and audio drivers), which makes the engine run without
+# window, GPU context and audio device.
+cdef dict _HEADLESS_ENVIRONMENT = {
+    'KAACORE_RENDERER': 'noop',
+    'SDL_VIDEODRIVER': 'dummy',
+    'SDL_AUDIODRIVER': 'dummy',
+}
+
+
+@contextmanager
+def _headless_environment():
+    cdef dict previous_environment = {
+        key: os.environ.get(key) for key in _HEADLESS_ENVIRONMENT
+    }
+    os.environ.update(_HEADLESS_ENVIRONMENT)
+    try:
+        yield
+    finally:
+        for key, value in previous_environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+cdef void _close_event_loop(object loop) except *:
+    # same clean up as asyncio.run does, so tasks get to run
+    # their finally blocks and async generators get finalized
+    cdef set tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+
+
 class VirtualResolutionMode(IntEnum):
     adaptive_stretch = <uint32_t>CVirtualResolutionMode.adaptive_stretch
     aggresive_stretch = <uint32_t>CVirtualResolutionMode.aggresive_stretch
@@ -39,8 +80,11 @@ cdef class _Engine:
     cdef:
          _Window _window
          _AudioManager _audio_manager
+         bint _headless
+         object _last_scene_weakref
 
     def __cinit__(self):
+        self._last_scene_weakref = None
         self._window = _Window()
         self._audio_manager = _AudioManager()
 
@@ -76,10 +120,18 @@ cdef class _Engine:
     def window(self):
         return self._window
 
+    @property
+    def headless(self):
+        return self._headless
+
     @property
     def audio(self):
         return self._audio_manager
 
+    @property
+    def event_loop(self):
+        return _engine_event_loop
+
     @property
     def total_time(self):
         return get_c_engine().total_time().count()
@@ -94,9 +146,61 @@ cdef class _Engine:
         cdef:
             CScene* c_scene = scene.c_scene.get()
             CEngine* c_engine = get_c_engine()
+        self._exit_stepped_scene(scene)
+        self._last_scene_weakref = weakref.ref(scene)
         with nogil:
             c_engine.run(c_scene)
 
+    def run_async(self, Scene scene not None, loop=None):
+        global _engine_event_loop
+        cdef bint owns_loop = loop is None
+        if _engine_event_loop is not None:
+            raise RuntimeError('Engine is already running with event loop.')
+        if owns_loop:
+            loop = asyncio.new_event_loop()
+        elif loop.is_running():
+            raise RuntimeError(
+                'Event loop is already running, it must be driven by the engine.'
+            )
+
+        _engine_event_loop = loop
+        try:
+            self.run(scene)
+        finally:
+            _engine_event_loop = None
+            if owns_loop:
+                _close_event_loop(loop)
+
+    def step(self, Scene scene=None):
+        self.step_many(1, scene)
+
+    def step_many(self, uint32_t frames, Scene scene=None):
+        if scene is None and self._last_scene_weakref is not None:
+            scene = self._last_scene_weakref()
+        if scene is None:
+            raise ValueError(
+                'No scene to step, scene must be passed explicitly.'
+            )
+        if frames == 0:
+            return
+
+        cdef CPyScene* c_scene = scene.c_scene.get()
+        c_scene.frames_limit = frames
+        try:
+            self.run(scene)
+        finally:
+            c_scene.frames_limit = 0
+            c_scene.keep_entered = False
+
+    cdef void _exit_stepped_scene(self, Scene next_scene) except *:
+        # stepped scene stays entered until other scene is run
+        cdef Scene scene
+        if self._last_scene_weakref is None:
+            return
+        scene = self._last_scene_weakref()
+        if scene is not None and scene is not next_scene:
+            _exit_c_scene(scene.c_scene.get())
+
     def quit(self):
         get_c_engine().quit()
 
@@ -114,6 +218,8 @@ cdef class _Engine:
             raise ValueError('Engine is already stopped.')
         assert _c_engine_instance != NULL
 
+        self._exit_stepped_scene(None)
+
         _c_engine_instance.reset(NULL)
 
     def __enter__(self):
@@ -126,7 +232,19 @@ cdef class _Engine:
 cdef _Engine _engine_wrapper = _Engine()
 
 
-def Engine(Vector virtual_resolution, virtual_resolution_mode=None):
+cdef CEngine* _make_c_engine(
+    CUVec2 c_virtual_resolution, object virtual_resolution_mode
+) except NULL:
+    if virtual_resolution_mode is not None:
+        return new CEngine(
+            c_virtual_resolution,
+            <CVirtualResolutionMode>(<uint32_t>int(virtual_resolution_mode))
+        )
+    return new CEngine(c_virtual_resolution)
+
+
+def Engine(Vector virtual_resolution, virtual_resolution_mode=None,
+           bint headless=False):
     if is_c_engine_initialized():
         raise ValueError('Engine is already started.')
 
@@ -134,18 +252,22 @@ def Engine(Vector virtual_resolution, virtual_resolution_mode=None):
         virtual_resolution.x, virtual_resolution.y
     )
     cdef CEngine* c_engine_ptr = NULL
-    if virtual_resolution_mode is not None:
-        c_engine_ptr = new CEngine(
-            c_virtual_resolution,
-            <CVirtualResolutionMode>(<uint32_t>int(virtual_resolution_mode))
-        )
+    if headless:
+        # renderer, window and audio backends are picked up
+        # during engine initialization, so it's safe to restore
+        # original environment right after it
+        with _headless_environment():
+            c_engine_ptr = _make_c_engine(
+                c_virtual_resolution, virtual_resolution_mode
+            )
     else:
-        c_engine_ptr = new CEngine(
-            c_virtual_resolution,
+        c_engine_ptr = _make_c_engine(
+            c_virtual_resolution, virtual_resolution_mode
         )
     assert c_engine_ptr != NULL
     global _c_engine_instance
     _c_engine_instance = unique_ptr[CEngine](c_engine_ptr)
+    _engine_wrapper._headless = headless
 
     c_emit_log_dynamic(
         CLogLevel.info, _log_category_wrapper, 'Engine initialized.'
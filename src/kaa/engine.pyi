@@ -1,19 +1,25 @@
 from __future__ import annotations
 
 import enum
+import asyncio
 from typing import (
-    type_check_only, final, Optional, Iterable, Tuple, List, Dict, TypeVar
+    type_check_only, final, Any, ContextManager, Optional, Iterable, Iterator,
+    Sequence, Tuple, List, Dict, Type, TypeVar, Union
 )
 
-from .nodes import Node
+from .nodes import Node, NodeBatch, NodeChanges
 from .colors import Color
 from .textures import Texture
 from .input import InputManager
 from .shaders import FragmentShader
-from .geometry import Vector, BoundingBox
+from .geometry import ArrayBuffer, Vector, VectorArray, BoundingBox, BoundingBoxArray
 from .materials import Uniform, BaseMaterial
 
 
+# any object supporting buffer protocol, e.g. numpy array
+ArrayLike = Any
+
+
 class VirtualResolutionMode(enum.IntEnum):
     adaptive_stretch: VirtualResolutionMode
     aggresive_stretch: VirtualResolutionMode
@@ -50,6 +56,14 @@ class EngineInstance:
     def window(self) -> Window:
         ...
 
+    @property
+    def headless(self) -> bool:
+        ...
+
+    @property
+    def event_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        ...
+
     def change_scene(self, scene: Scene) -> None:
         ...
 
@@ -65,6 +79,19 @@ class EngineInstance:
     def run(self, scene: Scene) -> None:
         ...
 
+    def run_async(
+        self, scene: Scene, loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> None:
+        ...
+
+    def step(self, scene: Optional[Scene] = None) -> None:
+        ...
+
+    def step_many(
+        self, frames: int, scene: Optional[Scene] = None,
+    ) -> None:
+        ...
+
     def stop(self) -> None:
         ...
 
@@ -79,6 +106,7 @@ def Engine(
     virtual_resolution: Vector,
     virtual_resolution_mode: Optional[VirtualResolutionMode]
     = VirtualResolutionMode.adaptive_stretch,
+    headless: bool = False,
 ) -> EngineInstance:
     ...
 
@@ -221,6 +249,40 @@ class Scene:
     def on_exit(self) -> None:
         ...
 
+    def sleep(self, seconds: float) -> asyncio.Future[None]:
+        ...
+
+    def nodes_view(self, nodes: Iterable[Node]) -> NodeBatch:
+        ...
+
+    def deferred_updates(self) -> ContextManager[None]:
+        ...
+
+    def declare_node_field(self, name: str, dtype: str) -> None:
+        ...
+
+    def get_node_field(self, name: str) -> ArrayBuffer:
+        ...
+
+    def get_node_field_mask(self) -> ArrayBuffer:
+        ...
+
+    def get_node_field_nodes(
+        self, indices: Iterable[int]
+    ) -> List[Optional[Node]]:
+        ...
+
+    def resolve(self, handle: int) -> Optional[Node]:
+        ...
+
+    def resolve_many(self, handles: Iterable[int]) -> List[Optional[Node]]:
+        ...
+
+    def consume_changes(
+        self, fields: Optional[Iterable[str]] = None
+    ) -> NodeChanges:
+        ...
+
     def update(self, dt: float) -> None:
         ...
 
@@ -374,11 +436,124 @@ class ViewportsManager:
 @type_check_only
 class SpatialIndexManager:
     def query_bounding_box(
-        self, bbox: BoundingBox, include_shapeless: bool = True
+        self, bbox: BoundingBox, include_shapeless: bool = True, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> List[Node]:
+        ...
+
+    def query_point(
+        self, point: Vector, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> List[Node]:
+        ...
+
+    def count_bounding_box(
+        self, bbox: BoundingBox, include_shapeless: bool = True, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> int:
+        ...
+
+    def any_in_bounding_box(
+        self, bbox: BoundingBox, include_shapeless: bool = True, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> bool:
+        ...
+
+    def count_point(
+        self, point: Vector, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> int:
+        ...
+
+    def query_nearest(
+        self, point: Vector, k: int, max_distance: Optional[float] = None, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> List[Node]:
+        ...
+
+    def query_radius(
+        self, point: Vector, radius: float, sort: bool = True, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
     ) -> List[Node]:
         ...
 
-    def query_point(self, point: Vector) -> List[Node]:
+    def query_segment(
+        self, a: Vector, b: Vector, first_hit_only: bool = False, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> List[Node]:
+        ...
+
+    def query_bounding_box_many(
+        self, bounding_boxes: Union[Sequence[BoundingBox], BoundingBoxArray, ArrayLike],
+        include_shapeless: bool = True, *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> SpatialQueryResults:
+        ...
+
+    def query_point_many(
+        self, points: Union[Sequence[Vector], VectorArray, ArrayLike], *,
+        node_types: Optional[Union[Type[Node], Iterable[Type[Node]]]] = None,
+        visible_only: bool = False,
+        z_index_range: Optional[Tuple[int, int]] = None,
+        viewport_mask: Optional[int] = None,
+        predicate_mask: Optional[int] = None,
+    ) -> SpatialQueryResults:
+        ...
+
+
+@type_check_only
+class SpatialQueryResults:
+    @property
+    def offsets(self) -> ArrayBuffer:
+        ...
+
+    @property
+    def handles(self) -> ArrayBuffer:
+        ...
+
+    def __getitem__(self, index: int) -> List[Node]:
+        ...
+
+    def __iter__(self) -> Iterator[List[Node]]:
+        ...
+
+    def __len__(self) -> int:
         ...
 
 
@@ -48,6 +48,9 @@ class TextNode(NodeBase):
     ) -> None:
         ...
 
+    def clone(self, deep: bool = True) -> TextNode:
+        ...
+
     def setup(
         self, *,
         position: Vector = ...,
@@ -2,8 +2,9 @@ from enum import IntEnum
 
 cimport cython
 
-from libc.stdint cimport uint32_t
+from libc.stdint cimport uint8_t, uint32_t
 from libcpp.vector cimport vector
+from cpython.buffer cimport PyObject_CheckBuffer
 
 from .kaacore.math cimport radians, degrees
 from .kaacore.vectors cimport CDVec2
@@ -121,9 +122,51 @@ cdef class Transformation:
     def rotate_degrees(double r_deg):
         return Transformation.create(CTransformation.rotate(radians(r_deg)))
 
+    @staticmethod
+    def compose_many(transformations):
+        cdef CTransformation c_transformation
+        for transformation in transformations:
+            c_transformation = \
+                c_transformation | _get_c_transformation(transformation)
+        return Transformation.create(c_transformation)
+
     def inverse(self):
         return Transformation.create(self.c_transformation.inverse())
 
+    cdef Vector _mul_vector(self, Vector vector):
+        return Vector.from_c_vector(vector.c_vector | self.c_transformation)
+
+    def apply_many(self, points not None, out=None):
+        cdef:
+            const double[:, :] points_view
+            double[:, :] out_view
+            CDVec2 c_point
+            Py_ssize_t i
+
+        if out is None and isinstance(points, VectorArray):
+            return (<VectorArray>points).transform(self)
+
+        points_view = points
+        if points_view.shape[1] != 2:
+            raise ValueError('Points array must have Nx2 shape.')
+        if out is None:
+            out = VectorArray.create(points_view.shape[0])
+        out_view = out
+        if (
+            out_view.shape[0] != points_view.shape[0]
+            or out_view.shape[1] != 2
+        ):
+            raise ValueError('Output array must have the same shape as points.')
+
+        # out might be the same buffer as points, so each point is read
+        # before writing the result
+        for i in range(points_view.shape[0]):
+            c_point = CDVec2(points_view[i, 0], points_view[i, 1])
+            c_point = c_point | self.c_transformation
+            out_view[i, 0] = c_point.x
+            out_view[i, 1] = c_point.y
+        return out
+
     def decompose(self):
         return DecomposedTransformation.create(self.c_transformation.decompose())
 
@@ -143,11 +186,91 @@ cdef class Transformation:
                 (<Vector>other).c_vector
                 | self.c_transformation
             )
+        elif isinstance(other, VectorArray):
+            return (<VectorArray>other).transform(self)
         elif isinstance(other, ShapeBase):
             return (<ShapeBase>other).transform(self)
         return NotImplemented
 
 
+# Transformation which can be modified in place, operations are
+# joined the same way as with `|` operator (applied after current one).
+@cython.final
+cdef class MutableTransformation:
+    cdef CTransformation c_transformation
+
+    def __init__(self, Transformation transformation=None):
+        if transformation is not None:
+            self.c_transformation = transformation.c_transformation
+
+    def __repr__(self):
+        return "<{}[{} {}, {} {}, {} {}]>".format(
+            self.__class__.__name__,
+            self.c_transformation.at(0, 0), self.c_transformation.at(0, 1),
+            self.c_transformation.at(1, 0), self.c_transformation.at(1, 1),
+            self.c_transformation.at(3, 0), self.c_transformation.at(3, 1),
+        )
+
+    def __eq__(self, other):
+        return self.c_transformation == _get_c_transformation(other)
+
+    def to_transformation(self):
+        return Transformation.create(self.c_transformation)
+
+    def reset(self):
+        self.c_transformation = CTransformation()
+        return self
+
+    def set_from(self, transformation not None):
+        self.c_transformation = _get_c_transformation(transformation)
+        return self
+
+    def imul(self, transformation not None):
+        self.c_transformation = \
+            self.c_transformation | _get_c_transformation(transformation)
+        return self
+
+    def __ior__(self, transformation):
+        return self.imul(transformation)
+
+    def translate_inplace(self, vector not None):
+        self.c_transformation = (
+            self.c_transformation
+            | CTransformation.translate(_get_c_vector(vector))
+        )
+        return self
+
+    def scale_inplace(self, vector not None):
+        self.c_transformation = (
+            self.c_transformation
+            | CTransformation.scale(_get_c_vector(vector))
+        )
+        return self
+
+    def rotate_inplace(self, double angle_rad):
+        self.c_transformation = \
+            self.c_transformation | CTransformation.rotate(angle_rad)
+        return self
+
+    def rotate_inplace_degrees(self, double angle_deg):
+        return self.rotate_inplace(radians(angle_deg))
+
+    def inverse_inplace(self):
+        self.c_transformation = self.c_transformation.inverse()
+        return self
+
+
+cdef CTransformation _get_c_transformation(object transformation) except *:
+    if isinstance(transformation, Transformation):
+        return (<Transformation>transformation).c_transformation
+    elif isinstance(transformation, MutableTransformation):
+        return (<MutableTransformation>transformation).c_transformation
+    raise TypeError(
+        f'Expected Transformation or MutableTransformation, '
+        f'got: {type(transformation)}.'
+    )
+
+
 @cython.freelist(DECOMPOSED_TRANSFORMATION_FREELIST_SIZE)
 cdef class DecomposedTransformation:
     cdef CDecomposedTransformation c_decomposed_transformation
@@ -190,10 +313,7 @@ cdef class DecomposedTransformation:
 
 
 def classify_polygon(points):
-    cdef vector[CDVec2] c_points
-    c_points.reserve(len(points))
-    for pt in points:
-        c_points.push_back((<Vector>pt).c_vector)
+    cdef vector[CDVec2] c_points = _c_points_from(points)
     return PolygonType(<uint32_t>c_classify_polygon(c_points))
 
 
@@ -232,11 +352,8 @@ cdef class BoundingBox:
         )
 
     @staticmethod
-    def from_points(list points):
-        cdef vector[CDVec2] c_points
-        c_points.reserve(len(points))
-        for v in points:
-            c_points.push_back((<Vector>v).c_vector)
+    def from_points(points not None):
+        cdef vector[CDVec2] c_points = _c_points_from(points)
         return BoundingBox.create(
             CBoundingBox.from_points(c_points)
         )
@@ -307,6 +424,189 @@ cdef class BoundingBox:
         )
 
 
+# Contiguous array of bounding boxes, exposed through the buffer
+# protocol as float64 Nx4 array (min_x, min_y, max_x, max_y rows).
+@cython.final
+cdef class BoundingBoxArray:
+    cdef:
+        vector[double] c_values
+        Py_ssize_t c_shape[2]
+        Py_ssize_t c_strides[2]
+
+    def __init__(self, bounding_boxes=()):
+        cdef:
+            const double[:, :] c_values_view
+            CBoundingBox c_bounding_box
+            Py_ssize_t i, j
+
+        if isinstance(bounding_boxes, BoundingBoxArray):
+            self.c_values = (<BoundingBoxArray>bounding_boxes).c_values
+        elif PyObject_CheckBuffer(bounding_boxes):
+            c_values_view = bounding_boxes
+            if c_values_view.shape[1] != 4:
+                raise ValueError(
+                    'Array passed to BoundingBoxArray must have Nx4 shape.'
+                )
+            self.c_values.reserve(c_values_view.shape[0] * 4)
+            for i in range(c_values_view.shape[0]):
+                for j in range(4):
+                    self.c_values.push_back(c_values_view[i, j])
+        else:
+            for bounding_box in bounding_boxes:
+                self._push_back(
+                    (<BoundingBox?>bounding_box).c_bounding_box
+                )
+        self._update_shape()
+
+    @staticmethod
+    def from_nodes(nodes):
+        cdef BoundingBoxArray bounding_boxes = \
+            BoundingBoxArray.__new__(BoundingBoxArray)
+        for node in nodes:
+            bounding_boxes._push_back(
+                (<NodeBase?>node).get_c_node().bounding_box()
+            )
+        bounding_boxes._update_shape()
+        return bounding_boxes
+
+    cdef void _push_back(self, const CBoundingBox& c_bounding_box):
+        self.c_values.push_back(c_bounding_box.min_x)
+        self.c_values.push_back(c_bounding_box.min_y)
+        self.c_values.push_back(c_bounding_box.max_x)
+        self.c_values.push_back(c_bounding_box.max_y)
+
+    cdef CBoundingBox _get(self, size_t index):
+        return CBoundingBox(
+            self.c_values[4 * index], self.c_values[4 * index + 1],
+            self.c_values[4 * index + 2], self.c_values[4 * index + 3]
+        )
+
+    cdef void _update_shape(self):
+        self.c_shape[0] = self.c_values.size() // 4
+        self.c_shape[1] = 4
+        self.c_strides[0] = 4 * sizeof(double)
+        self.c_strides[1] = sizeof(double)
+
+    def __getbuffer__(self, Py_buffer* buffer, int flags):
+        # array is never resized, so exported buffer stays valid
+        buffer.buf = self.c_values.data()
+        buffer.obj = self
+        buffer.len = self.c_shape[0] * self.c_strides[0]
+        buffer.readonly = 0
+        buffer.itemsize = sizeof(double)
+        if flags & PyBUF_FORMAT:
+            buffer.format = b'd'
+        else:
+            buffer.format = NULL
+        buffer.ndim = 2
+        buffer.shape = self.c_shape
+        buffer.strides = self.c_strides
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+
+    def __releasebuffer__(self, Py_buffer* buffer):
+        pass
+
+    def __len__(self):
+        return self.c_shape[0]
+
+    def __repr__(self):
+        return '<{}: {}>'.format(self.__class__.__name__, self.tolist())
+
+    def __getitem__(self, Py_ssize_t index):
+        cdef Py_ssize_t size = self.c_shape[0]
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('BoundingBoxArray index out of range.')
+        return BoundingBox.create(self._get(index))
+
+    def __iter__(self):
+        cdef size_t i
+        for i in range(self.c_shape[0]):
+            yield BoundingBox.create(self._get(i))
+
+    def tolist(self):
+        return list(self)
+
+    def intersects(self, BoundingBox bounding_box not None):
+        cdef:
+            _ArrayBuffer result = _ArrayBuffer.create(
+                b'?', sizeof(uint8_t), self.c_shape[0]
+            )
+            uint8_t* c_result = <uint8_t*>result.c_data
+            size_t i
+
+        for i in range(self.c_shape[0]):
+            c_result[i] = self._get(i).intersects(
+                bounding_box.c_bounding_box
+            )
+        return result
+
+    def contains(self, object points):
+        cdef:
+            _ArrayBuffer result = _ArrayBuffer.create(
+                b'?', sizeof(uint8_t), self.c_shape[0]
+            )
+            uint8_t* c_result = <uint8_t*>result.c_data
+            CDVec2 c_point
+            const CDVec2* c_points
+            size_t i
+
+        if isinstance(points, Vector):
+            c_point = (<Vector>points).c_vector
+            for i in range(self.c_shape[0]):
+                c_result[i] = self._get(i).contains(c_point)
+        elif isinstance(points, VectorArray):
+            if (<VectorArray>points).c_vectors.size() != <size_t>self.c_shape[0]:
+                raise ValueError(
+                    'VectorArray must have the same length as BoundingBoxArray.'
+                )
+            c_points = (<VectorArray>points).c_vectors.data()
+            for i in range(self.c_shape[0]):
+                c_result[i] = self._get(i).contains(c_points[i])
+        else:
+            raise TypeError(
+                "Expected Vector or VectorArray, got {!r}".format(points)
+            )
+        return result
+
+    def merge_all(self):
+        cdef:
+            CBoundingBox c_merged
+            vector[CDVec2] c_no_points
+            size_t i
+
+        if self.c_shape[0] == 0:
+            # same as BoundingBox.from_points([]), NaN bounding box
+            return BoundingBox.create(CBoundingBox.from_points(c_no_points))
+        c_merged = self._get(0)
+        for i in range(1, self.c_shape[0]):
+            c_merged = c_merged.merge(self._get(i))
+        return BoundingBox.create(c_merged)
+
+    def overlap_mask(self, BoundingBoxArray other=None):
+        cdef:
+            _ArrayBuffer result
+            uint8_t* c_result
+            CBoundingBox c_bounding_box
+            size_t i, j
+
+        if other is None:
+            other = self
+        # N x 0 mask if the other array is empty
+        result = _ArrayBuffer.create(
+            b'?', sizeof(uint8_t), self.c_shape[0], other.c_shape[0]
+        )
+        c_result = <uint8_t*>result.c_data
+        for i in range(self.c_shape[0]):
+            c_bounding_box = self._get(i)
+            for j in range(other.c_shape[0]):
+                c_result[i * other.c_shape[0] + j] = \
+                    c_bounding_box.intersects(other._get(j))
+        return result
+
+
 def normalize_angle(double value, angle_sign=AngleSign.mixed):
     return c_normalize_angle(value, <CAngleSign>(<uint32_t>angle_sign.value))
 
@@ -1,10 +1,12 @@
 from ._kaa import (
-    Vector, Segment, Circle, Polygon, PolygonType, classify_polygon, Alignment,
-    Transformation, BoundingBox, AngleSign, normalize_angle, normalize_angle_degrees,
+    Vector, MutableVector, VectorArray, Segment, Circle, Polygon, PolygonType, classify_polygon, Alignment,
+    Transformation, MutableTransformation, BoundingBox, BoundingBoxArray, AngleSign, normalize_angle,
+    normalize_angle_degrees,
 )
 
 
 __all__ = (
-    'Vector', 'Segment', 'Circle', 'Polygon', 'PolygonType', 'classify_polygon', 'Alignment',
-    'Transformation', 'BoundingBox', 'AngleSign', 'normalize_angle', 'normalize_angle_degrees',
+    'Vector', 'MutableVector', 'VectorArray', 'Segment', 'Circle', 'Polygon', 'PolygonType', 'classify_polygon',
+    'Alignment', 'Transformation', 'MutableTransformation', 'BoundingBox', 'BoundingBoxArray', 'AngleSign',
+    'normalize_angle', 'normalize_angle_degrees',
 )
@@ -2,10 +2,26 @@ from __future__ import annotations
 
 import enum
 from typing import (
-    final, overload, type_check_only, List, Optional, Sequence, Union,
+    final, overload, type_check_only, Any, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union,
 )
 
 
+_T = TypeVar('_T')
+
+
+@type_check_only
+class ArrayBuffer:
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        ...
+
+    def tolist(self) -> List[Any]:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+
 @final
 class Vector:
     def __init__(self, x: float, y: float) -> None:
@@ -107,6 +123,147 @@ class Vector:
         ...
 
 
+@final
+class MutableVector:
+    def __init__(self, x: float = 0., y: float = 0.) -> None:
+        ...
+
+    @property
+    def x(self) -> float:
+        ...
+
+    @x.setter
+    def x(self, value: float) -> None:
+        ...
+
+    @property
+    def y(self) -> float:
+        ...
+
+    @y.setter
+    def y(self, value: float) -> None:
+        ...
+
+    def to_vector(self) -> Vector:
+        ...
+
+    def set(self, x: float, y: float) -> MutableVector:
+        ...
+
+    def set_from(self, other: Union[Vector, MutableVector]) -> MutableVector:
+        ...
+
+    def iadd(self, other: Union[Vector, MutableVector]) -> MutableVector:
+        ...
+
+    def isub(self, other: Union[Vector, MutableVector]) -> MutableVector:
+        ...
+
+    def imul(self, value: float) -> MutableVector:
+        ...
+
+    def rotate_inplace(self, angle_rad: float) -> MutableVector:
+        ...
+
+    def rotate_inplace_degrees(self, angle_deg: float) -> MutableVector:
+        ...
+
+    def normalize_inplace(self) -> MutableVector:
+        ...
+
+    def transform_inplace(
+        self, transformation: Union[Transformation, MutableTransformation]
+    ) -> MutableVector:
+        ...
+
+    def dot(self, other: Union[Vector, MutableVector]) -> float:
+        ...
+
+    def distance(self, other: Union[Vector, MutableVector]) -> float:
+        ...
+
+    def length(self) -> float:
+        ...
+
+    def __iadd__(self, other: Union[Vector, MutableVector]) -> MutableVector:
+        ...
+
+    def __isub__(self, other: Union[Vector, MutableVector]) -> MutableVector:
+        ...
+
+    def __imul__(self, other: float) -> MutableVector:
+        ...
+
+    def __eq__(self, other) -> bool:
+        ...
+
+
+@final
+class VectorArray:
+    def __init__(self, points: Union[Sequence[Vector], VectorArray, Any] = ()) -> None:
+        ...
+
+    def add(self, other: Union[Vector, VectorArray]) -> VectorArray:
+        ...
+
+    def sub(self, other: Union[Vector, VectorArray]) -> VectorArray:
+        ...
+
+    def mul(self, value: float) -> VectorArray:
+        ...
+
+    def rotate_angle(self, angle_rad: float) -> VectorArray:
+        ...
+
+    def rotate_angle_degrees(self, angle_deg: float) -> VectorArray:
+        ...
+
+    def normalize(self) -> VectorArray:
+        ...
+
+    def length(self) -> ArrayBuffer:
+        ...
+
+    def dot(self, other: Union[Vector, VectorArray]) -> ArrayBuffer:
+        ...
+
+    def distance(self, other: Union[Vector, VectorArray]) -> ArrayBuffer:
+        ...
+
+    def transform(self, transformation: Transformation) -> VectorArray:
+        ...
+
+    def tolist(self) -> List[Vector]:
+        ...
+
+    def __add__(self, other: Union[Vector, VectorArray]) -> VectorArray:
+        ...
+
+    def __sub__(self, other: Union[Vector, VectorArray]) -> VectorArray:
+        ...
+
+    def __mul__(self, other: float) -> VectorArray:
+        ...
+
+    def __rmul__(self, other: float) -> VectorArray:
+        ...
+
+    def __or__(self, other: Transformation) -> VectorArray:
+        ...
+
+    def __getitem__(self, index: int) -> Vector:
+        ...
+
+    def __setitem__(self, index: int, value: Vector) -> None:
+        ...
+
+    def __iter__(self) -> Iterator[Vector]:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+
 @type_check_only
 class ShapeBase:
     @property
@@ -157,7 +314,7 @@ class Circle(ShapeBase):
 
 @final
 class Polygon(ShapeBase):
-    def __init__(self, points: Sequence[Vector]) -> None:
+    def __init__(self, points: Union[Sequence[Vector], VectorArray]) -> None:
         ...
 
     @staticmethod
@@ -178,7 +335,7 @@ class PolygonType(enum.IntEnum):
     not_convex: PolygonType
 
 
-def classify_polygon(points: Sequence[Vector]) -> PolygonType:
+def classify_polygon(points: Union[Sequence[Vector], VectorArray]) -> PolygonType:
     ...
 
 
@@ -218,6 +375,20 @@ class Transformation:
     def inverse(self) -> Transformation:
         ...
 
+    @staticmethod
+    def compose_many(
+        transformations: Sequence[Union[Transformation, MutableTransformation]]
+    ) -> Transformation:
+        ...
+
+    @overload
+    def apply_many(self, points: Union[VectorArray, Any]) -> VectorArray:
+        ...
+
+    @overload
+    def apply_many(self, points: Union[VectorArray, Any], out: _T) -> _T:
+        ...
+
     def __eq__(self, other) -> bool:
         ...
 
@@ -229,6 +400,10 @@ class Transformation:
     def __matmul__(self, vector: Vector) -> Vector:
         ...
 
+    @overload
+    def __matmul__(self, vector_array: VectorArray) -> VectorArray:
+        ...
+
     @overload
     def __matmul__(self, shape: ShapeBase) -> ShapeBase:
         ...
@@ -237,6 +412,51 @@ class Transformation:
         ...
 
 
+@final
+class MutableTransformation:
+    def __init__(self, transformation: Optional[Transformation] = None) -> None:
+        ...
+
+    def to_transformation(self) -> Transformation:
+        ...
+
+    def reset(self) -> MutableTransformation:
+        ...
+
+    def set_from(
+        self, transformation: Union[Transformation, MutableTransformation]
+    ) -> MutableTransformation:
+        ...
+
+    def imul(
+        self, transformation: Union[Transformation, MutableTransformation]
+    ) -> MutableTransformation:
+        ...
+
+    def translate_inplace(self, vector: Union[Vector, MutableVector]) -> MutableTransformation:
+        ...
+
+    def scale_inplace(self, vector: Union[Vector, MutableVector]) -> MutableTransformation:
+        ...
+
+    def rotate_inplace(self, angle_rad: float) -> MutableTransformation:
+        ...
+
+    def rotate_inplace_degrees(self, angle_deg: float) -> MutableTransformation:
+        ...
+
+    def inverse_inplace(self) -> MutableTransformation:
+        ...
+
+    def __ior__(
+        self, transformation: Union[Transformation, MutableTransformation]
+    ) -> MutableTransformation:
+        ...
+
+    def __eq__(self, other) -> bool:
+        ...
+
+
 @type_check_only
 class DecomposedTransformation:
     @property
@@ -266,7 +486,7 @@ class BoundingBox:
         ...
 
     @staticmethod
-    def from_points(points: Sequence[Vector]) -> BoundingBox:
+    def from_points(points: Union[Sequence[Vector], VectorArray]) -> BoundingBox:
         ...
 
     @property
@@ -324,6 +544,40 @@ class BoundingBox:
         ...
 
 
+@final
+class BoundingBoxArray:
+    def __init__(self, bounding_boxes: Union[Sequence[BoundingBox], BoundingBoxArray, Any] = ()) -> None:
+        ...
+
+    @staticmethod
+    def from_nodes(nodes: Iterable[Any]) -> BoundingBoxArray:
+        ...
+
+    def intersects(self, bounding_box: BoundingBox) -> ArrayBuffer:
+        ...
+
+    def contains(self, points: Union[Vector, VectorArray]) -> ArrayBuffer:
+        ...
+
+    def merge_all(self) -> BoundingBox:
+        ...
+
+    def overlap_mask(self, other: Optional[BoundingBoxArray] = None) -> ArrayBuffer:
+        ...
+
+    def tolist(self) -> List[BoundingBox]:
+        ...
+
+    def __getitem__(self, index: int) -> BoundingBox:
+        ...
+
+    def __iter__(self) -> Iterator[BoundingBox]:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+
 class AngleSign(enum.IntEnum):
     mixed: AngleSign
     positive: AngleSign
@@ -140,3 +140,8 @@ cdef extern from "kaacore/nodes.h" namespace "kaacore" nogil:
         CBoundingBox bounding_box() except +raise_py_error
 
     CNodeOwnerPtr c_make_node "kaacore::make_node" (CNodeType) except +raise_py_error
+
+
+# Cython can't parse pointer types used as template arguments
+# in expressions (e.g. pair[double, CNode*](...)), alias is used instead.
+ctypedef CNode* CNodeRawPtr
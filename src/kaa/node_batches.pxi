@@ -0,0 +1,439 @@
+cimport cython
+from libc.stdint cimport uint8_t, int16_t, uint32_t
+from libcpp.vector cimport vector
+from libcpp.utility cimport move as cmove
+from libcpp.unordered_set cimport unordered_set
+
+from .extra.optional cimport optional, nullopt
+from .kaacore.nodes cimport (
+    CNode, CNodePtr, CNodeOwnerPtr, CNodeType, c_make_node
+)
+from .kaacore.scenes cimport CScene
+from .kaacore.vectors cimport CDVec2, CColor
+from .kaacore.clock cimport CDuration
+from .kaacore.math cimport radians
+from .kaacore.shapes cimport CShape
+from .kaacore.sprites cimport CSprite
+from .kaacore.geometry cimport CAlignment
+from .kaacore.materials cimport CMaterial
+from .kaacore.resources cimport CResourceReference
+from .kaacore.viewports cimport min_viewport_z_index
+from .kaacore.stencil cimport CStencilMode
+from .kaacore.transitions cimport CNodeTransitionHandle
+
+
+cdef enum NodeBatchField:
+    node_batch_positions = 1 << 0
+    node_batch_rotations = 1 << 1
+    node_batch_scales = 1 << 2
+    node_batch_colors = 1 << 3
+    node_batch_all = 0b1111
+
+
+cdef dict _NODE_BATCH_FIELDS = {
+    'positions': NodeBatchField.node_batch_positions,
+    'rotations': NodeBatchField.node_batch_rotations,
+    'scales': NodeBatchField.node_batch_scales,
+    'colors': NodeBatchField.node_batch_colors,
+}
+
+
+cdef uint8_t _parse_node_batch_fields(object fields) except 0:
+    if fields is None:
+        return NodeBatchField.node_batch_all
+
+    cdef uint8_t c_fields = 0
+    for field in fields:
+        try:
+            c_fields |= _NODE_BATCH_FIELDS[field]
+        except KeyError:
+            raise ValueError(f'Unknown NodeBatch field: {field}.')
+    if not c_fields:
+        raise ValueError('At least one NodeBatch field must be selected.')
+    return c_fields
+
+
+@cython.final
+cdef class NodeBatch:
+    cdef:
+        # references turn NULL when nodes get deleted
+        vector[CNodeRef] c_nodes
+        readonly _ArrayBuffer positions
+        readonly _ArrayBuffer rotations
+        readonly _ArrayBuffer scales
+        readonly _ArrayBuffer colors
+
+    def __init__(self, nodes):
+        cdef NodeBase node
+        for node in nodes:
+            self.c_nodes.push_back(_get_c_node_ref(node.get_c_node()))
+        self._allocate_buffers()
+        self.pull()
+
+    @staticmethod
+    cdef NodeBatch create(const vector[CNode*]& c_nodes):
+        cdef:
+            NodeBatch batch = NodeBatch.__new__(NodeBatch)
+            size_t i
+
+        batch.c_nodes.reserve(c_nodes.size())
+        for i in range(c_nodes.size()):
+            batch.c_nodes.push_back(_get_c_node_ref(c_nodes[i]))
+        batch._allocate_buffers()
+        batch.pull()
+        return batch
+
+    cdef void _allocate_buffers(self) except *:
+        cdef Py_ssize_t size = self.c_nodes.size()
+        self.positions = _ArrayBuffer.create(b'd', sizeof(double), size, 2)
+        self.rotations = _ArrayBuffer.create(b'd', sizeof(double), size)
+        self.scales = _ArrayBuffer.create(b'd', sizeof(double), size, 2)
+        self.colors = _ArrayBuffer.create(b'd', sizeof(double), size, 4)
+
+    cdef inline CNode* _get_c_node(self, size_t index):
+        # NULL if the node was deleted
+        return self.c_nodes[index].get()[0]
+
+    cdef int _check_scene(self, CScene* c_scene) except -1:
+        cdef:
+            CNode* c_node
+            size_t i
+
+        for i in range(self.c_nodes.size()):
+            c_node = self._get_c_node(i)
+            if c_node != NULL and c_node.scene() != c_scene:
+                raise ValueError('Node does not belong to the scene.')
+        return 0
+
+    @property
+    def alive(self):
+        cdef:
+            _ArrayBuffer alive = _ArrayBuffer.create(
+                b'?', sizeof(uint8_t), self.c_nodes.size()
+            )
+            uint8_t* c_alive = <uint8_t*>alive.c_data
+            size_t i
+
+        for i in range(self.c_nodes.size()):
+            c_alive[i] = self._get_c_node(i) != NULL
+        return alive
+
+    def __len__(self):
+        return self.c_nodes.size()
+
+    def __getitem__(self, Py_ssize_t index):
+        cdef Py_ssize_t size = self.c_nodes.size()
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('NodeBatch index out of range.')
+        return self._get_node(index)
+
+    def __iter__(self):
+        cdef size_t i
+        for i in range(self.c_nodes.size()):
+            yield self._get_node(i)
+
+    cdef NodeBase _get_node(self, size_t index):
+        cdef CNode* c_node = self._get_c_node(index)
+        if c_node == NULL:
+            return None
+        return get_node_wrapper(CNodePtr(c_node))
+
+    def pull(self, fields=None):
+        cdef:
+            uint8_t c_fields = _parse_node_batch_fields(fields)
+            double* positions = <double*>self.positions.c_data
+            double* rotations = <double*>self.rotations.c_data
+            double* scales = <double*>self.scales.c_data
+            double* colors = <double*>self.colors.c_data
+            CNode* c_node
+            CDVec2 c_vector
+            CColor c_color
+            size_t i
+
+        for i in range(self.c_nodes.size()):
+            c_node = self._get_c_node(i)
+            if c_node == NULL:
+                continue
+            _apply_c_node_pending_update(c_node)
+            if c_fields & NodeBatchField.node_batch_positions:
+                c_vector = c_node.position()
+                positions[2 * i] = c_vector.x
+                positions[2 * i + 1] = c_vector.y
+            if c_fields & NodeBatchField.node_batch_rotations:
+                rotations[i] = c_node.rotation()
+            if c_fields & NodeBatchField.node_batch_scales:
+                c_vector = c_node.scale()
+                scales[2 * i] = c_vector.x
+                scales[2 * i + 1] = c_vector.y
+            if c_fields & NodeBatchField.node_batch_colors:
+                c_color = c_node.color()
+                colors[4 * i] = c_color.r
+                colors[4 * i + 1] = c_color.g
+                colors[4 * i + 2] = c_color.b
+                colors[4 * i + 3] = c_color.a
+
+    def push(self, fields=None):
+        cdef:
+            uint8_t c_fields = _parse_node_batch_fields(fields)
+            double* positions = <double*>self.positions.c_data
+            double* rotations = <double*>self.rotations.c_data
+            double* scales = <double*>self.scales.c_data
+            double* colors = <double*>self.colors.c_data
+            CNode* c_node
+            size_t i
+
+        for i in range(self.c_nodes.size()):
+            c_node = self._get_c_node(i)
+            if c_node == NULL:
+                continue
+            _apply_c_node_pending_update(c_node)
+            if c_fields & NodeBatchField.node_batch_positions:
+                c_node.position(CDVec2(positions[2 * i], positions[2 * i + 1]))
+            if c_fields & NodeBatchField.node_batch_rotations:
+                c_node.rotation(rotations[i])
+            if c_fields & NodeBatchField.node_batch_scales:
+                c_node.scale(CDVec2(scales[2 * i], scales[2 * i + 1]))
+            if c_fields & NodeBatchField.node_batch_colors:
+                c_node.color(CColor(
+                    colors[4 * i], colors[4 * i + 1],
+                    colors[4 * i + 2], colors[4 * i + 3],
+                ))
+            _mark_c_node_changed(c_node)
+
+
+cdef optional[unordered_set[int16_t]] _indices_to_c_optional_set(object indices) except *:
+    cdef unordered_set[int16_t] c_indices
+    if indices is None:
+        return optional[unordered_set[int16_t]](nullopt)
+    for index in indices:
+        c_indices.insert(<int16_t>index)
+    return optional[unordered_set[int16_t]](c_indices)
+
+
+cdef optional[unordered_set[int16_t]] _mask_to_c_optional_set(
+    object mask, int16_t c_offset
+) except *:
+    if mask is None:
+        return optional[unordered_set[int16_t]](nullopt)
+    return optional[unordered_set[int16_t]](
+        _mask_to_c_indices(mask, c_offset)
+    )
+
+
+cdef int _check_spawn_array_shape(
+    str name, Py_ssize_t rows, Py_ssize_t columns,
+    uint32_t count, Py_ssize_t expected_columns
+) except -1:
+    if rows != count or columns != expected_columns:
+        raise ValueError(
+            f'Array passed as {name} has invalid shape: '
+            f'expected ({count}, {expected_columns}), got ({rows}, {columns}).'
+        )
+    return 0
+
+
+cdef NodeBatch _spawn_children(CNode* c_parent, uint32_t count, dict options):
+    # per-instance options
+    cdef:
+        const double[:, :] positions = options.pop('positions', None)
+        const double[:] rotations = options.pop('rotations', None)
+        const double[:, :] scales = options.pop('scales', None)
+        const double[:, :] colors = options.pop('colors', None)
+        const int16_t[:] z_indices = options.pop('z_indices', None)
+        const double[:] lifetimes = options.pop('lifetimes', None)
+
+    if positions is not None:
+        _check_spawn_array_shape('positions', positions.shape[0],
+                                 positions.shape[1], count, 2)
+    if rotations is not None:
+        _check_spawn_array_shape('rotations', rotations.shape[0], 1, count, 1)
+    if scales is not None:
+        _check_spawn_array_shape('scales', scales.shape[0],
+                                 scales.shape[1], count, 2)
+    if colors is not None:
+        _check_spawn_array_shape('colors', colors.shape[0],
+                                 colors.shape[1], count, 4)
+    if z_indices is not None:
+        _check_spawn_array_shape('z_indices', z_indices.shape[0], 1, count, 1)
+    if lifetimes is not None:
+        _check_spawn_array_shape('lifetimes', lifetimes.shape[0], 1, count, 1)
+
+    # shared options, converted only once
+    cdef:
+        bint has_position = 'position' in options
+        bint has_z_index = 'z_index' in options
+        bint has_rotation = 'rotation' in options
+        bint has_scale = 'scale' in options
+        bint has_visible = 'visible' in options
+        bint has_color = 'color' in options
+        bint has_sprite = 'sprite' in options
+        bint has_material = 'material' in options
+        bint has_shape = 'shape' in options
+        bint has_origin_alignment = 'origin_alignment' in options
+        bint has_lifetime = 'lifetime' in options
+        bint has_transition = 'transition' in options
+        bint has_viewports = 'viewports' in options
+        bint has_render_passes = 'render_passes' in options
+        bint has_indexable = 'indexable' in options
+        bint has_stencil_mode = 'stencil_mode' in options
+
+        CDVec2 c_position
+        optional[int16_t] c_z_index
+        double c_rotation = 0.
+        CDVec2 c_scale
+        bint c_visible = True
+        CColor c_color
+        CSprite c_sprite
+        CResourceReference[CMaterial] c_material
+        CShape c_shape
+        CAlignment c_origin_alignment
+        CDuration c_lifetime
+        CNodeTransitionHandle c_transition
+        optional[unordered_set[int16_t]] c_viewports
+        optional[unordered_set[int16_t]] c_render_passes
+        bint c_indexable = False
+        optional[CStencilMode] c_stencil_mode
+
+        NodeTransitionBase transition
+        object value
+
+    if has_position:
+        c_position = (<Vector?>options.pop('position')).c_vector
+    if has_z_index:
+        value = options.pop('z_index')
+        if value is not None:
+            c_z_index = optional[int16_t](<int16_t>value)
+    if has_rotation:
+        c_rotation = options.pop('rotation')
+    if 'rotation_degrees' in options:
+        has_rotation = True
+        c_rotation = radians(options.pop('rotation_degrees'))
+    if has_scale:
+        c_scale = (<Vector?>options.pop('scale')).c_vector
+    if has_visible:
+        c_visible = options.pop('visible')
+    if has_color:
+        c_color = (<Color?>options.pop('color')).c_color
+    if has_sprite:
+        value = options.pop('sprite')
+        if value is not None:
+            c_sprite = (<Sprite?>value).c_sprite
+    if has_material:
+        value = options.pop('material')
+        if value is not None:
+            c_material = (<Material?>value).c_material
+    if has_shape:
+        value = options.pop('shape')
+        if value is not None:
+            c_shape = (<ShapeBase?>value).c_shape_ptr[0]
+    if has_origin_alignment:
+        c_origin_alignment = <CAlignment>(
+            <uint32_t>options.pop('origin_alignment').value
+        )
+    if has_lifetime:
+        c_lifetime = CDuration(<double>options.pop('lifetime'))
+    if has_transition:
+        value = options.pop('transition')
+        if value is not None:
+            if isinstance(value, list):
+                transition = NodeTransitionsSequence(value)
+            else:
+                transition = value
+            c_transition = transition.c_handle
+    if has_viewports:
+        c_viewports = _indices_to_c_optional_set(options.pop('viewports'))
+    if 'viewports_mask' in options:
+        has_viewports = True
+        c_viewports = _mask_to_c_optional_set(
+            options.pop('viewports_mask'), min_viewport_z_index
+        )
+    if has_render_passes:
+        c_render_passes = _indices_to_c_optional_set(
+            options.pop('render_passes')
+        )
+    if 'render_passes_mask' in options:
+        has_render_passes = True
+        c_render_passes = _mask_to_c_optional_set(
+            options.pop('render_passes_mask'), 0
+        )
+    if has_indexable:
+        c_indexable = options.pop('indexable')
+    if has_stencil_mode:
+        value = options.pop('stencil_mode')
+        if value is not None:
+            c_stencil_mode = optional[CStencilMode](
+                (<StencilMode?>value).c_stencil_mode
+            )
+
+    if options:
+        raise ValueError(
+            'Passed unknown options to spawn_children: {}'.format(options.keys())
+        )
+
+    cdef:
+        vector[CNode*] c_spawned_nodes
+        CNodeOwnerPtr c_node_owner
+        CNode* c_node
+        uint32_t i
+
+    c_spawned_nodes.reserve(count)
+    for i in range(count):
+        c_node_owner = cmove(c_make_node(CNodeType.basic))
+        c_node = c_node_owner.get()
+
+        # same order as in NodeBase.setup
+        if positions is not None:
+            c_node.position(CDVec2(positions[i, 0], positions[i, 1]))
+        elif has_position:
+            c_node.position(c_position)
+        if z_indices is not None:
+            c_node.z_index(optional[int16_t](z_indices[i]))
+        elif has_z_index:
+            c_node.z_index(c_z_index)
+        if rotations is not None:
+            c_node.rotation(rotations[i])
+        elif has_rotation:
+            c_node.rotation(c_rotation)
+        if scales is not None:
+            c_node.scale(CDVec2(scales[i, 0], scales[i, 1]))
+        elif has_scale:
+            c_node.scale(c_scale)
+        if has_visible:
+            c_node.visible(c_visible)
+        if colors is not None:
+            c_node.color(
+                CColor(colors[i, 0], colors[i, 1], colors[i, 2], colors[i, 3])
+            )
+        elif has_color:
+            c_node.color(c_color)
+        if has_sprite:
+            c_node.sprite(c_sprite)
+        if has_material:
+            c_node.material(c_material)
+        if has_shape:
+            c_node.shape(c_shape)
+        if has_origin_alignment:
+            c_node.origin_alignment(c_origin_alignment)
+        if lifetimes is not None:
+            c_node.lifetime(CDuration(lifetimes[i]))
+        elif has_lifetime:
+            c_node.lifetime(c_lifetime)
+        if has_transition:
+            c_node.transition(c_transition)
+        if has_viewports:
+            c_node.viewports(c_viewports)
+        if has_render_passes:
+            c_node.render_passes(c_render_passes)
+        if has_indexable:
+            c_node.indexable(c_indexable)
+        if has_stencil_mode:
+            c_node.stencil_mode(c_stencil_mode)
+
+        # wrapper lets the engine report the node once it gets attached
+        _get_c_node_wrapper(c_node)
+        c_parent.add_child(c_node_owner)
+        c_spawned_nodes.push_back(c_node)
+
+    return NodeBatch.create(c_spawned_nodes)
@@ -0,0 +1,469 @@
+cimport cython
+from libcpp cimport bool
+from libc.stdint cimport uint8_t, uint32_t, uint64_t
+from libcpp.vector cimport vector
+from libcpp.string cimport string
+
+from .kaacore.nodes cimport CNode, CNodePtr, CNodeType
+from .kaacore.physics cimport CBodyNodeType
+from .kaacore.vectors cimport CDVec2, CColor
+from .kaacore.sprites cimport CSprite
+
+
+cdef enum NodeChangeField:
+    node_change_transform = 1 << 0
+    node_change_visible = 1 << 1
+    node_change_sprite = 1 << 2
+    node_change_color = 1 << 3
+    node_change_all = 0b1111
+
+
+cdef dict _NODE_CHANGE_FIELDS = {
+    'transform': NodeChangeField.node_change_transform,
+    'visible': NodeChangeField.node_change_visible,
+    'sprite': NodeChangeField.node_change_sprite,
+    'color': NodeChangeField.node_change_color,
+}
+
+
+cdef uint8_t _parse_node_change_fields(object fields) except 0:
+    if fields is None:
+        return NodeChangeField.node_change_all
+
+    cdef uint8_t c_fields = 0
+    for field in fields:
+        try:
+            c_fields |= _NODE_CHANGE_FIELDS[field]
+        except KeyError:
+            raise ValueError(f'Unknown node change field: {field}.')
+    if not c_fields:
+        raise ValueError('At least one node change field must be selected.')
+    return c_fields
+
+
+cdef cppclass CNodeSnapshot:
+    # handle of the node the snapshot belongs to, 0 if unused
+    uint64_t handle
+    # number of the consume call which last visited the node
+    uint32_t epoch
+    CDVec2 position
+    double rotation
+    # trailing underscore, Cython rejects 'scale' as it's used before
+    # in the module
+    CDVec2 scale_
+    bool visible
+    CSprite sprite
+    CColor color
+
+    __init__() nogil:
+        this.handle = 0
+        this.epoch = 0
+
+
+@cython.final
+cdef class NodeChanges:
+    cdef:
+        _NodeDataStorage storage
+        readonly _ArrayBuffer node_ids
+        readonly _ArrayBuffer changed_fields
+        readonly _ArrayBuffer removed_node_ids
+        readonly _ArrayBuffer positions
+        readonly _ArrayBuffer rotations
+        readonly _ArrayBuffer scales
+        readonly _ArrayBuffer visible
+        readonly _ArrayBuffer colors
+
+    TRANSFORM = NodeChangeField.node_change_transform
+    VISIBLE = NodeChangeField.node_change_visible
+    SPRITE = NodeChangeField.node_change_sprite
+    COLOR = NodeChangeField.node_change_color
+
+    def __init__(self):
+        raise RuntimeError(f'{self.__class__} must not be instantiated manually!')
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __getitem__(self, Py_ssize_t index):
+        cdef Py_ssize_t size = len(self.node_ids)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('NodeChanges index out of range.')
+        return self._get_node(index)
+
+    def __iter__(self):
+        cdef Py_ssize_t i
+        for i in range(len(self.node_ids)):
+            yield self._get_node(i)
+
+    cdef NodeBase _get_node(self, Py_ssize_t index):
+        # None if the node was deleted since the changes were consumed
+        cdef CNode* c_node = self.storage.resolve(
+            (<uint64_t*>self.node_ids.c_data)[index]
+        )
+        if c_node == NULL:
+            return None
+        return get_node_wrapper(CNodePtr(c_node))
+
+
+cdef bint _is_c_node_animated(CNode* c_node, CPyNodeWrapper* c_wrapper) except -1:
+    # node gets changed by the engine itself, not only by python code
+    cdef string c_name
+    if (
+        c_node.type() == CNodeType.body
+        and c_node.body.body_type() != CBodyNodeType.static
+    ):
+        return True
+    if c_node.transition():
+        return True
+    for c_name in c_wrapper.transition_names:
+        if c_node.transitions_manager().get(c_name):
+            return True
+    return False
+
+
+@cython.final
+cdef class _NodeChangesTracker:
+    # Finds nodes which might have changed since a journal last consumed
+    # changes. Nodes written by python code (or attached to the scene)
+    # are logged by _mark_c_node_changed, nodes changed by the engine
+    # (bodies, transitions) are polled on each call instead.
+    cdef:
+        _NodeDataStorage storage
+        # c_changed_nodes[0] has index c_changed_base
+        vector[CNodeRef] c_changed_nodes
+        uint64_t c_changed_base
+        # log was read up to this index by some journal, nodes
+        # logged past it are not logged again until it's read
+        uint64_t c_changed_read_end
+        vector[CNodeRef] c_polled_nodes
+        # fields mask -> journal of the consumer of those fields
+        dict journals
+
+    @staticmethod
+    cdef _NodeChangesTracker create(_NodeDataStorage storage):
+        cdef _NodeChangesTracker tracker = \
+            _NodeChangesTracker.__new__(_NodeChangesTracker)
+        tracker.storage = storage
+        tracker.journals = {}
+        storage.c_slots.get().track_released_handles = True
+        return tracker
+
+    cdef int mark(self, CNode* c_node) except -1:
+        cdef CPyNodeWrapper* c_wrapper = _get_c_node_wrapper(c_node)
+        if c_wrapper.changes_log_index <= self.c_changed_read_end:
+            self.c_changed_nodes.push_back(_get_c_node_ref(c_node))
+            c_wrapper.changes_log_index = \
+                self.c_changed_base + self.c_changed_nodes.size()
+        self._poll_if_animated(c_node, c_wrapper)
+        return 0
+
+    cdef int _poll_if_animated(
+        self, CNode* c_node, CPyNodeWrapper* c_wrapper
+    ) except -1:
+        if not c_wrapper.changes_polled and _is_c_node_animated(c_node, c_wrapper):
+            self.c_polled_nodes.push_back(_get_c_node_ref(c_node))
+            c_wrapper.changes_polled = True
+        return 0
+
+    cdef NodeChanges consume(self, uint8_t c_fields, CNode* c_root):
+        cdef:
+            CNodeSlots* c_slots = self.storage.c_slots.get()
+            _NodeChangesJournal journal = self.journals.get(c_fields)
+            vector[CNode*] c_candidates
+            vector[uint64_t] c_released_handles
+            size_t i
+
+        if journal is None:
+            # first call reports the whole scene, following
+            # calls only nodes logged or polled since
+            journal = _NodeChangesJournal.create(c_fields)
+            self.journals[c_fields] = journal
+            self._collect_all(c_root, c_candidates)
+        else:
+            self._collect_changed(journal, c_candidates)
+            for i in range(
+                journal.c_released_cursor - c_slots.released_handles_base,
+                c_slots.released_handles.size()
+            ):
+                c_released_handles.push_back(c_slots.released_handles[i])
+
+        journal.c_changed_cursor = \
+            self.c_changed_base + self.c_changed_nodes.size()
+        journal.c_released_cursor = \
+            c_slots.released_handles_base + c_slots.released_handles.size()
+        self.c_changed_read_end = max(
+            self.c_changed_read_end, journal.c_changed_cursor
+        )
+        changes = journal.consume(
+            self.storage, c_root, c_candidates, c_released_handles
+        )
+        self._compact()
+        return changes
+
+    cdef int _collect_all(
+        self, CNode* c_root, vector[CNode*]& c_candidates
+    ) except -1:
+        cdef:
+            vector[CNode*] c_pending
+            CNode* c_node
+            CNode* c_child
+
+        c_pending.push_back(c_root)
+        while not c_pending.empty():
+            c_node = c_pending.back()
+            c_pending.pop_back()
+            for c_child in c_node.children():
+                c_pending.push_back(c_child)
+            self._poll_if_animated(c_node, _get_c_node_wrapper(c_node))
+            _apply_c_node_pending_update(c_node)
+            c_candidates.push_back(c_node)
+        return 0
+
+    cdef int _collect_changed(
+        self, _NodeChangesJournal journal, vector[CNode*]& c_candidates
+    ) except -1:
+        cdef:
+            size_t i
+            size_t kept = 0
+            size_t changed_size = self.c_changed_nodes.size()
+            CNodeRef c_node_ref
+            CNode* c_node
+            CPyNodeWrapper* c_wrapper
+
+        for i in range(
+            journal.c_changed_cursor - self.c_changed_base, changed_size
+        ):
+            c_node = self.c_changed_nodes[i].get()[0]
+            # deleted nodes are reported via released handles
+            if c_node != NULL:
+                _apply_c_node_pending_update(c_node)
+                c_candidates.push_back(c_node)
+
+        for i in range(self.c_polled_nodes.size()):
+            c_node_ref = self.c_polled_nodes[i]
+            c_node = c_node_ref.get()[0]
+            if c_node == NULL:
+                continue
+            _apply_c_node_pending_update(c_node)
+            c_candidates.push_back(c_node)
+            c_wrapper = <CPyNodeWrapper*>c_node.wrapper_ptr()
+            if _is_c_node_animated(c_node, c_wrapper):
+                self.c_polled_nodes[kept] = c_node_ref
+                kept += 1
+            else:
+                # other journals have to check the final state as well
+                c_wrapper.changes_polled = False
+                self.mark(c_node)
+        self.c_polled_nodes.resize(kept)
+        return 0
+
+    cdef void _compact(self) except *:
+        # drops log entries read by all journals
+        cdef:
+            CNodeSlots* c_slots = self.storage.c_slots.get()
+            uint64_t c_changed_min = \
+                self.c_changed_base + self.c_changed_nodes.size()
+            uint64_t c_released_min = \
+                c_slots.released_handles_base + c_slots.released_handles.size()
+            _NodeChangesJournal journal
+
+        for journal in self.journals.values():
+            c_changed_min = min(c_changed_min, journal.c_changed_cursor)
+            c_released_min = min(c_released_min, journal.c_released_cursor)
+
+        self.c_changed_nodes.erase(
+            self.c_changed_nodes.begin(),
+            self.c_changed_nodes.begin() + (c_changed_min - self.c_changed_base)
+        )
+        self.c_changed_base = c_changed_min
+        c_slots.released_handles.erase(
+            c_slots.released_handles.begin(),
+            c_slots.released_handles.begin()
+            + (c_released_min - c_slots.released_handles_base)
+        )
+        c_slots.released_handles_base = c_released_min
+
+
+@cython.final
+cdef class _NodeChangesJournal:
+    # last state of scene nodes reported to a consumer of given fields,
+    # indexed by node slot and updated in place on each call
+    cdef:
+        uint8_t c_fields
+        uint32_t c_epoch
+        vector[CNodeSnapshot] c_snapshots
+        # positions in tracker's logs the journal has read up to
+        uint64_t c_changed_cursor
+        uint64_t c_released_cursor
+
+    @staticmethod
+    cdef _NodeChangesJournal create(uint8_t c_fields):
+        cdef _NodeChangesJournal journal = \
+            _NodeChangesJournal.__new__(_NodeChangesJournal)
+        journal.c_fields = c_fields
+        return journal
+
+    cdef NodeChanges consume(
+        self, _NodeDataStorage storage, CNode* c_root,
+        const vector[CNode*]& c_candidates,
+        const vector[uint64_t]& c_released_handles
+    ):
+        cdef:
+            uint8_t c_fields = self.c_fields
+            vector[uint64_t] c_changed_handles
+            vector[uint8_t] c_changed_fields
+            vector[uint32_t] c_changed_slots
+            vector[uint64_t] c_removed_handles
+            CNodeSnapshot* c_snapshot
+            CNode* c_node
+            uint64_t c_handle
+            uint32_t c_slot
+            uint8_t c_node_fields
+            CDVec2 c_position
+            double c_rotation
+            CDVec2 c_scale
+            bool c_visible
+            CSprite c_sprite
+            CColor c_color
+
+        self.c_epoch += 1
+        # released before candidates were collected, so a reused
+        # slot is cleared before its new node is reported
+        for c_handle in c_released_handles:
+            c_slot = <uint32_t>c_handle
+            if (
+                c_slot < self.c_snapshots.size()
+                and self.c_snapshots[c_slot].handle == c_handle
+            ):
+                c_removed_handles.push_back(c_handle)
+                self.c_snapshots[c_slot].handle = 0
+
+        for c_node in c_candidates:
+            if c_node == c_root:
+                continue
+
+            c_handle = storage.get_handle(c_node)
+            c_slot = <uint32_t>c_handle
+            if c_slot >= self.c_snapshots.size():
+                self.c_snapshots.resize(c_slot + 1)
+            c_snapshot = &self.c_snapshots[c_slot]
+            # node was both logged and polled
+            if c_snapshot.handle == c_handle and c_snapshot.epoch == self.c_epoch:
+                continue
+            c_node_fields = 0
+            # slot was reused, so its previous node was removed
+            if c_snapshot.handle != c_handle:
+                if c_snapshot.handle != 0:
+                    c_removed_handles.push_back(c_snapshot.handle)
+                c_snapshot.handle = c_handle
+                # new nodes are reported with all fields
+                c_node_fields = c_fields
+            c_snapshot.epoch = self.c_epoch
+
+            if c_fields & NodeChangeField.node_change_transform:
+                c_position = c_node.position()
+                c_rotation = c_node.rotation()
+                c_scale = c_node.scale()
+                if (
+                    not (c_position == c_snapshot.position)
+                    or c_rotation != c_snapshot.rotation
+                    or not (c_scale == c_snapshot.scale_)
+                ):
+                    c_node_fields |= NodeChangeField.node_change_transform
+                c_snapshot.position = c_position
+                c_snapshot.rotation = c_rotation
+                c_snapshot.scale_ = c_scale
+            if c_fields & NodeChangeField.node_change_visible:
+                c_visible = c_node.visible()
+                if c_visible != c_snapshot.visible:
+                    c_node_fields |= NodeChangeField.node_change_visible
+                c_snapshot.visible = c_visible
+            if c_fields & NodeChangeField.node_change_sprite:
+                c_sprite = c_node.sprite()
+                if not (c_sprite == c_snapshot.sprite):
+                    c_node_fields |= NodeChangeField.node_change_sprite
+                c_snapshot.sprite = c_sprite
+            if c_fields & NodeChangeField.node_change_color:
+                c_color = c_node.color()
+                if not (c_color == c_snapshot.color):
+                    c_node_fields |= NodeChangeField.node_change_color
+                c_snapshot.color = c_color
+
+            if c_node_fields:
+                c_changed_handles.push_back(c_handle)
+                c_changed_fields.push_back(c_node_fields)
+                c_changed_slots.push_back(c_slot)
+
+        return self._make_node_changes(
+            storage, c_changed_handles, c_changed_fields, c_changed_slots,
+            c_removed_handles
+        )
+
+    cdef NodeChanges _make_node_changes(
+        self, _NodeDataStorage storage, const vector[uint64_t]& c_handles,
+        const vector[uint8_t]& c_changed_fields,
+        const vector[uint32_t]& c_slots,
+        const vector[uint64_t]& c_removed_handles
+    ):
+        cdef:
+            uint8_t c_fields = self.c_fields
+            NodeChanges changes = NodeChanges.__new__(NodeChanges)
+            Py_ssize_t size = c_handles.size()
+            uint64_t* node_ids
+            uint8_t* changed_fields
+            uint64_t* removed_node_ids
+            double* positions = NULL
+            double* rotations = NULL
+            double* scales = NULL
+            uint8_t* visible = NULL
+            double* colors = NULL
+            CNodeSnapshot* c_snapshot
+            size_t i
+
+        changes.storage = storage
+        changes.node_ids = _ArrayBuffer.create(b'Q', sizeof(uint64_t), size)
+        changes.changed_fields = _ArrayBuffer.create(b'B', sizeof(uint8_t), size)
+        changes.removed_node_ids = _ArrayBuffer.create(
+            b'Q', sizeof(uint64_t), c_removed_handles.size()
+        )
+        node_ids = <uint64_t*>changes.node_ids.c_data
+        changed_fields = <uint8_t*>changes.changed_fields.c_data
+        removed_node_ids = <uint64_t*>changes.removed_node_ids.c_data
+
+        if c_fields & NodeChangeField.node_change_transform:
+            changes.positions = _ArrayBuffer.create(b'd', sizeof(double), size, 2)
+            changes.rotations = _ArrayBuffer.create(b'd', sizeof(double), size)
+            changes.scales = _ArrayBuffer.create(b'd', sizeof(double), size, 2)
+            positions = <double*>changes.positions.c_data
+            rotations = <double*>changes.rotations.c_data
+            scales = <double*>changes.scales.c_data
+        if c_fields & NodeChangeField.node_change_visible:
+            changes.visible = _ArrayBuffer.create(b'?', sizeof(uint8_t), size)
+            visible = <uint8_t*>changes.visible.c_data
+        if c_fields & NodeChangeField.node_change_color:
+            changes.colors = _ArrayBuffer.create(b'd', sizeof(double), size, 4)
+            colors = <double*>changes.colors.c_data
+
+        for i in range(c_handles.size()):
+            node_ids[i] = c_handles[i]
+            changed_fields[i] = c_changed_fields[i]
+            c_snapshot = &self.c_snapshots[c_slots[i]]
+            if c_fields & NodeChangeField.node_change_transform:
+                positions[2 * i] = c_snapshot.position.x
+                positions[2 * i + 1] = c_snapshot.position.y
+                rotations[i] = c_snapshot.rotation
+                scales[2 * i] = c_snapshot.scale_.x
+                scales[2 * i + 1] = c_snapshot.scale_.y
+            if c_fields & NodeChangeField.node_change_visible:
+                visible[i] = c_snapshot.visible
+            if c_fields & NodeChangeField.node_change_color:
+                colors[4 * i] = c_snapshot.color.r
+                colors[4 * i + 1] = c_snapshot.color.g
+                colors[4 * i + 2] = c_snapshot.color.b
+                colors[4 * i + 3] = c_snapshot.color.a
+
+        for i in range(c_removed_handles.size()):
+            removed_node_ids[i] = c_removed_handles[i]
+        return changes
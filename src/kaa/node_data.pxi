@@ -0,0 +1,171 @@
+cimport cython
+from libcpp.memory cimport shared_ptr, make_shared
+from libc.stdint cimport uint8_t, uint32_t, uint64_t
+
+from .kaacore.nodes cimport CNode, CNodePtr
+
+DEF NODE_DATA_INITIAL_CAPACITY = 64
+
+
+@cython.final
+cdef class _NodeDataStorage:
+    cdef:
+        shared_ptr[CNodeSlots] c_slots
+        # field name -> array with one row per node slot
+        dict columns
+        Py_ssize_t capacity
+
+    @staticmethod
+    cdef _NodeDataStorage create():
+        cdef _NodeDataStorage storage = \
+            _NodeDataStorage.__new__(_NodeDataStorage)
+        storage.c_slots = make_shared[CNodeSlots]()
+        storage.columns = {}
+        storage.capacity = NODE_DATA_INITIAL_CAPACITY
+        return storage
+
+    cdef void declare(self, str name, str dtype) except *:
+        if name in self.columns:
+            raise ValueError(f'Node field {name} is already declared.')
+        try:
+            format, itemsize = _ARRAY_DTYPES[dtype]
+        except KeyError:
+            raise ValueError(f'Unsupported node field dtype: {dtype}.')
+        self.columns[name] = _ArrayBuffer.create(
+            format, itemsize, self.capacity
+        )
+
+    cdef _ArrayBuffer get_column(self, str name):
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise KeyError(f'Node field {name} is not declared.')
+
+    cdef void _clear_released_slots(self) except *:
+        cdef:
+            CNodeSlots* c_slots = self.c_slots.get()
+            _ArrayBuffer column
+            uint32_t slot
+
+        for slot in c_slots.released_slots:
+            for column in self.columns.values():
+                column.clear_row(slot)
+            c_slots.free_slots.push_back(slot)
+        c_slots.released_slots.clear()
+
+    cdef Py_ssize_t get_slot(self, CNode* c_node) except -1:
+        cdef:
+            CPyNodeWrapper* c_wrapper = _get_c_node_wrapper(c_node)
+            uint32_t slot
+
+        if c_wrapper.c_slots:
+            return c_wrapper.slot
+
+        self._clear_released_slots()
+        slot = self.c_slots.get().acquire(c_node)
+        if slot >= self.capacity:
+            self.capacity *= 2
+            self.columns = {
+                name: (<_ArrayBuffer>column).resized(self.capacity)
+                for name, column in self.columns.items()
+            }
+        c_wrapper.c_slots = self.c_slots
+        c_wrapper.slot = slot
+        return slot
+
+    cdef uint64_t get_handle(self, CNode* c_node) except 0:
+        cdef uint32_t slot = self.get_slot(c_node)
+        return (<uint64_t>self.c_slots.get().generations[slot] << 32) | slot
+
+    cdef CNode* resolve(self, uint64_t handle):
+        cdef:
+            CNodeSlots* c_slots = self.c_slots.get()
+            uint32_t slot = <uint32_t>handle
+
+        # generations start from 1, so zero handle is never valid
+        if (
+            slot < c_slots.nodes.size()
+            and c_slots.generations[slot] == <uint32_t>(handle >> 32)
+        ):
+            return c_slots.nodes[slot]
+        return NULL
+
+    cdef _ArrayBuffer get_mask(self):
+        cdef:
+            CNodeSlots* c_slots = self.c_slots.get()
+            _ArrayBuffer mask = _ArrayBuffer.create(
+                b'?', sizeof(uint8_t), self.capacity
+            )
+            uint8_t* c_mask = <uint8_t*>mask.c_data
+            size_t i
+
+        for i in range(c_slots.nodes.size()):
+            c_mask[i] = c_slots.nodes[i] != NULL
+        return mask
+
+    cdef list get_nodes(self, object slots):
+        cdef:
+            CNodeSlots* c_slots = self.c_slots.get()
+            list nodes = []
+            Py_ssize_t slot
+
+        for slot in slots:
+            if (
+                0 <= slot < <Py_ssize_t>c_slots.nodes.size()
+                and c_slots.nodes[slot] != NULL
+            ):
+                nodes.append(get_node_wrapper(CNodePtr(c_slots.nodes[slot])))
+            else:
+                nodes.append(None)
+        return nodes
+
+
+cdef _NodeDataStorage _get_node_data_storage(CNode* c_node):
+    cdef CPyScene* cpy_scene = <CPyScene*>c_node.scene()
+    if cpy_scene == NULL:
+        raise ValueError('Node data is available only for nodes in a scene.')
+    return (<Scene>cpy_scene.get_py_scene())._get_node_data_storage()
+
+
+@cython.final
+cdef class _NodeData:
+    cdef NodeBase node
+
+    @staticmethod
+    cdef _NodeData create(NodeBase node):
+        cdef _NodeData node_data = _NodeData.__new__(_NodeData)
+        node_data.node = node
+        return node_data
+
+    def __getitem__(self, str name not None):
+        cdef:
+            CNode* c_node = self.node.get_c_node()
+            _NodeDataStorage storage = _get_node_data_storage(c_node)
+            Py_ssize_t slot
+
+        storage.get_column(name)
+        # getting slot might resize the columns, so column is taken after
+        slot = storage.get_slot(c_node)
+        return storage.get_column(name).get_item(slot)
+
+    def __setitem__(self, str name not None, value):
+        cdef:
+            CNode* c_node = self.node.get_c_node()
+            _NodeDataStorage storage = _get_node_data_storage(c_node)
+            Py_ssize_t slot
+
+        storage.get_column(name)
+        slot = storage.get_slot(c_node)
+        storage.get_column(name).set_item(slot, value)
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return list(_get_node_data_storage(self.node.get_c_node()).columns)
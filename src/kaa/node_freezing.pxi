@@ -0,0 +1,189 @@
+cimport cython
+from libcpp cimport bool
+from libcpp.string cimport string
+from libcpp.utility cimport pair
+from libcpp.vector cimport vector
+
+from .kaacore.nodes cimport CNode, CNodeType
+from .kaacore.clock cimport CDuration
+from .kaacore.vectors cimport CDVec2
+from .kaacore.physics cimport (
+    CBodyNodeType, CollisionBitmask, collision_bitmask_none
+)
+from .kaacore.transitions cimport CNodeTransitionHandle
+
+
+cdef cppclass CFrozenNodeState:
+    # reference turns NULL if the node gets deleted while
+    # the subtree is frozen, such nodes are skipped when restoring
+    CNodeRef c_node_ref
+    CDuration lifetime
+    CNodeTransitionHandle transition
+    bool has_lifetime
+    bool has_transition
+    bool is_body
+    bool sleeping
+    bool is_kinematic_body
+    CDVec2 velocity
+    double angular_velocity
+    bool is_hitbox
+    CollisionBitmask mask
+    CollisionBitmask collision_mask
+    # transitions set via transitions_manager
+    vector[pair[string, CNodeTransitionHandle]] named_transitions
+
+
+@cython.final
+cdef class _FrozenSubtree:
+    cdef:
+        bool c_visible
+        vector[CFrozenNodeState] c_states
+
+    @staticmethod
+    cdef _FrozenSubtree freeze(CNode* c_root):
+        cdef:
+            _FrozenSubtree frozen = _FrozenSubtree.__new__(_FrozenSubtree)
+            vector[CNode*] c_pending
+            CFrozenNodeState c_state
+            CPyNodeWrapper* c_wrapper
+            size_t i
+            CNodeTransitionHandle c_transition
+            CNode* c_node
+            CNode* c_child
+            string c_name
+
+        frozen.c_visible = c_root.visible()
+
+        c_pending.push_back(c_root)
+        while not c_pending.empty():
+            c_node = c_pending.back()
+            c_pending.pop_back()
+            # nested frozen subtrees keep their own state
+            if c_node != c_root and _is_c_node_frozen(c_node):
+                continue
+            for c_child in c_node.children():
+                c_pending.push_back(c_child)
+
+            c_state.has_lifetime = c_node.lifetime().count() != 0.
+            c_state.has_transition = False
+            if c_node.transition():
+                c_state.has_transition = True
+            c_state.is_body = (
+                c_node.type() == CNodeType.body
+                and c_node.body.body_type() == CBodyNodeType.dynamic
+            )
+            c_state.is_kinematic_body = (
+                c_node.type() == CNodeType.body
+                and c_node.body.body_type() == CBodyNodeType.kinematic
+            )
+            c_state.is_hitbox = c_node.type() == CNodeType.hitbox
+            c_state.named_transitions.clear()
+            c_wrapper = <CPyNodeWrapper*>c_node.wrapper_ptr()
+            if c_wrapper != NULL:
+                for c_name in c_wrapper.transition_names:
+                    c_transition = c_node.transitions_manager().get(c_name)
+                    if c_transition:
+                        c_state.named_transitions.push_back(
+                            pair[string, CNodeTransitionHandle](
+                                c_name, c_transition
+                            )
+                        )
+            if not (
+                c_state.has_lifetime or c_state.has_transition
+                or c_state.is_body or c_state.is_kinematic_body
+                or c_state.is_hitbox or not c_state.named_transitions.empty()
+            ):
+                continue
+
+            c_state.c_node_ref = _get_c_node_ref(c_node)
+            c_state.lifetime = c_node.lifetime()
+            c_state.transition = c_node.transition()
+            if c_state.has_lifetime:
+                c_node.lifetime(CDuration(0.))
+            if c_state.has_transition:
+                c_node.transition(CNodeTransitionHandle())
+            for i in range(c_state.named_transitions.size()):
+                c_node.transitions_manager().set(
+                    c_state.named_transitions[i].first, CNodeTransitionHandle()
+                )
+            if c_state.is_body:
+                c_state.sleeping = c_node.body.sleeping()
+                c_node.body.sleeping(True)
+            # kinematic bodies can't sleep, so they are stopped instead
+            if c_state.is_kinematic_body:
+                c_state.velocity = c_node.body.velocity()
+                c_state.angular_velocity = c_node.body.angular_velocity()
+                c_node.body.velocity(CDVec2(0., 0.))
+                c_node.body.angular_velocity(0.)
+            if c_state.is_hitbox:
+                c_state.mask = c_node.hitbox.mask()
+                c_state.collision_mask = c_node.hitbox.collision_mask()
+                c_node.hitbox.mask(collision_bitmask_none)
+                c_node.hitbox.collision_mask(collision_bitmask_none)
+            frozen.c_states.push_back(c_state)
+
+        c_root.visible(False)
+        _mark_c_node_changed(c_root)
+        return frozen
+
+    cdef void restore(self, CNode* c_root) except *:
+        cdef:
+            CFrozenNodeState* c_state
+            CNode* c_node
+            size_t i, j
+
+        for i in range(self.c_states.size()):
+            c_state = &self.c_states[i]
+            c_node = c_state.c_node_ref.get()[0]
+            if c_node == NULL:
+                continue
+            if c_state.has_lifetime:
+                c_node.lifetime(c_state.lifetime)
+            if c_state.has_transition:
+                c_node.transition(c_state.transition)
+            for j in range(c_state.named_transitions.size()):
+                c_node.transitions_manager().set(
+                    c_state.named_transitions[j].first,
+                    c_state.named_transitions[j].second
+                )
+            if c_state.is_body and not c_state.sleeping:
+                c_node.body.sleeping(False)
+            if c_state.is_kinematic_body:
+                c_node.body.velocity(c_state.velocity)
+                c_node.body.angular_velocity(c_state.angular_velocity)
+            if c_state.is_hitbox:
+                c_node.hitbox.mask(c_state.mask)
+                c_node.hitbox.collision_mask(c_state.collision_mask)
+            # restored transitions and bodies are changed by the engine again
+            _mark_c_node_changed(c_node)
+        c_root.visible(self.c_visible)
+        _mark_c_node_changed(c_root)
+        self.c_states.clear()
+
+
+cdef bint _is_c_node_frozen(CNode* c_node) except -1:
+    cdef CPyNodeWrapper* c_wrapper = \
+        <CPyNodeWrapper*>c_node.wrapper_ptr()
+    return (
+        c_wrapper != NULL
+        and c_wrapper.py_wrapper != NULL
+        and (<NodeBase>c_wrapper.py_wrapper)._frozen_subtree is not None
+    )
+
+
+cdef bint _is_c_node_in_frozen_subtree(CNode* c_node) except -1:
+    # pooled nodes are frozen by their pool
+    cdef:
+        CNode* c_ancestor = c_node.parent().get()
+        CPyNodeWrapper* c_wrapper = <CPyNodeWrapper*>c_node.wrapper_ptr()
+
+    if c_wrapper != NULL and c_wrapper.pooled:
+        return True
+    while c_ancestor != NULL:
+        c_wrapper = <CPyNodeWrapper*>c_ancestor.wrapper_ptr()
+        if _is_c_node_frozen(c_ancestor) or (
+            c_wrapper != NULL and c_wrapper.pooled
+        ):
+            return True
+        c_ancestor = c_ancestor.parent().get()
+    return False
@@ -0,0 +1,159 @@
+cimport cython
+from libc.stdint cimport uint32_t, uint64_t
+from libcpp.string cimport string
+from libcpp.utility cimport move as cmove
+
+from .kaacore.nodes cimport CNode, CNodeOwnerPtr
+from .kaacore.clock cimport CDuration
+from .kaacore.transitions cimport CNodeTransitionHandle
+
+
+@cython.final
+cdef class NodePool:
+    cdef:
+        object factory
+        NodeBase parent
+        # (node, frozen subtree) pairs, released nodes are marked
+        # on their wrappers, so the list is never searched
+        list free_nodes
+        # unattached copy of the first node made by factory,
+        # used to bring released nodes back to their initial state
+        CNodeOwnerPtr c_template_owner
+        uint32_t c_template_tags
+        str hits_stat_name
+        str misses_stat_name
+        str free_stat_name
+        readonly uint32_t capacity
+        readonly str name
+        readonly uint64_t hits
+        readonly uint64_t misses
+
+    def __init__(self, factory not None, uint32_t capacity,
+                 NodeBase parent not None, str name='node_pool'):
+        assert parent.c_node_ptr, "Cannot use NULL node as pool parent."
+        self.factory = factory
+        self.capacity = capacity
+        self.parent = parent
+        self.name = name
+        self.free_nodes = []
+        self.hits_stat_name = f'{name}:hits'
+        self.misses_stat_name = f'{name}:misses'
+        self.free_stat_name = f'{name}:free'
+
+    def __len__(self):
+        return len(self.free_nodes)
+
+    def __repr__(self):
+        return '<NodePool: {}, free: {}/{}, hits: {}, misses: {}>'.format(
+            self.name, len(self.free_nodes), self.capacity,
+            self.hits, self.misses,
+        )
+
+    @property
+    def free_count(self):
+        return len(self.free_nodes)
+
+    cdef void _push_statistics(self) except *:
+        cdef object statistics_manager = get_global_statistics_manager()
+        statistics_manager.push_value(self.hits_stat_name, self.hits)
+        statistics_manager.push_value(self.misses_stat_name, self.misses)
+        statistics_manager.push_value(
+            self.free_stat_name, len(self.free_nodes)
+        )
+
+    cdef tuple _pop_free_node(self):
+        cdef NodeBase node
+        while self.free_nodes:
+            entry = self.free_nodes.pop()
+            node = entry[0]
+            # pooled node might have been deleted along with its parent
+            if node.c_node_ptr:
+                return entry
+
+    def acquire(self, **options):
+        cdef:
+            tuple entry = self._pop_free_node()
+            NodeBase node
+            CNode* c_node
+            CNode* c_template
+
+        if entry is not None:
+            self.hits += 1
+            node = entry[0]
+            c_node = node.get_c_node()
+            (<_FrozenSubtree>entry[1]).restore(c_node)
+            _get_c_node_wrapper(c_node).pooled = False
+            c_template = self.c_template_owner.get()
+            c_node.visible(c_template.visible())
+            c_node.indexable(c_template.indexable())
+            c_node.lifetime(c_template.lifetime())
+            c_node.transition(c_template.transition())
+            _mark_c_node_changed(c_node)
+        else:
+            self.misses += 1
+            node = self.factory()
+            c_node = node.get_c_node()
+            if self.c_template_owner.get() == NULL:
+                self.c_template_owner = cmove(_clone_c_node(c_node, False))
+                self.c_template_tags = _get_c_node_wrapper(c_node).tags
+            elif c_node.type() != self.c_template_owner.get().type():
+                raise ValueError(
+                    'Pool factory must always return nodes of the same type.'
+                )
+            self.parent.add_child(node)
+
+        self._push_statistics()
+        if options:
+            node.setup(**options)
+        return node
+
+    def release(self, NodeBase node not None):
+        cdef:
+            CNode* c_node = node.get_c_node()
+            CNode* c_template = self.c_template_owner.get()
+            CPyNodeWrapper* c_wrapper
+            string c_name
+
+        if (
+            c_template == NULL
+            or c_node.parent().get() != self.parent.get_c_node()
+            or c_node.type() != c_template.type()
+        ):
+            raise ValueError(f'Node {node} was not acquired from this pool.')
+        c_wrapper = _get_c_node_wrapper(c_node)
+        if c_wrapper.pooled:
+            raise ValueError(f'Node {node} was already released.')
+
+        if <uint32_t>len(self.free_nodes) >= self.capacity:
+            node.delete()
+            self._push_statistics()
+            return
+
+        # pooled node is a new node for anyone holding its handle,
+        # references or data
+        if c_wrapper.c_slots:
+            c_wrapper.c_slots.get().release(c_wrapper.slot)
+            c_wrapper.c_slots.reset()
+        c_wrapper.reset_node_ref()
+        c_wrapper.tags = self.c_template_tags
+        for c_name in c_wrapper.transition_names:
+            c_node.transitions_manager().set(c_name, CNodeTransitionHandle())
+        c_wrapper.transition_names.clear()
+
+        _copy_c_node_properties(c_template, c_node)
+        c_node.lifetime(CDuration(0.))
+        c_node.transition(CNodeTransitionHandle())
+        # stops the rest of the subtree: lifetimes, transitions,
+        # physics and collisions, until the node is acquired again
+        self.free_nodes.append((node, _FrozenSubtree.freeze(c_node)))
+        c_node.indexable(False)
+        c_wrapper.pooled = True
+        self._push_statistics()
+
+    def clear(self):
+        cdef NodeBase node
+        while self.free_nodes:
+            node = self.free_nodes.pop()[0]
+            if node.c_node_ptr:
+                node.delete()
+        self._push_statistics()
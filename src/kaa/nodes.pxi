@@ -1,62 +1,182 @@
 import cython
 from libcpp cimport bool
-from libcpp.memory cimport unique_ptr
+from libcpp.memory cimport unique_ptr, shared_ptr, make_shared
 from libcpp.utility cimport move as cmove
-from libc.stdint cimport int16_t, uint32_t, uint64_t
+from libc.stdint cimport uint8_t, int16_t, uint32_t, uint64_t, UINT32_MAX
+from libcpp.vector cimport vector
+from libcpp.pair cimport pair
+from libcpp.string cimport string
 from libcpp.unordered_set cimport unordered_set
 from cpython.ref cimport PyObject, Py_XINCREF, Py_XDECREF
 
 from .extra.optional cimport optional, nullopt
 from .kaacore.shapes cimport CShape
+from .kaacore.scenes cimport CScene
+from .kaacore.vectors cimport CDVec2
 from .kaacore.clock cimport CDuration
+from .kaacore.physics cimport CBodyNodeType
 from .kaacore.sprites cimport CSprite
 from .kaacore.glue cimport CPythonicCallbackResult
 from .kaacore.nodes cimport (
     CNodeType, CNode, CNodePtr, CNodeOwnerPtr, CForeignNodeWrapper,
-    c_make_node,
+    CNodeRawPtr, c_make_node,
 )
 from .kaacore.transitions cimport CNodeTransitionHandle
 from .kaacore.math cimport radians, degrees
-from .kaacore.geometry cimport CAlignment
+from .kaacore.geometry cimport CAlignment, CTransformation
 from .kaacore.materials cimport CMaterial
 from .kaacore.resources cimport CResourceReference
+from .kaacore.viewports cimport min_viewport_z_index
 
 DEF NODE_FREELIST_SIZE = 32
 
 
+cdef enum PendingNodeField:
+    pending_node_position = 1 << 0
+    pending_node_rotation = 1 << 1
+    pending_node_scale = 1 << 2
+    pending_node_transformation = 1 << 3
+    pending_node_z_index = 1 << 4
+    pending_node_visible = 1 << 5
+
+
+# Per-scene registry of node slots, used for indexing node data columns.
+# Slot's generation changes each time the slot is released, so stale
+# references to the slot can be detected.
+cdef cppclass CNodeSlots:
+    vector[CNode*] nodes
+    vector[uint32_t] generations
+    vector[uint32_t] free_slots
+    # released slots, which have to be cleared before being reused
+    vector[uint32_t] released_slots
+    # handles of released slots, kept for node change journals (once
+    # there are any), released_handles[0] has index released_handles_base
+    bool track_released_handles
+    vector[uint64_t] released_handles
+    uint64_t released_handles_base
+
+    __init__() nogil:
+        this.track_released_handles = False
+        this.released_handles_base = 0
+
+    uint32_t acquire(CNode* c_node) nogil:
+        cdef uint32_t slot
+        if not this.free_slots.empty():
+            slot = this.free_slots.back()
+            this.free_slots.pop_back()
+            this.nodes[slot] = c_node
+        else:
+            slot = this.nodes.size()
+            this.nodes.push_back(c_node)
+            this.generations.push_back(1)
+        return slot
+
+    void release(uint32_t slot) nogil:
+        if this.track_released_handles:
+            this.released_handles.push_back(
+                (<uint64_t>this.generations[slot] << 32) | slot
+            )
+        this.nodes[slot] = NULL
+        this.generations[slot] += 1
+        this.released_slots.push_back(slot)
+
+
+# Node pointer shared with the node's wrapper, it's set to NULL once
+# the node gets deleted, so holders of the reference never see
+# a dangling pointer (see _get_c_node_ref).
+ctypedef shared_ptr[CNodeRawPtr] CNodeRef
+
+
+# Incremented whenever a node gets destroyed, lets holders of raw node
+# pointers (see _SpatialQueryResults) detect they might be dangling.
+# Every node in a scene gets a wrapper (see _clone_c_node), so no
+# deletion is missed.
+cdef uint64_t _c_deleted_nodes_count = 0
+
+
+cdef void _count_deleted_c_node() noexcept nogil:
+    global _c_deleted_nodes_count
+    _c_deleted_nodes_count += 1
+
+
 cdef cppclass CPyNodeWrapper(CForeignNodeWrapper):
+    # node owning the wrapper
+    CNode* c_node
+    # NULL if wrapper was made only to hold node slot,
+    # python object is created on first lookup
     PyObject* py_wrapper
     bool added_to_parent
+    # set when python wrapper was moved to another node (see recreate_under)
+    bool moved
     bool on_attach_defined
     bool on_detach_defined
+    shared_ptr[CNodeSlots] c_slots
+    uint32_t slot
+    # user defined bits, used for filtering spatial index queries
+    uint32_t tags
+    # made on demand, when something needs to track the node's liveness
+    CNodeRef c_node_ref
+    # set while the node is released to a NodePool
+    bool pooled
+    # names set via transitions_manager, kaacore can't list them
+    unordered_set[string] transition_names
+    # used by scene's change tracker: position of the node in the log
+    # of changed nodes (plus one, 0 if never logged) and whether the node
+    # is checked on each consume, as the engine changes it
+    uint64_t changes_log_index
+    bool changes_polled
 
     __init__(
-        PyObject* py_wrapper, const bool on_attach_defined,
+        CNode* c_node, PyObject* py_wrapper, const bool on_attach_defined,
         const bool on_detach_defined
     ) nogil:
+        this.c_node = c_node
         this.py_wrapper = py_wrapper
+        this.changes_log_index = 0
+        this.changes_polled = False
         this.added_to_parent = False
+        this.moved = False
+        this.tags = 0
+        this.pooled = False
         this.on_attach_defined = on_attach_defined
         this.on_detach_defined = on_detach_defined
 
     void on_add_to_parent() noexcept with gil:
+        # wrappers without python object take the reference
+        # once python object gets created
+        if this.py_wrapper == NULL or this.added_to_parent:
+            return
         Py_XINCREF(py_wrapper)
         this.added_to_parent = True
 
-    void on_attach() noexcept nogil:
-        if not this.on_attach_defined:
-            return
-
-        with gil:
-            try:
+    void on_attach() noexcept with gil:
+        cdef CPythonicCallbackResult[void] result
+        try:
+            # added nodes are reported by scene's change journals
+            _mark_c_node_changed(this.c_node)
+            if this.on_attach_defined:
                 (<NodeBase>this.py_wrapper).on_attach()
-            except BaseException as exc:
-                CPythonicCallbackResult[void](<PyObject*>exc).unwrap_result()
+        except BaseException as exc:
+            result = CPythonicCallbackResult[void](<PyObject*>exc)
+        result.unwrap_result()
 
     void on_detach() noexcept with gil:
         cdef:
             CPythonicCallbackResult[void] result
-            NodeBase py_wrapper = <NodeBase>this.py_wrapper
+            NodeBase py_wrapper
+
+        _count_deleted_c_node()
+        if this.moved:
+            return
+
+        this.reset_node_ref()
+        if this.c_slots:
+            this.c_slots.get().release(this.slot)
+            this.c_slots.reset()
+
+        if this.py_wrapper == NULL:
+            return
+        py_wrapper = <NodeBase>this.py_wrapper
 
         if this.on_detach_defined:
             try:
@@ -67,12 +187,98 @@ cdef cppclass CPyNodeWrapper(CForeignNodeWrapper):
         py_wrapper._reset()
         result.unwrap_result()
 
+    void reset_node_ref() nogil:
+        if this.c_node_ref:
+            this.c_node_ref.get()[0] = NULL
+            this.c_node_ref.reset()
+        # change tracker refers to the node by the reference
+        this.changes_log_index = 0
+        this.changes_polled = False
+
     __dealloc__() nogil:
+        # nodes outside of scene are destroyed without being detached
+        this.reset_node_ref()
         if this.added_to_parent:
             with gil:
                 Py_XDECREF(this.py_wrapper)
 
 
+@cython.final
+@cython.freelist(NODE_FREELIST_SIZE)
+cdef class _PendingNodeUpdate:
+    cdef:
+        uint8_t fields
+        # number of blocks (batch_update or scene's deferred_updates)
+        # the node is held by
+        uint32_t holders_count
+        CDVec2 c_position
+        double c_rotation
+        CDVec2 c_scale
+        CTransformation c_transformation
+        optional[int16_t] c_z_index
+        bint c_visible
+
+    cdef void apply(self, CNode* c_node) except *:
+        cdef uint8_t fields = self.fields
+        self.fields = 0
+        # transformation goes first, since position, rotation
+        # and scale written after it override its components
+        if fields & PendingNodeField.pending_node_transformation:
+            c_node.transformation(self.c_transformation)
+        if fields & PendingNodeField.pending_node_position:
+            c_node.position(self.c_position)
+        if fields & PendingNodeField.pending_node_rotation:
+            c_node.rotation(self.c_rotation)
+        if fields & PendingNodeField.pending_node_scale:
+            c_node.scale(self.c_scale)
+        if fields & PendingNodeField.pending_node_z_index:
+            c_node.z_index(self.c_z_index)
+        if fields & PendingNodeField.pending_node_visible:
+            c_node.visible(self.c_visible)
+
+
+@cython.final
+cdef class _NodeBatchUpdate:
+    cdef NodeBase node
+
+    def __enter__(self):
+        self.node._hold_pending_update()
+        return self.node
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.node._release_pending_update()
+
+
+@cython.final
+cdef class _DeferredUpdates:
+    cdef:
+        CScene* c_scene
+        list nodes
+
+    def __enter__(self):
+        global _active_deferred_updates
+        if _active_deferred_updates is not None:
+            raise RuntimeError('Deferred updates are already active.')
+        self.nodes = []
+        _active_deferred_updates = self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_deferred_updates
+        cdef NodeBase node
+        _active_deferred_updates = None
+        for node in self.nodes:
+            node._release_pending_update()
+        self.nodes = None
+
+    cdef void track(self, NodeBase node) except *:
+        if node.c_node_ptr.get().scene() == self.c_scene:
+            node._hold_pending_update()
+            self.nodes.append(node)
+
+
+cdef _DeferredUpdates _active_deferred_updates = None
+
+
 @cython.freelist(NODE_FREELIST_SIZE)
 cdef class NodeBase:
     cdef:
@@ -83,32 +289,82 @@ cdef class NodeBase:
         # wrapper for existing node.
         CNodeOwnerPtr c_node_owner_ptr
         CNodePtr c_node_ptr
+        # property writes buffered by batch_update or deferred_updates
+        _PendingNodeUpdate _pending_update
+        # state stashed while the subtree is frozen
+        _FrozenSubtree _frozen_subtree
 
     def __init__(self, **options):
         self.setup(**options)
 
     cdef void _reset(self):
         self.c_node_ptr = CNodePtr()
+        self._pending_update = None
+        self._frozen_subtree = None
 
     cdef inline CNode* get_c_node(self) except NULL:
         cdef CNode* c_node = self.c_node_ptr.get()
         assert c_node != NULL, \
             'Operation on uninitialized or deleted Node.'
+        # any other operation sees the buffered writes
+        if self._pending_update is not None and self._pending_update.fields:
+            self._pending_update.apply(c_node)
         return c_node
 
+    cdef _PendingNodeUpdate _get_pending_update(self):
+        assert self.c_node_ptr.get() != NULL, \
+            'Operation on uninitialized or deleted Node.'
+        if (
+            self._pending_update is None
+            and _active_deferred_updates is not None
+        ):
+            _active_deferred_updates.track(self)
+        return self._pending_update
+
+    cdef void _hold_pending_update(self) except *:
+        assert self.c_node_ptr.get() != NULL, \
+            'Operation on uninitialized or deleted Node.'
+        if self._pending_update is None:
+            self._pending_update = \
+                _PendingNodeUpdate.__new__(_PendingNodeUpdate)
+        self._pending_update.holders_count += 1
+
+    cdef void _release_pending_update(self) except *:
+        # pending update is dropped when node gets deleted
+        if self._pending_update is None:
+            return
+        self._pending_update.holders_count -= 1
+        if self._pending_update.holders_count == 0:
+            self.get_c_node()
+            self._pending_update = None
+
+    cdef void _mark_changed(self) except *:
+        # buffered writes are marked as well, journals apply them
+        _mark_c_node_changed(self.c_node_ptr.get())
+
+    def batch_update(self):
+        cdef _NodeBatchUpdate batch_update = \
+            _NodeBatchUpdate.__new__(_NodeBatchUpdate)
+        batch_update.node = self
+        return batch_update
+
     cdef uint64_t _get_internal_id(self):
         return <uint64_t>(self.c_node_ptr.get())
 
     cdef void make_c_node(self, CNodeType type):
         self.c_node_owner_ptr = cmove(c_make_node(type))
         self.c_node_ptr = CNodePtr(self.c_node_owner_ptr.get())
+        self._setup_c_node_wrapper()
+
+    cdef void _setup_c_node_wrapper(self):
         cdef:
             on_attach_defined = callable(getattr(self, 'on_attach', None))
             on_detach_defined = callable(getattr(self, 'on_detach', None))
         self.c_node_ptr.get().setup_wrapper(
             unique_ptr[CForeignNodeWrapper](
                 new CPyNodeWrapper(
-                    <PyObject*>self, on_attach_defined, on_detach_defined
+                    self.c_node_ptr.get(), <PyObject*>self,
+                    on_attach_defined, on_detach_defined
                 )
             )
         )
@@ -147,6 +403,63 @@ cdef class NodeBase:
         assert self.c_node_ptr, "Node already deleted."
         self.c_node_ptr.destroy()
 
+    def recreate_under(self, NodeBase new_parent not None,
+                       bint keep_absolute_transform=True):
+        # stopgap until kaacore can detach nodes, not a real reparent:
+        # cost is linear in subtree size and some state can't be copied
+        cdef:
+            CNode* c_node = self.get_c_node()
+            CNode* c_new_parent = new_parent.get_c_node()
+            CNode* c_ancestor = c_new_parent
+            CNodeOwnerPtr c_moved_node_owner
+            CTransformation c_absolute_transformation
+
+        while c_ancestor != NULL:
+            if c_ancestor == c_node:
+                raise ValueError(
+                    'Cannot recreate node under itself or its descendant.'
+                )
+            c_ancestor = c_ancestor.parent().get()
+
+        if c_node.parent().get() == NULL:
+            if self.c_node_owner_ptr.get() == NULL:
+                raise ValueError('Cannot recreate scene root node.')
+            new_parent.add_child(self)
+            return self
+        if c_node.parent().get() == c_new_parent:
+            return self
+
+        # kaacore can't detach a node from its parent, so the subtree
+        # is copied under the new parent and python wrappers are moved
+        # to the copies before the original subtree gets deleted
+        _check_c_subtree_copyable(c_node)
+        c_absolute_transformation = c_node.absolute_transformation()
+        c_moved_node_owner = cmove(_clone_c_node(c_node, True))
+        if keep_absolute_transform:
+            c_moved_node_owner.get().transformation(
+                c_absolute_transformation
+                | c_new_parent.absolute_transformation().inverse()
+            )
+        # node slots are kept only when moving within the same scene
+        _move_c_node_wrappers(
+            c_node, c_moved_node_owner.get(), True,
+            c_node.scene() == c_new_parent.scene()
+        )
+        c_new_parent.add_child(c_moved_node_owner)
+        CNodePtr(c_node).destroy()
+        return self
+
+    def spawn_children(self, uint32_t count, **options):
+        return _spawn_children(self.get_c_node(), count, options)
+
+    def clone(self, bint deep=True):
+        cdef CNode* c_node = self.get_c_node()
+        cdef NodeBase cloned_node = _make_node_wrapper(c_node.type())
+        cloned_node.c_node_owner_ptr = cmove(_clone_c_node(c_node, deep))
+        cloned_node.c_node_ptr = CNodePtr(cloned_node.c_node_owner_ptr.get())
+        cloned_node._setup_c_node_wrapper()
+        return cloned_node
+
     def setup(self, **options):
         if 'position' in options:
             self.position = options.pop('position')
@@ -178,10 +491,16 @@ cdef class NodeBase:
             self.transition = options.pop('transition')
         if 'viewports' in options:
             self.viewports = options.pop('viewports')
+        if 'viewports_mask' in options:
+            self.viewports_mask = options.pop('viewports_mask')
         if 'render_passes' in options:
             self.render_passes = options.pop('render_passes')
+        if 'render_passes_mask' in options:
+            self.render_passes_mask = options.pop('render_passes_mask')
         if 'indexable' in options:
             self.indexable = options.pop('indexable')
+        if 'tags' in options:
+            self.tags = options.pop('tags')
         if 'stencil_mode' in options:
             self.stencil_mode = options.pop('stencil_mode')
 
@@ -201,10 +520,56 @@ cdef class NodeBase:
         for c_node in children_copy:
             yield get_node_wrapper(CNodePtr(c_node))
 
+    def walk(self, str order not None='depth', types=None,
+             bint visible_only=False, max_depth=None):
+        cdef:
+            vector[CNodeRef] c_nodes
+            uint32_t c_types_mask = UINT32_MAX
+            tuple types_filter = None
+
+        if order not in ('depth', 'breadth'):
+            raise ValueError(
+                f"Unknown walk order: {order}, expected 'depth' or 'breadth'."
+            )
+        if types is not None:
+            types_filter = (types,) if isinstance(types, type) else tuple(types)
+            c_types_mask = _node_classes_to_c_types_mask(types_filter)
+            # exact node classes are fully covered by the mask
+            if all(cls in _NODE_CLASSES for cls in types_filter):
+                types_filter = None
+
+        _walk_c_nodes(
+            self.get_c_node(), order == 'breadth', c_types_mask, visible_only,
+            UINT32_MAX if max_depth is None else <uint32_t>max_depth, c_nodes
+        )
+        return _NodesIterator.create(c_nodes, types_filter)
+
+    def descendants_count(self):
+        return _count_c_descendants(self.get_c_node())
+
     @property
     def type(self):
         return <int>self.get_c_node().type()
 
+    @property
+    def data(self):
+        return _NodeData.create(self)
+
+    @property
+    def tags(self):
+        cdef CPyNodeWrapper* c_wrapper = \
+            <CPyNodeWrapper*>self.get_c_node().wrapper_ptr()
+        return c_wrapper.tags if c_wrapper != NULL else 0
+
+    @tags.setter
+    def tags(self, uint32_t value):
+        _get_c_node_wrapper(self.get_c_node()).tags = value
+
+    @property
+    def handle(self):
+        cdef CNode* c_node = self.get_c_node()
+        return _get_node_data_storage(c_node).get_handle(c_node)
+
     @property
     def scene(self):
         cdef CPyScene* cpy_scene = <CPyScene*>self.get_c_node().scene()
@@ -243,6 +608,29 @@ cdef class NodeBase:
     def effective_viewports(self):
         return c_indices_to_set(self.get_c_node().effective_viewports())
 
+    @property
+    def viewports_mask(self):
+        cdef optional[vector[int16_t]] c_indices = self.get_c_node().viewports()
+        if c_indices.has_value():
+            return _c_indices_to_mask(c_indices.value(), min_viewport_z_index)
+
+    @viewports_mask.setter
+    def viewports_mask(self, object mask):
+        if mask is not None:
+            self.get_c_node().viewports(optional[unordered_set[int16_t]](
+                _mask_to_c_indices(mask, min_viewport_z_index)
+            ))
+        else:
+            self.get_c_node().viewports(
+                optional[unordered_set[int16_t]](nullopt)
+            )
+
+    @property
+    def effective_viewports_mask(self):
+        return _c_indices_to_mask(
+            self.get_c_node().effective_viewports(), min_viewport_z_index
+        )
+
     @property
     def render_passes(self):
         cdef optional[vector[int16_t]] c_indices = self.get_c_node() \
@@ -271,6 +659,28 @@ cdef class NodeBase:
     def effective_render_passes(self):
         return c_indices_to_set(self.get_c_node().effective_render_passes())
 
+    @property
+    def render_passes_mask(self):
+        cdef optional[vector[int16_t]] c_indices = self.get_c_node() \
+            .render_passes()
+        if c_indices.has_value():
+            return _c_indices_to_mask(c_indices.value(), 0)
+
+    @render_passes_mask.setter
+    def render_passes_mask(self, object mask):
+        if mask is not None:
+            self.get_c_node().render_passes(
+                optional[unordered_set[int16_t]](_mask_to_c_indices(mask, 0))
+            )
+        else:
+            self.get_c_node().render_passes(
+                optional[unordered_set[int16_t]](nullopt)
+            )
+
+    @property
+    def effective_render_passes_mask(self):
+        return _c_indices_to_mask(self.get_c_node().effective_render_passes(), 0)
+
     @property
     def position(self):
         return Vector.from_c_vector(self.get_c_node().position())
@@ -281,7 +691,28 @@ cdef class NodeBase:
 
     @position.setter
     def position(self, Vector vec):
-        self.get_c_node().position(vec.c_vector)
+        cdef _PendingNodeUpdate pending = self._get_pending_update()
+        if pending is not None:
+            pending.c_position = vec.c_vector
+            pending.fields |= PendingNodeField.pending_node_position
+        else:
+            self.get_c_node().position(vec.c_vector)
+        self._mark_changed()
+
+    def read_position_into(self, MutableVector vector not None):
+        vector.c_vector = self.get_c_node().position()
+        return vector
+
+    def write_position_from(self, vector not None):
+        cdef:
+            CDVec2 c_position = _get_c_vector(vector)
+            _PendingNodeUpdate pending = self._get_pending_update()
+        if pending is not None:
+            pending.c_position = c_position
+            pending.fields |= PendingNodeField.pending_node_position
+        else:
+            self.get_c_node().position(c_position)
+        self._mark_changed()
 
     def get_relative_position(self, NodeBase ancestor not None):
         return Vector.from_c_vector(
@@ -296,10 +727,20 @@ cdef class NodeBase:
 
     @z_index.setter
     def z_index(self, value):
+        cdef:
+            optional[int16_t] c_z_index
+            _PendingNodeUpdate pending = self._get_pending_update()
+
         if value is not None:
-            self.get_c_node().z_index(optional[int16_t](<int>value))
+            c_z_index = optional[int16_t](<int>value)
+        else:
+            c_z_index = optional[int16_t](nullopt)
+
+        if pending is not None:
+            pending.c_z_index = c_z_index
+            pending.fields |= PendingNodeField.pending_node_z_index
         else:
-            self.get_c_node().z_index(optional[int16_t](nullopt))
+            self.get_c_node().z_index(c_z_index)
 
     @property
     def effective_z_index(self):
@@ -315,7 +756,16 @@ cdef class NodeBase:
 
     @rotation.setter
     def rotation(self, double value):
-        self.get_c_node().rotation(value)
+        self._set_rotation(value)
+
+    cdef void _set_rotation(self, double value) except *:
+        cdef _PendingNodeUpdate pending = self._get_pending_update()
+        if pending is not None:
+            pending.c_rotation = value
+            pending.fields |= PendingNodeField.pending_node_rotation
+        else:
+            self.get_c_node().rotation(value)
+        self._mark_changed()
 
     @property
     def rotation_degrees(self):
@@ -327,7 +777,7 @@ cdef class NodeBase:
 
     @rotation_degrees.setter
     def rotation_degrees(self, double value):
-        self.get_c_node().rotation(radians(value))
+        self._set_rotation(radians(value))
 
     @property
     def scale(self):
@@ -339,7 +789,13 @@ cdef class NodeBase:
 
     @scale.setter
     def scale(self, Vector vec):
-        self.get_c_node().scale(vec.c_vector)
+        cdef _PendingNodeUpdate pending = self._get_pending_update()
+        if pending is not None:
+            pending.c_scale = vec.c_vector
+            pending.fields |= PendingNodeField.pending_node_scale
+        else:
+            self.get_c_node().scale(vec.c_vector)
+        self._mark_changed()
 
     @property
     def transformation(self):
@@ -347,7 +803,20 @@ cdef class NodeBase:
 
     @transformation.setter
     def transformation(self, Transformation transformation not None):
-        self.get_c_node().transformation(transformation.c_transformation)
+        cdef _PendingNodeUpdate pending = self._get_pending_update()
+        if pending is not None:
+            pending.c_transformation = transformation.c_transformation
+            # transformation overrides previously written components
+            pending.fields = (
+                pending.fields & ~(
+                    PendingNodeField.pending_node_position
+                    | PendingNodeField.pending_node_rotation
+                    | PendingNodeField.pending_node_scale
+                )
+            ) | PendingNodeField.pending_node_transformation
+        else:
+            self.get_c_node().transformation(transformation.c_transformation)
+        self._mark_changed()
 
     @property
     def absolute_transformation(self):
@@ -367,6 +836,7 @@ cdef class NodeBase:
     @color.setter
     def color(self, Color col):
         self.get_c_node().color(col.c_color)
+        self._mark_changed()
 
     @property
     def visible(self):
@@ -374,7 +844,13 @@ cdef class NodeBase:
 
     @visible.setter
     def visible(self, bint value):
-        self.get_c_node().visible(value)
+        cdef _PendingNodeUpdate pending = self._get_pending_update()
+        if pending is not None:
+            pending.c_visible = value
+            pending.fields |= PendingNodeField.pending_node_visible
+        else:
+            self.get_c_node().visible(value)
+        self._mark_changed()
 
     @property
     def sprite(self):
@@ -387,6 +863,7 @@ cdef class NodeBase:
             self.get_c_node().sprite(sprite.c_sprite)
         else:
             self.get_c_node().sprite(CSprite())
+        self._mark_changed()
 
     @property
     def material(self):
@@ -445,6 +922,44 @@ cdef class NodeBase:
             self.get_c_node().transition(transition.c_handle)
         else:
             self.get_c_node().transition(CNodeTransitionHandle())
+        # node changed by a transition is checked by change journals
+        self._mark_changed()
+
+    def run_transition(self, transition_or_list):
+        cdef object future = _get_event_loop().create_future()
+
+        def _resolve(node):
+            if not future.done():
+                future.set_result(node)
+
+        if isinstance(transition_or_list, list):
+            transitions = transition_or_list + [NodeTransitionCallback(_resolve)]
+        else:
+            transitions = [transition_or_list, NodeTransitionCallback(_resolve)]
+        self.transition = NodeTransitionsSequence(transitions)
+        return future
+
+    @property
+    def frozen(self):
+        return self._frozen_subtree is not None
+
+    @frozen.setter
+    def frozen(self, bint value):
+        cdef CNode* c_node = self.get_c_node()
+        if value == (self._frozen_subtree is not None):
+            return
+        # state of the subtree is already stashed by the frozen ancestor
+        if _is_c_node_in_frozen_subtree(c_node):
+            raise ValueError(
+                'Cannot change frozen status of a node inside a frozen subtree.'
+            )
+        if value:
+            if c_node.scene() == NULL:
+                raise ValueError('Only nodes added to a scene can be frozen.')
+            self._frozen_subtree = _FrozenSubtree.freeze(c_node)
+        else:
+            self._frozen_subtree.restore(c_node)
+            self._frozen_subtree = None
 
     @property
     def transitions_manager(self):
@@ -490,6 +1005,30 @@ cdef set c_indices_to_set(vector[int16_t]& c_indices):
     return result
 
 
+cdef uint32_t _c_indices_to_mask(const vector[int16_t]& c_indices,
+                                 int16_t c_offset) nogil:
+    cdef:
+        int16_t c_index
+        uint32_t mask = 0
+
+    for c_index in c_indices:
+        mask |= (<uint32_t>1) << <uint32_t>(c_index - c_offset)
+    return mask
+
+
+cdef unordered_set[int16_t] _mask_to_c_indices(uint32_t mask, int16_t c_offset):
+    cdef:
+        int16_t bit = 0
+        unordered_set[int16_t] c_indices
+
+    while mask:
+        if mask & 1:
+            c_indices.insert(bit + c_offset)
+        mask >>= 1
+        bit += 1
+    return c_indices
+
+
 cdef class Node(NodeBase):
     def __init__(self, **options):
         self.make_c_node(CNodeType.basic)
@@ -499,25 +1038,364 @@ cdef class Node(NodeBase):
 cdef NodeBase get_node_wrapper(CNodePtr c_node_ptr):
     cdef CNode* c_node = c_node_ptr.get()
     assert c_node != NULL, "Cannot make wrapper for NULL node."
+    # TODO typeid assert?
+    cdef CPyNodeWrapper* c_wrapper = <CPyNodeWrapper*>c_node.wrapper_ptr()
     cdef NodeBase py_node
-    if c_node.wrapper_ptr() != NULL:
-        # TODO typeid assert?
-        py_node = <object>(
-            <CPyNodeWrapper*>c_node.wrapper_ptr()
-        ).py_wrapper
-    elif c_node.type() == CNodeType.space:
-        py_node = SpaceNode.__new__(SpaceNode)
-        py_node.attach_c_node(c_node_ptr)
-    elif c_node.type() == CNodeType.body:
-        py_node = BodyNode.__new__(BodyNode)
-        py_node.attach_c_node(c_node_ptr)
-    elif c_node.type() == CNodeType.hitbox:
-        py_node = HitboxNode.__new__(HitboxNode)
-        py_node.attach_c_node(c_node_ptr)
-    elif c_node.type() == CNodeType.text:
-        py_node = TextNode.__new__(TextNode)
-        py_node.attach_c_node(c_node_ptr)
+    if c_wrapper != NULL and c_wrapper.py_wrapper != NULL:
+        py_node = <object>c_wrapper.py_wrapper
     else:
-        py_node = Node.__new__(Node)
+        py_node = _make_node_wrapper(c_node.type())
         py_node.attach_c_node(c_node_ptr)
+        if c_wrapper == NULL:
+            py_node._setup_c_node_wrapper()
+            c_wrapper = <CPyNodeWrapper*>c_node.wrapper_ptr()
+        else:
+            c_wrapper.py_wrapper = <PyObject*>py_node
+        # node keeps the wrapper alive (and returns it on subsequent
+        # lookups) until it gets detached
+        c_wrapper.on_add_to_parent()
     return py_node
+
+
+cdef CPyNodeWrapper* _get_c_node_wrapper(CNode* c_node) except NULL:
+    # makes wrapper without python object if node has none
+    if c_node.wrapper_ptr() == NULL:
+        c_node.setup_wrapper(
+            unique_ptr[CForeignNodeWrapper](
+                new CPyNodeWrapper(c_node, NULL, False, False)
+            )
+        )
+    return <CPyNodeWrapper*>c_node.wrapper_ptr()
+
+
+cdef int _mark_c_node_changed(CNode* c_node) except -1:
+    # reports node to the change tracker of its scene, if there is one
+    cdef CPyScene* c_scene = <CPyScene*>c_node.scene()
+    if c_scene != NULL and c_scene.changes_tracker != NULL:
+        (<_NodeChangesTracker>c_scene.changes_tracker).mark(c_node)
+    return 0
+
+
+cdef int _apply_c_node_pending_update(CNode* c_node) except -1:
+    # writes buffered by batch_update or deferred_updates are kept
+    # by python object, code accessing nodes directly must apply them first
+    cdef:
+        CPyNodeWrapper* c_wrapper = <CPyNodeWrapper*>c_node.wrapper_ptr()
+        _PendingNodeUpdate pending
+
+    if c_wrapper == NULL or c_wrapper.py_wrapper == NULL:
+        return 0
+    pending = (<NodeBase>c_wrapper.py_wrapper)._pending_update
+    if pending is not None and pending.fields:
+        pending.apply(c_node)
+    return 0
+
+
+cdef CNodeRef _get_c_node_ref(CNode* c_node) except *:
+    cdef CPyNodeWrapper* c_wrapper = _get_c_node_wrapper(c_node)
+    if not c_wrapper.c_node_ref:
+        c_wrapper.c_node_ref = make_shared[CNodeRawPtr](c_node)
+    return c_wrapper.c_node_ref
+
+
+cdef NodeBase _make_node_wrapper(CNodeType node_type):
+    if node_type == CNodeType.space:
+        return SpaceNode.__new__(SpaceNode)
+    elif node_type == CNodeType.body:
+        return BodyNode.__new__(BodyNode)
+    elif node_type == CNodeType.hitbox:
+        return HitboxNode.__new__(HitboxNode)
+    elif node_type == CNodeType.text:
+        return TextNode.__new__(TextNode)
+    return Node.__new__(Node)
+
+
+cdef tuple _NODE_CLASSES = (NodeBase, Node, SpaceNode, BodyNode, HitboxNode, TextNode)
+
+
+cdef uint32_t _node_classes_to_c_types_mask(tuple classes) except? 0:
+    cdef uint32_t c_types_mask = 0
+
+    for cls in classes:
+        if not isinstance(cls, type) or not issubclass(cls, NodeBase):
+            raise TypeError(f'Expected node class, got: {cls}.')
+        if issubclass(cls, SpaceNode):
+            c_types_mask |= 1 << <uint32_t>CNodeType.space
+        elif issubclass(cls, BodyNode):
+            c_types_mask |= 1 << <uint32_t>CNodeType.body
+        elif issubclass(cls, HitboxNode):
+            c_types_mask |= 1 << <uint32_t>CNodeType.hitbox
+        elif issubclass(cls, TextNode):
+            c_types_mask |= 1 << <uint32_t>CNodeType.text
+        elif issubclass(cls, Node):
+            c_types_mask |= 1 << <uint32_t>CNodeType.basic
+        else:
+            c_types_mask = UINT32_MAX
+    return c_types_mask
+
+
+cdef void _walk_c_nodes(
+    CNode* c_root, bint breadth_first, uint32_t c_types_mask,
+    bint visible_only, uint32_t max_depth, vector[CNodeRef]& c_results
+) except *:
+    cdef:
+        # pending nodes along with their depth, used as a queue
+        # (breadth first) or as a stack (depth first)
+        vector[pair[CNodeRawPtr, uint32_t]] c_pending
+        pair[CNodeRawPtr, uint32_t] c_entry
+        vector[CNode*] c_children
+        size_t c_head = 0
+        Py_ssize_t i
+
+    c_pending.push_back(pair[CNodeRawPtr, uint32_t](c_root, 0))
+    while c_head < c_pending.size():
+        if breadth_first:
+            c_entry = c_pending[c_head]
+            c_head += 1
+        else:
+            c_entry = c_pending.back()
+            c_pending.pop_back()
+
+        # invisible nodes hide their descendants as well
+        if visible_only and not c_entry.first.visible():
+            continue
+        if (
+            c_entry.second > 0
+            and c_types_mask & (1 << <uint32_t>c_entry.first.type())
+        ):
+            # references let the iterator skip nodes deleted meanwhile
+            c_results.push_back(_get_c_node_ref(c_entry.first))
+        if c_entry.second >= max_depth:
+            continue
+
+        c_children = c_entry.first.children()
+        if breadth_first:
+            for i in range(<Py_ssize_t>c_children.size()):
+                c_pending.push_back(
+                    pair[CNodeRawPtr, uint32_t](c_children[i], c_entry.second + 1)
+                )
+        else:
+            # reversed, so children are popped in their original order
+            for i in range(<Py_ssize_t>c_children.size() - 1, -1, -1):
+                c_pending.push_back(
+                    pair[CNodeRawPtr, uint32_t](c_children[i], c_entry.second + 1)
+                )
+
+
+cdef uint32_t _count_c_descendants(CNode* c_node) except? 0:
+    cdef:
+        CNode* c_child
+        uint32_t count = 0
+
+    for c_child in c_node.children():
+        count += 1 + _count_c_descendants(c_child)
+    return count
+
+
+@cython.final
+cdef class _NodesIterator:
+    cdef:
+        # references turn NULL when nodes get deleted during iteration
+        vector[CNodeRef] c_nodes
+        size_t c_index
+        # set when nodes have to be filtered by python class
+        tuple types_filter
+
+    @staticmethod
+    cdef _NodesIterator create(vector[CNodeRef]& c_nodes, tuple types_filter):
+        cdef _NodesIterator iterator = _NodesIterator.__new__(_NodesIterator)
+        iterator.c_nodes.swap(c_nodes)
+        iterator.types_filter = types_filter
+        return iterator
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        cdef:
+            NodeBase node
+            CNode* c_node
+        while self.c_index < self.c_nodes.size():
+            c_node = self.c_nodes[self.c_index].get()[0]
+            self.c_index += 1
+            if c_node == NULL:
+                continue
+            node = get_node_wrapper(CNodePtr(c_node))
+            if self.types_filter is None or isinstance(node, self.types_filter):
+                return node
+        raise StopIteration
+
+
+cdef optional[unordered_set[int16_t]] _c_indices_to_c_optional_set(
+    optional[vector[int16_t]] c_indices
+):
+    cdef:
+        int16_t c_index
+        unordered_set[int16_t] c_indices_set
+
+    if not c_indices.has_value():
+        return optional[unordered_set[int16_t]](nullopt)
+    for c_index in c_indices.value():
+        c_indices_set.insert(c_index)
+    return optional[unordered_set[int16_t]](c_indices_set)
+
+
+cdef void _copy_c_node_properties(CNode* c_source, CNode* c_target) except *:
+    cdef CNodeType node_type = c_source.type()
+
+    # type-specific properties go first, hitbox shape
+    # must be set before any other hitbox property
+    if node_type == CNodeType.space:
+        c_target.space.gravity(c_source.space.gravity())
+        c_target.space.damping(c_source.space.damping())
+        c_target.space.sleeping_threshold(c_source.space.sleeping_threshold())
+    elif node_type == CNodeType.body:
+        c_target.body.body_type(c_source.body.body_type())
+        # kinematic and static bodies have infinite mass and moment,
+        # which can't be set
+        if c_source.body.body_type() == CBodyNodeType.dynamic:
+            c_target.body.mass(c_source.body.mass())
+            c_target.body.moment(c_source.body.moment())
+        c_target.body.center_of_gravity(c_source.body.center_of_gravity())
+        c_target.body.velocity(c_source.body.velocity())
+        c_target.body.angular_velocity(c_source.body.angular_velocity())
+        c_target.body.damping(c_source.body.damping())
+        c_target.body.gravity(c_source.body.gravity())
+    elif node_type == CNodeType.hitbox:
+        c_target.shape(c_source.shape())
+        c_target.hitbox.group(c_source.hitbox.group())
+        c_target.hitbox.mask(c_source.hitbox.mask())
+        c_target.hitbox.collision_mask(c_source.hitbox.collision_mask())
+        c_target.hitbox.trigger_id(c_source.hitbox.trigger_id())
+        c_target.hitbox.sensor(c_source.hitbox.sensor())
+        c_target.hitbox.elasticity(c_source.hitbox.elasticity())
+        c_target.hitbox.friction(c_source.hitbox.friction())
+        c_target.hitbox.surface_velocity(c_source.hitbox.surface_velocity())
+    elif node_type == CNodeType.text:
+        c_target.text.font(c_source.text.font())
+        c_target.text.content(c_source.text.content())
+        c_target.text.font_size(c_source.text.font_size())
+        c_target.text.line_width(c_source.text.line_width())
+        c_target.text.interline_spacing(c_source.text.interline_spacing())
+        c_target.text.first_line_indent(c_source.text.first_line_indent())
+
+    c_target.position(c_source.position())
+    c_target.z_index(c_source.z_index())
+    c_target.rotation(c_source.rotation())
+    c_target.scale(c_source.scale())
+    c_target.visible(c_source.visible())
+    c_target.color(c_source.color())
+    c_target.sprite(c_source.sprite())
+    c_target.material(c_source.material())
+    # text nodes generate their own shapes
+    if node_type != CNodeType.hitbox and node_type != CNodeType.text:
+        c_target.shape(c_source.shape())
+    c_target.origin_alignment(c_source.origin_alignment())
+    c_target.lifetime(c_source.lifetime())
+    c_target.transition(c_source.transition())
+    c_target.viewports(_c_indices_to_c_optional_set(c_source.viewports()))
+    c_target.render_passes(
+        _c_indices_to_c_optional_set(c_source.render_passes())
+    )
+    c_target.indexable(c_source.indexable())
+    c_target.stencil_mode(c_source.stencil_mode())
+
+
+cdef void _move_c_node_wrappers(
+    CNode* c_source, CNode* c_target, bint is_subtree_root, bint keep_slots
+) except *:
+    cdef:
+        CPyNodeWrapper* c_wrapper = <CPyNodeWrapper*>c_source.wrapper_ptr()
+        CPyNodeWrapper* c_target_wrapper
+        vector[CNode*] c_source_children = c_source.children()
+        vector[CNode*] c_target_children = c_target.children()
+        size_t i
+
+    if c_wrapper != NULL:
+        # old wrapper keeps its reference until source node gets
+        # destroyed, but it no longer resets python object
+        # nor releases node slot on detach
+        c_wrapper.moved = True
+        if c_wrapper.py_wrapper != NULL:
+            (<NodeBase>c_wrapper.py_wrapper).c_node_ptr = CNodePtr(c_target)
+        # node is already attached, on_attach must not be called again,
+        # cloned descendants already have a wrapper without python object
+        c_target_wrapper = _get_c_node_wrapper(c_target)
+        c_target_wrapper.py_wrapper = c_wrapper.py_wrapper
+        c_target_wrapper.on_attach_defined = False
+        c_target_wrapper.on_detach_defined = c_wrapper.on_detach_defined
+        c_target_wrapper.tags = c_wrapper.tags
+        c_target_wrapper.pooled = c_wrapper.pooled
+        if c_wrapper.c_node_ref:
+            c_wrapper.c_node_ref.get()[0] = c_target
+            c_target_wrapper.c_node_ref = c_wrapper.c_node_ref
+            c_wrapper.c_node_ref.reset()
+        if c_wrapper.c_slots:
+            if keep_slots:
+                c_target_wrapper.c_slots = c_wrapper.c_slots
+                c_target_wrapper.slot = c_wrapper.slot
+                c_wrapper.c_slots.get().nodes[c_wrapper.slot] = c_target
+            else:
+                c_wrapper.c_slots.get().release(c_wrapper.slot)
+            c_wrapper.c_slots.reset()
+        # subtree root gets its reference when added to the new parent
+        if not is_subtree_root:
+            c_target_wrapper.on_add_to_parent()
+
+    for i in range(c_source_children.size()):
+        _move_c_node_wrappers(
+            c_source_children[i], c_target_children[i], False, keep_slots
+        )
+
+
+cdef int _check_c_subtree_copyable(CNode* c_root) except -1:
+    # state of physics nodes and running transitions can't be copied,
+    # so moving such subtree would silently reset them
+    cdef:
+        vector[CNode*] c_pending
+        CPyNodeWrapper* c_wrapper
+        CNode* c_node
+        CNode* c_child
+        string c_name
+
+    c_pending.push_back(c_root)
+    while not c_pending.empty():
+        c_node = c_pending.back()
+        c_pending.pop_back()
+        for c_child in c_node.children():
+            c_pending.push_back(c_child)
+
+        if c_node.type() in (CNodeType.space, CNodeType.body, CNodeType.hitbox):
+            raise ValueError(
+                'Cannot recreate node with physics nodes in its subtree.'
+            )
+        if c_node.transition():
+            raise ValueError(
+                'Cannot recreate node with running transitions in its subtree.'
+            )
+        c_wrapper = <CPyNodeWrapper*>c_node.wrapper_ptr()
+        if c_wrapper == NULL:
+            continue
+        for c_name in c_wrapper.transition_names:
+            if c_node.transitions_manager().get(c_name):
+                raise ValueError(
+                    'Cannot recreate node with running transitions in its subtree.'
+                )
+    return 0
+
+
+cdef CNodeOwnerPtr _clone_c_node(CNode* c_source, bint deep) except *:
+    cdef:
+        CNodeOwnerPtr c_node_owner = cmove(c_make_node(c_source.type()))
+        CNodeOwnerPtr c_child_owner
+        CNode* c_child
+
+    _copy_c_node_properties(c_source, c_node_owner.get())
+    if deep:
+        for c_child in c_source.children():
+            c_child_owner = cmove(_clone_c_node(c_child, True))
+            # descendants are never wrapped by python object made
+            # in clone(), wrapper lets their deletion be counted
+            _get_c_node_wrapper(c_child_owner.get())
+            c_node_owner.get().add_child(c_child_owner)
+    return cmove(c_node_owner)
@@ -1,4 +1,9 @@
-from ._kaa import Node, SpaceNode, BodyNode, HitboxNode
+from ._kaa import (
+    Node, SpaceNode, BodyNode, HitboxNode, NodeBatch, NodePool, NodeChanges,
+)
 
 
-__all__ = ('Node', 'SpaceNode', 'BodyNode', 'HitboxNode')
+__all__ = (
+    'Node', 'SpaceNode', 'BodyNode', 'HitboxNode', 'NodeBatch', 'NodePool',
+    'NodeChanges',
+)
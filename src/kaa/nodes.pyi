@@ -1,16 +1,26 @@
 from __future__ import annotations
 
-from typing import Iterable, Optional, Set, TypeVar
+import asyncio
+from typing import (
+    Any, Callable, ContextManager, final, Iterable, Iterator, MutableMapping,
+    Optional, Set, Type, TypeVar, Union
+)
 
 from .colors import Color
 from .sprites import Sprite
 from .engine import AnyScene
 from .materials import Material
-from .geometry import AnyShape, Alignment, BoundingBox, Transformation, Vector
+from .geometry import (
+    AnyShape, Alignment, ArrayBuffer, BoundingBox, MutableVector, Transformation, Vector
+)
 from .transitions import AnyTransition, AnyTransitionArgument, NodeTransitionsManager
 from .stencil import StencilMode
 
 
+# any object supporting buffer protocol, e.g. numpy array
+ArrayLike = Any
+
+
 class NodeBase:
     @property
     def absolute_position(self) -> Vector:
@@ -56,10 +66,26 @@ class NodeBase:
     def effective_render_passes(self) -> Set[int]:
         ...
 
+    @property
+    def effective_viewports_mask(self) -> int:
+        ...
+
+    @property
+    def effective_render_passes_mask(self) -> int:
+        ...
+
     @property
     def effective_z_index(self) -> int:
         ...
 
+    @property
+    def frozen(self) -> bool:
+        ...
+
+    @frozen.setter
+    def frozen(self, value: bool) -> None:
+        ...
+
     @property
     def indexable(self) -> bool:
         ...
@@ -176,6 +202,22 @@ class NodeBase:
     def type(self) -> int:
         ...
 
+    @property
+    def data(self) -> MutableMapping[str, Any]:
+        ...
+
+    @property
+    def handle(self) -> int:
+        ...
+
+    @property
+    def tags(self) -> int:
+        ...
+
+    @tags.setter
+    def tags(self, value: int) -> None:
+        ...
+
     @property
     def viewports(self) -> Optional[Set[int]]:
         ...
@@ -192,6 +234,22 @@ class NodeBase:
     def render_passes(self, value: Optional[Set[int]]) -> None:
         ...
 
+    @property
+    def viewports_mask(self) -> Optional[int]:
+        ...
+
+    @viewports_mask.setter
+    def viewports_mask(self, value: Optional[int]) -> None:
+        ...
+
+    @property
+    def render_passes_mask(self) -> Optional[int]:
+        ...
+
+    @render_passes_mask.setter
+    def render_passes_mask(self, value: Optional[int]) -> None:
+        ...
+
     @property
     def visible(self) -> bool:
         ...
@@ -216,15 +274,36 @@ class NodeBase:
     def z_index(self, value: Optional[int]) -> None:
         ...
 
+    def batch_update(self: AnyNode) -> ContextManager[AnyNode]:
+        ...
+
+    # copies are instances of base kaa classes, not of subclasses
+    def clone(self, deep: bool = True) -> NodeBase:
+        ...
+
     def delete(self) -> None:
         ...
 
+    def descendants_count(self) -> int:
+        ...
+
     def get_relative_position(self, ancestor: NodeBase) -> Vector:
         ...
 
+    def read_position_into(self, vector: MutableVector) -> MutableVector:
+        ...
+
+    def write_position_from(self, vector: Union[Vector, MutableVector]) -> None:
+        ...
+
     def get_relative_transformation(self, ancestor: NodeBase) -> Transformation:
         ...
 
+    def run_transition(
+        self: AnyNode, transition: AnyTransitionArgument
+    ) -> asyncio.Future[AnyNode]:
+        ...
+
     def __bool__(self) -> bool:
         ...
 
@@ -247,12 +326,18 @@ class Node(NodeBase):
         transformation: Transformation = Transformation(),
         visible: bool = True,
         viewports: Optional[Set[int]] = None,
+        viewports_mask: Optional[int] = None,
         render_passes: Optional[Set[int]] = None,
+        render_passes_mask: Optional[int] = None,
         indexable: bool = True,
+        tags: int = 0,
         stencil_mode: Optional[StencilMode] = None,
     ) -> None:
         ...
 
+    def clone(self, deep: bool = True) -> Node:
+        ...
+
     def setup(
         self, *,
         position: Vector = ...,
@@ -270,8 +355,11 @@ class Node(NodeBase):
         transformation: Transformation = ...,
         visible: bool = ...,
         viewports: Optional[Set[int]] = ...,
+        viewports_mask: Optional[int] = ...,
         render_passes: Optional[Set[int]] = ...,
+        render_passes_mask: Optional[int] = ...,
         indexable: bool = ...,
+        tags: int = ...,
         stencil_mode: Optional[StencilMode] = ...,
     ) -> None:
         ...
@@ -279,5 +367,180 @@ class Node(NodeBase):
     def add_child(self, node: AnyNode) -> AnyNode:
         ...
 
+    def recreate_under(
+        self: AnyNode, new_parent: NodeBase,
+        keep_absolute_transform: bool = True,
+    ) -> AnyNode:
+        ...
+
+    def walk(
+        self, order: str = 'depth',
+        types: Optional[Union[Type[NodeBase], Iterable[Type[NodeBase]]]] = None,
+        visible_only: bool = False, max_depth: Optional[int] = None,
+    ) -> Iterator[NodeBase]:
+        ...
+
+    def spawn_children(
+        self, count: int, *,
+        positions: Optional[ArrayLike] = ...,
+        rotations: Optional[ArrayLike] = ...,
+        scales: Optional[ArrayLike] = ...,
+        colors: Optional[ArrayLike] = ...,
+        z_indices: Optional[ArrayLike] = ...,
+        lifetimes: Optional[ArrayLike] = ...,
+        position: Vector = ...,
+        rotation: float = ...,
+        rotation_degrees: float = ...,
+        scale: Vector = ...,
+        z_index: Optional[int] = ...,
+        color: Color = ...,
+        sprite: Optional[Sprite] = ...,
+        material: Optional[Material] = ...,
+        shape: Optional[AnyShape] = ...,
+        origin_alignment: Alignment = ...,
+        lifetime: float = ...,
+        transition: AnyTransitionArgument = ...,
+        visible: bool = ...,
+        viewports: Optional[Set[int]] = ...,
+        viewports_mask: Optional[int] = ...,
+        render_passes: Optional[Set[int]] = ...,
+        render_passes_mask: Optional[int] = ...,
+        indexable: bool = ...,
+        tags: int = ...,
+        stencil_mode: Optional[StencilMode] = ...,
+    ) -> NodeBatch:
+        ...
+
 
 AnyNode = TypeVar('AnyNode', bound=NodeBase)
+
+
+@final
+class NodeBatch:
+    def __init__(self, nodes: Iterable[NodeBase]) -> None:
+        ...
+
+    @property
+    def positions(self) -> ArrayBuffer:
+        ...
+
+    @property
+    def rotations(self) -> ArrayBuffer:
+        ...
+
+    @property
+    def scales(self) -> ArrayBuffer:
+        ...
+
+    @property
+    def colors(self) -> ArrayBuffer:
+        ...
+
+    @property
+    def alive(self) -> ArrayBuffer:
+        ...
+
+    def pull(self, fields: Optional[Iterable[str]] = None) -> None:
+        ...
+
+    def push(self, fields: Optional[Iterable[str]] = None) -> None:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+    def __getitem__(self, index: int) -> Optional[AnyNode]:
+        ...
+
+    def __iter__(self) -> Iterator[Optional[AnyNode]]:
+        ...
+
+
+@final
+class NodePool:
+    def __init__(
+        self, factory: Callable[[], AnyNode], capacity: int,
+        parent: NodeBase, name: str = 'node_pool',
+    ) -> None:
+        ...
+
+    @property
+    def capacity(self) -> int:
+        ...
+
+    @property
+    def name(self) -> str:
+        ...
+
+    @property
+    def hits(self) -> int:
+        ...
+
+    @property
+    def misses(self) -> int:
+        ...
+
+    @property
+    def free_count(self) -> int:
+        ...
+
+    def acquire(self, **options: Any) -> AnyNode:
+        ...
+
+    def release(self, node: NodeBase) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+
+@final
+class NodeChanges:
+    TRANSFORM: int
+    VISIBLE: int
+    SPRITE: int
+    COLOR: int
+
+    @property
+    def node_ids(self) -> ArrayBuffer:
+        ...
+
+    @property
+    def changed_fields(self) -> ArrayBuffer:
+        ...
+
+    @property
+    def removed_node_ids(self) -> ArrayBuffer:
+        ...
+
+    @property
+    def positions(self) -> Optional[ArrayBuffer]:
+        ...
+
+    @property
+    def rotations(self) -> Optional[ArrayBuffer]:
+        ...
+
+    @property
+    def scales(self) -> Optional[ArrayBuffer]:
+        ...
+
+    @property
+    def visible(self) -> Optional[ArrayBuffer]:
+        ...
+
+    @property
+    def colors(self) -> Optional[ArrayBuffer]:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+    def __getitem__(self, index: int) -> Optional[AnyNode]:
+        ...
+
+    def __iter__(self) -> Iterator[Optional[AnyNode]]:
+        ...
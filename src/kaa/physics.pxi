@@ -558,6 +558,8 @@ cdef class BodyNode(NodeBase):
     @body_type.setter
     def body_type(self, body_t):
         self.get_c_node().body.body_type(<CBodyNodeType>(<uint8_t>body_t.value))
+        # bodies turned dynamic are changed by the engine
+        _mark_c_node_changed(self.get_c_node())
 
     @property
     def local_force(self):
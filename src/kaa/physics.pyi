@@ -198,6 +198,9 @@ class HitboxNode(NodeBase):
     ) -> None:
         ...
 
+    def clone(self, deep: bool = True) -> HitboxNode:
+        ...
+
     def setup(
         self, *,
         position: Vector = ...,
@@ -324,6 +327,9 @@ class BodyNode(NodeBase):
     ) -> None:
         ...
 
+    def clone(self, deep: bool = True) -> BodyNode:
+        ...
+
     def setup(
         self, *,
         position: Vector = ...,
@@ -539,6 +545,9 @@ class SpaceNode(NodeBase):
     ) -> None:
         ...
 
+    def clone(self, deep: bool = True) -> SpaceNode:
+        ...
+
     def setup(
         self, *,
         position: Vector = ...,
@@ -1,15 +1,17 @@
 import cython
+import asyncio
 import weakref
-from libc.stdint cimport uint32_t
+from libcpp cimport bool
+from libc.stdint cimport uint8_t, uint32_t, uint64_t
 from libcpp.memory cimport unique_ptr
 from cpython.weakref cimport PyWeakref_NewRef
 from cpython.ref cimport PyObject, Py_INCREF, Py_DECREF
 
 from .kaacore.scenes cimport CScene
-from .kaacore.nodes cimport CNodePtr
+from .kaacore.nodes cimport CNode, CNodePtr
 from .kaacore.clock cimport CDuration
 from .kaacore.glue cimport CPythonicCallbackResult
-from .kaacore.engine cimport is_c_engine_initialized
+from .kaacore.engine cimport is_c_engine_initialized, get_c_engine
 from .kaacore.render_passes cimport default_pass_index
 from .kaacore.viewports cimport default_viewport_z_index
 from .kaacore.log cimport c_emit_log_dynamic, CLogLevel, _log_category_wrapper
@@ -17,13 +19,47 @@ from .kaacore.log cimport c_emit_log_dynamic, CLogLevel, _log_category_wrapper
 DEF SCENE_RESOURCE_FREELIST_SIZE = 8
 
 
+# asyncio event loop driven by the engine between frames,
+# set for the time of `Engine.run_async` call.
+cdef object _engine_event_loop = None
+
+
+cdef object _get_event_loop():
+    if _engine_event_loop is not None:
+        return _engine_event_loop
+    # raises RuntimeError if called outside of a running loop
+    return asyncio.get_running_loop()
+
+
+cdef void _run_event_loop_once(object loop) except *:
+    # stop() scheduled upfront makes run_forever()
+    # process only callbacks which are ready at the moment
+    loop.call_soon(loop.stop)
+    loop.run_forever()
+
+
 cdef cppclass CPyScene(CScene):
     object py_scene_weakref
+    # Used by manual frame stepping: number of frames left
+    # before engine is requested to quit (0 means no limit).
+    uint32_t frames_limit
+    # python's `on_enter` was called and `on_exit` was not
+    bool entered
+    # set when stepping quits the engine, the scene stays
+    # entered until it's run again or another scene is run
+    bool keep_entered
+    # _NodeChangesTracker owned by python scene, NULL until
+    # changes are consumed for the first time
+    PyObject* changes_tracker
 
     __init__(object py_scene):
         c_emit_log_dynamic(CLogLevel.debug, _log_category_wrapper,
                     'Created CPyScene')
         this.py_scene_weakref = PyWeakref_NewRef(py_scene, None)
+        this.frames_limit = 0
+        this.entered = False
+        this.changes_tracker = NULL
+        this.keep_entered = False
 
     object get_py_scene():
         cdef object py_scene = this.py_scene_weakref()
@@ -49,25 +85,46 @@ cdef cppclass CPyScene(CScene):
     CPythonicCallbackResult[void] _call_py_update(CDuration dt) noexcept with gil:
         try:
             this.get_py_scene().update(dt.count())
+
+            if _engine_event_loop is not None:
+                _run_event_loop_once(_engine_event_loop)
+
+            if this.frames_limit > 0:
+                this.frames_limit -= 1
+                if this.frames_limit == 0:
+                    this.keep_entered = True
+                    get_c_engine().quit()
         except BaseException as exc:
             return CPythonicCallbackResult[void](<PyObject*>exc)
         return CPythonicCallbackResult[void]()
 
     CPythonicCallbackResult[void] _call_py_on_enter() noexcept with gil:
         try:
-            this.get_py_scene().on_enter()
+            if not this.entered:
+                this.get_py_scene().on_enter()
+                this.entered = True
         except BaseException as exc:
             return CPythonicCallbackResult[void](<PyObject*>exc)
         return CPythonicCallbackResult[void]()
 
     CPythonicCallbackResult[void] _call_py_on_exit() noexcept with gil:
+        if this.keep_entered:
+            this.keep_entered = False
+            return CPythonicCallbackResult[void]()
         try:
-            this.get_py_scene().on_exit()
+            _exit_c_scene(this)
         except BaseException as exc:
             return CPythonicCallbackResult[void](<PyObject*>exc)
         return CPythonicCallbackResult[void]()
 
 
+cdef void _exit_c_scene(CPyScene* c_scene) except *:
+    # also used for exiting the scene kept entered by stepping
+    if c_scene.entered:
+        c_scene.entered = False
+        c_scene.get_py_scene().on_exit()
+
+
 cdef class Scene:
     cdef:
         object __weakref__
@@ -77,6 +134,8 @@ cdef class Scene:
         readonly _ViewportsManager viewports
         readonly _RenderPassesManager render_passes
         readonly _SpatialIndexManager spatial_index
+        _NodeChangesTracker _changes_tracker
+        _NodeDataStorage _node_data_storage
 
     def __cinit__(self):
         if not is_c_engine_initialized():
@@ -135,6 +194,86 @@ cdef class Scene:
     def time_scale(self, double scale):
         self.c_scene.get().set_time_scale(scale)
 
+    def nodes_view(self, nodes):
+        cdef NodeBatch batch = NodeBatch(nodes)
+        batch._check_scene(self.c_scene.get())
+        return batch
+
+    cdef _NodeDataStorage _get_node_data_storage(self):
+        if self._node_data_storage is None:
+            self._node_data_storage = _NodeDataStorage.create()
+        return self._node_data_storage
+
+    def declare_node_field(self, str name not None, str dtype not None):
+        self._get_node_data_storage().declare(name, dtype)
+
+    def get_node_field(self, str name not None):
+        return self._get_node_data_storage().get_column(name)
+
+    def get_node_field_mask(self):
+        return self._get_node_data_storage().get_mask()
+
+    def get_node_field_nodes(self, indices):
+        return self._get_node_data_storage().get_nodes(indices)
+
+    def resolve(self, uint64_t handle):
+        cdef CNode* c_node = self._get_node_data_storage().resolve(handle)
+        if c_node != NULL:
+            return get_node_wrapper(CNodePtr(c_node))
+
+    def resolve_many(self, handles):
+        cdef:
+            _NodeDataStorage storage = self._get_node_data_storage()
+            const uint64_t[:] c_handles
+            CNode* c_node
+            list nodes = []
+            Py_ssize_t i
+
+        try:
+            c_handles = handles
+        except (TypeError, ValueError):
+            # not an uint64 buffer
+            return [self.resolve(handle) for handle in handles]
+
+        for i in range(c_handles.shape[0]):
+            c_node = storage.resolve(c_handles[i])
+            nodes.append(
+                get_node_wrapper(CNodePtr(c_node)) if c_node != NULL else None
+            )
+        return nodes
+
+    def consume_changes(self, fields=None):
+        if self._changes_tracker is None:
+            self._changes_tracker = _NodeChangesTracker.create(
+                self._get_node_data_storage()
+            )
+            self.c_scene.get().changes_tracker = \
+                <PyObject*>self._changes_tracker
+        return self._changes_tracker.consume(
+            _parse_node_change_fields(fields), &self.c_scene.get().root_node
+        )
+
+    def deferred_updates(self):
+        cdef _DeferredUpdates deferred_updates = \
+            _DeferredUpdates.__new__(_DeferredUpdates)
+        deferred_updates.c_scene = self.c_scene.get()
+        return deferred_updates
+
+    def sleep(self, double seconds):
+        cdef object loop = _get_event_loop()
+        cdef object future = loop.create_future()
+
+        def _wake_up(context):
+            if not future.done():
+                future.set_result(None)
+
+        timer = Timer(_wake_up)
+        # done callback keeps timer alive until it's needed
+        # and stops it if awaiting coroutine gets cancelled
+        future.add_done_callback(lambda _: timer.stop())
+        timer.start(seconds, self)
+        return future
+
     def on_enter(self):
         pass
 
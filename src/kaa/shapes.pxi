@@ -66,12 +66,8 @@ cdef class Circle(ShapeBase):
 
 
 cdef class Polygon(ShapeBase):
-    def __init__(self, list points):
-        assert all(isinstance(v, Vector) for v in points)
-        cdef vector[CDVec2] c_points
-        c_points.reserve(len(points))
-        for v in points:
-            c_points.push_back((<Vector>v).c_vector)
+    def __init__(self, points not None):
+        cdef vector[CDVec2] c_points = _c_points_from(points)
         self.set_stack_c_shape()
         self.c_shape_ptr[0] = CShape.Polygon(c_points)
 
@@ -1,17 +1,311 @@
 cimport cython
+from libcpp cimport bool
+from libc.math cimport INFINITY, fmax, fmin, sqrt
+from libc.stdint cimport (
+    int16_t, uint32_t, uint64_t, INT16_MIN, INT16_MAX, UINT32_MAX
+)
+from libcpp.algorithm cimport sort as c_sort
+from libcpp.utility cimport pair
+from libcpp.vector cimport vector
+from cpython.weakref cimport PyWeakref_NewRef
+from cpython.buffer cimport PyObject_CheckBuffer
 
+from .kaacore.nodes cimport CNode, CNodePtr, CNodeRawPtr
+from .kaacore.viewports cimport min_viewport_z_index
+from .kaacore.vectors cimport CDVec2
+from .kaacore.geometry cimport CBoundingBox
 from .kaacore.spatial_index cimport CSpatialIndex
 
+DEF NEAREST_QUERY_INITIAL_RADIUS = 64.
+DEF NEAREST_QUERY_MAX_STEPS = 16
+
+
+cdef struct CSpatialQueryFilter:
+    bool is_set
+    uint32_t types_mask
+    bool visible_only
+    int16_t min_z_index
+    int16_t max_z_index
+    bool has_viewports_mask
+    uint32_t viewports_mask
+    bool has_predicate_mask
+    uint32_t predicate_mask
+
+
+cdef CSpatialQueryFilter _make_spatial_query_filter(
+    object node_types, bint visible_only, object z_index_range,
+    object viewport_mask, object predicate_mask
+) except *:
+    cdef CSpatialQueryFilter c_filter
+    c_filter.types_mask = UINT32_MAX
+    c_filter.visible_only = visible_only
+    c_filter.min_z_index = INT16_MIN
+    c_filter.max_z_index = INT16_MAX
+    c_filter.has_viewports_mask = viewport_mask is not None
+    c_filter.viewports_mask = 0
+    c_filter.has_predicate_mask = predicate_mask is not None
+    c_filter.predicate_mask = 0
+
+    if node_types is not None:
+        c_filter.types_mask = _node_classes_to_c_types_mask(
+            (node_types,) if isinstance(node_types, type) else tuple(node_types)
+        )
+    if z_index_range is not None:
+        c_filter.min_z_index, c_filter.max_z_index = z_index_range
+    if viewport_mask is not None:
+        c_filter.viewports_mask = viewport_mask
+    if predicate_mask is not None:
+        c_filter.predicate_mask = predicate_mask
+
+    c_filter.is_set = (
+        node_types is not None or visible_only or z_index_range is not None
+        or c_filter.has_viewports_mask or c_filter.has_predicate_mask
+    )
+    return c_filter
+
+
+cdef bint _c_node_matches_filter(
+    CNode* c_node, const CSpatialQueryFilter& c_filter
+) except -1 nogil:
+    cdef:
+        CPyNodeWrapper* c_wrapper
+        CNode* c_ancestor
+        int16_t c_z_index
+
+    if not c_filter.is_set:
+        return True
+    if not (c_filter.types_mask & (1 << <uint32_t>c_node.type())):
+        return False
+    if c_filter.visible_only:
+        c_ancestor = c_node
+        while c_ancestor != NULL:
+            if not c_ancestor.visible():
+                return False
+            c_ancestor = c_ancestor.parent().get()
+    c_z_index = c_node.effective_z_index()
+    if not c_filter.min_z_index <= c_z_index <= c_filter.max_z_index:
+        return False
+    if c_filter.has_viewports_mask and not (
+        c_filter.viewports_mask & _c_indices_to_mask(
+            c_node.effective_viewports(), min_viewport_z_index
+        )
+    ):
+        return False
+    if c_filter.has_predicate_mask:
+        c_wrapper = <CPyNodeWrapper*>c_node.wrapper_ptr()
+        if c_wrapper == NULL or not (c_wrapper.tags & c_filter.predicate_mask):
+            return False
+    return True
+
+
+cdef int _c_filter_nodes(
+    vector[CNodePtr]& c_found_nodes,
+    const CSpatialQueryFilter& c_filter, vector[CNodePtr]& c_nodes
+) except -1 nogil:
+    cdef size_t i
+    for i in range(c_found_nodes.size()):
+        if _c_node_matches_filter(c_found_nodes[i].get(), c_filter):
+            c_nodes.push_back(c_found_nodes[i])
+    return 0
+
+
+cdef Py_ssize_t _c_count_matching_nodes(
+    vector[CNodePtr]& c_found_nodes, const CSpatialQueryFilter& c_filter,
+    bint c_any
+) except -1 nogil:
+    cdef:
+        Py_ssize_t c_count = 0
+        size_t i
+
+    if not c_filter.is_set:
+        c_count = c_found_nodes.size()
+        return min(c_count, 1) if c_any else c_count
+    for i in range(c_found_nodes.size()):
+        if _c_node_matches_filter(c_found_nodes[i].get(), c_filter):
+            c_count += 1
+            if c_any:
+                break
+    return c_count
+
+
+cdef double _c_bounding_box_distance(
+    const CBoundingBox& c_bbox, const CDVec2& c_point
+) nogil:
+    cdef:
+        double c_dx = fmax(fmax(c_bbox.min_x - c_point.x, 0.), c_point.x - c_bbox.max_x)
+        double c_dy = fmax(fmax(c_bbox.min_y - c_point.y, 0.), c_point.y - c_bbox.max_y)
+    return sqrt(c_dx * c_dx + c_dy * c_dy)
+
+
+cdef int _c_query_within(
+    CSpatialIndex* c_spatial_index, const CDVec2& c_point, double c_radius,
+    const CSpatialQueryFilter& c_filter,
+    vector[pair[double, CNodeRawPtr]]& c_found
+) except -1 nogil:
+    # finds nodes whose bounding box is at most `c_radius` away from the point,
+    # paired with that distance
+    cdef:
+        vector[CNodePtr] c_candidates = c_spatial_index.query_bounding_box(
+            CBoundingBox(
+                c_point.x - c_radius, c_point.y - c_radius,
+                c_point.x + c_radius, c_point.y + c_radius
+            ), True
+        )
+        CBoundingBox c_bbox
+        CNode* c_node
+        double c_distance
+        size_t i
+
+    for i in range(c_candidates.size()):
+        c_node = c_candidates[i].get()
+        if not _c_node_matches_filter(c_node, c_filter):
+            continue
+        c_bbox = c_node.bounding_box()
+        if c_bbox.is_nan():
+            continue
+        c_distance = _c_bounding_box_distance(c_bbox, c_point)
+        if c_distance <= c_radius:
+            c_found.push_back(pair[double, CNodeRawPtr](c_distance, c_node))
+    return 0
+
+
+cdef double _c_segment_entry(
+    const CBoundingBox& c_bbox, const CDVec2& c_a, const CDVec2& c_b
+) nogil:
+    # fraction of the segment at which it enters the box (slab method),
+    # negative if the segment misses the box
+    cdef:
+        double c_entry = 0.
+        double c_exit = 1.
+        double c_start[2]
+        double c_delta[2]
+        double c_min[2]
+        double c_max[2]
+        double c_near, c_far, c_swap
+        int axis
+
+    c_start[0], c_start[1] = c_a.x, c_a.y
+    c_delta[0], c_delta[1] = c_b.x - c_a.x, c_b.y - c_a.y
+    c_min[0], c_min[1] = c_bbox.min_x, c_bbox.min_y
+    c_max[0], c_max[1] = c_bbox.max_x, c_bbox.max_y
+    for axis in range(2):
+        if c_delta[axis] == 0.:
+            if not c_min[axis] <= c_start[axis] <= c_max[axis]:
+                return -1.
+            continue
+        c_near = (c_min[axis] - c_start[axis]) / c_delta[axis]
+        c_far = (c_max[axis] - c_start[axis]) / c_delta[axis]
+        if c_near > c_far:
+            c_swap = c_near
+            c_near = c_far
+            c_far = c_swap
+        c_entry = fmax(c_entry, c_near)
+        c_exit = fmin(c_exit, c_far)
+        if c_entry > c_exit:
+            return -1.
+    return c_entry
+
+
+@cython.final
+cdef class _SpatialQueryResults:
+    # results of many queries, flattened: nodes found by query `i`
+    # are `c_nodes[offsets[i]:offsets[i + 1]]`; raw pointers are kept,
+    # so results get outdated once any node is deleted
+    cdef:
+        _NodeDataStorage storage
+        vector[CNode*] c_nodes
+        uint64_t c_deleted_nodes_count
+        readonly _ArrayBuffer offsets
+        _ArrayBuffer _handles
+
+    def __init__(self):
+        raise RuntimeError(f'{self.__class__} must not be instantiated manually!')
+
+    @staticmethod
+    cdef _SpatialQueryResults create(
+        _NodeDataStorage storage, const vector[CNodePtr]& c_nodes,
+        const vector[size_t]& c_offsets
+    ):
+        cdef:
+            _SpatialQueryResults results = \
+                _SpatialQueryResults.__new__(_SpatialQueryResults)
+            uint64_t* offsets
+            size_t i
+
+        results.storage = storage
+        results.c_deleted_nodes_count = _c_deleted_nodes_count
+        results.offsets = _ArrayBuffer.create(
+            b'Q', sizeof(uint64_t), c_offsets.size()
+        )
+        offsets = <uint64_t*>results.offsets.c_data
+        for i in range(c_offsets.size()):
+            offsets[i] = c_offsets[i]
+        results.c_nodes.reserve(c_nodes.size())
+        for i in range(c_nodes.size()):
+            results.c_nodes.push_back(c_nodes[i].get())
+        return results
+
+    cdef int _check_valid(self) except -1:
+        if self.c_deleted_nodes_count != _c_deleted_nodes_count:
+            raise RuntimeError(
+                'Query results are outdated, nodes were deleted since the query.'
+            )
+        return 0
+
+    @property
+    def handles(self):
+        # handles are made on first access only, as it makes node
+        # data slots for all the found nodes
+        cdef:
+            uint64_t* handles
+            size_t i
+
+        if self._handles is None:
+            self._check_valid()
+            self._handles = _ArrayBuffer.create(
+                b'Q', sizeof(uint64_t), self.c_nodes.size()
+            )
+            handles = <uint64_t*>self._handles.c_data
+            for i in range(self.c_nodes.size()):
+                handles[i] = self.storage.get_handle(self.c_nodes[i])
+        return self._handles
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, Py_ssize_t index):
+        cdef:
+            Py_ssize_t size = len(self.offsets) - 1
+            uint64_t* offsets = <uint64_t*>self.offsets.c_data
+
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('Query results index out of range.')
+        self._check_valid()
+        return [
+            get_node_wrapper(CNodePtr(self.c_nodes[i]))
+            for i in range(offsets[index], offsets[index + 1])
+        ]
+
+    def __iter__(self):
+        cdef Py_ssize_t i
+        for i in range(len(self)):
+            yield self[i]
+
 
 @cython.final
 cdef class _SpatialIndexManager(_SceneResource):
-    cdef CSpatialIndex* c_spatial_index
+    cdef:
+        object _scene_weakref
+        CSpatialIndex* c_spatial_index
 
     @staticmethod
     cdef _SpatialIndexManager create(Scene scene):
         cdef _SpatialIndexManager spatial_index_manager = _SpatialIndexManager.__new__(
             _SpatialIndexManager, scene
         )
+        spatial_index_manager._scene_weakref = PyWeakref_NewRef(scene, None)
         spatial_index_manager.c_spatial_index = &scene.c_scene.get().spatial_index
         return spatial_index_manager
 
@@ -19,18 +313,298 @@ cdef class _SpatialIndexManager(_SceneResource):
         self.check_valid()
         return self.c_spatial_index
 
-    def query_bounding_box(self, BoundingBox bbox not None, bool include_shapeless=True):
-        return [
-            get_node_wrapper(c_node_ptr)
-            for c_node_ptr in self.get_c_spatial_index().query_bounding_box(
+    cdef _NodeDataStorage _get_node_data_storage(self):
+        self.check_valid()
+        return (<Scene>self._scene_weakref())._get_node_data_storage()
+
+    def query_bounding_box(self, BoundingBox bbox not None, bool include_shapeless=True,
+                           *, node_types=None, bint visible_only=False,
+                           z_index_range=None, viewport_mask=None,
+                           predicate_mask=None):
+        cdef:
+            CSpatialQueryFilter c_filter = _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+            vector[CNodePtr] c_found_nodes = \
+                self.get_c_spatial_index().query_bounding_box(
+                    bbox.c_bounding_box, include_shapeless
+                )
+            vector[CNodePtr] c_nodes
+
+        _c_filter_nodes(c_found_nodes, c_filter, c_nodes)
+        return [get_node_wrapper(c_node_ptr) for c_node_ptr in c_nodes]
+
+    def query_point(self, Vector point not None, *, node_types=None,
+                    bint visible_only=False, z_index_range=None,
+                    viewport_mask=None, predicate_mask=None):
+        cdef:
+            CSpatialQueryFilter c_filter = _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+            vector[CNodePtr] c_found_nodes = \
+                self.get_c_spatial_index().query_point(point.c_vector)
+            vector[CNodePtr] c_nodes
+
+        _c_filter_nodes(c_found_nodes, c_filter, c_nodes)
+        return [get_node_wrapper(c_node_ptr) for c_node_ptr in c_nodes]
+
+    def count_bounding_box(self, BoundingBox bbox not None,
+                           bool include_shapeless=True, *, node_types=None,
+                           bint visible_only=False, z_index_range=None,
+                           viewport_mask=None, predicate_mask=None):
+        return self._count_bounding_box(
+            bbox, include_shapeless, False, _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+        )
+
+    def any_in_bounding_box(self, BoundingBox bbox not None,
+                            bool include_shapeless=True, *, node_types=None,
+                            bint visible_only=False, z_index_range=None,
+                            viewport_mask=None, predicate_mask=None):
+        return self._count_bounding_box(
+            bbox, include_shapeless, True, _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+        ) > 0
+
+    def count_point(self, Vector point not None, *, node_types=None,
+                    bint visible_only=False, z_index_range=None,
+                    viewport_mask=None, predicate_mask=None):
+        cdef:
+            CSpatialIndex* c_spatial_index = self.get_c_spatial_index()
+            CSpatialQueryFilter c_filter = _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+            vector[CNodePtr] c_found_nodes
+            Py_ssize_t c_count
+
+        with nogil:
+            c_found_nodes = c_spatial_index.query_point(point.c_vector)
+            c_count = _c_count_matching_nodes(c_found_nodes, c_filter, False)
+        return c_count
+
+    cdef Py_ssize_t _count_bounding_box(
+        self, BoundingBox bbox, bool include_shapeless, bint c_any,
+        CSpatialQueryFilter c_filter
+    ) except -1:
+        cdef:
+            CSpatialIndex* c_spatial_index = self.get_c_spatial_index()
+            vector[CNodePtr] c_found_nodes
+            Py_ssize_t c_count
+
+        with nogil:
+            c_found_nodes = c_spatial_index.query_bounding_box(
                 bbox.c_bounding_box, include_shapeless
             )
-        ]
+            c_count = _c_count_matching_nodes(c_found_nodes, c_filter, c_any)
+        return c_count
 
-    def query_point(self, Vector point not None):
-        return [
-            get_node_wrapper(c_node_ptr)
-            for c_node_ptr in self.get_c_spatial_index().query_point(
-                point.c_vector
+    def query_nearest(self, Vector point not None, Py_ssize_t k,
+                      max_distance=None, *, node_types=None,
+                      bint visible_only=False, z_index_range=None,
+                      viewport_mask=None, predicate_mask=None):
+        cdef:
+            CSpatialIndex* c_spatial_index = self.get_c_spatial_index()
+            CSpatialQueryFilter c_filter = _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
             )
-        ]
+            double c_max_distance = (
+                INFINITY if max_distance is None else max_distance
+            )
+            double c_radius = min(NEAREST_QUERY_INITIAL_RADIUS, c_max_distance)
+            vector[pair[double, CNodeRawPtr]] c_found
+            pair[double, CNodeRawPtr] c_item
+            int c_step = 0
+
+        if k < 1:
+            raise ValueError('Number of queried nodes must be positive.')
+        if max_distance is not None and max_distance < 0:
+            raise ValueError('Maximum distance must not be negative.')
+        with nogil:
+            # all nodes within the radius are found by each step, so
+            # once there are at least k of them the k closest are known
+            while True:
+                c_found.clear()
+                _c_query_within(
+                    c_spatial_index, point.c_vector, c_radius, c_filter, c_found
+                )
+                if <Py_ssize_t>c_found.size() >= k or c_radius >= c_max_distance:
+                    break
+                c_step += 1
+                if c_step < NEAREST_QUERY_MAX_STEPS:
+                    c_radius = min(c_radius * 4., c_max_distance)
+                else:
+                    c_radius = c_max_distance
+            c_sort(c_found.begin(), c_found.end())
+            if <Py_ssize_t>c_found.size() > k:
+                c_found.resize(k)
+        return [get_node_wrapper(CNodePtr(c_item.second)) for c_item in c_found]
+
+    def query_radius(self, Vector point not None, double radius,
+                     bint sort=True, *, node_types=None,
+                     bint visible_only=False, z_index_range=None,
+                     viewport_mask=None, predicate_mask=None):
+        cdef:
+            CSpatialIndex* c_spatial_index = self.get_c_spatial_index()
+            CSpatialQueryFilter c_filter = _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+            vector[pair[double, CNodeRawPtr]] c_found
+            pair[double, CNodeRawPtr] c_item
+
+        if radius < 0:
+            raise ValueError('Radius must not be negative.')
+        with nogil:
+            _c_query_within(
+                c_spatial_index, point.c_vector, radius, c_filter, c_found
+            )
+            if sort:
+                c_sort(c_found.begin(), c_found.end())
+        return [get_node_wrapper(CNodePtr(c_item.second)) for c_item in c_found]
+
+    def query_segment(self, Vector a not None, Vector b not None,
+                      bint first_hit_only=False, *, node_types=None,
+                      bint visible_only=False, z_index_range=None,
+                      viewport_mask=None, predicate_mask=None):
+        cdef:
+            CSpatialIndex* c_spatial_index = self.get_c_spatial_index()
+            CSpatialQueryFilter c_filter = _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+            vector[CNodePtr] c_candidates
+            vector[pair[double, CNodeRawPtr]] c_found
+            pair[double, CNodeRawPtr] c_item
+            CBoundingBox c_bbox
+            CNode* c_node
+            double c_entry
+            size_t i
+
+        with nogil:
+            c_candidates = c_spatial_index.query_bounding_box(
+                CBoundingBox(
+                    fmin(a.c_vector.x, b.c_vector.x),
+                    fmin(a.c_vector.y, b.c_vector.y),
+                    fmax(a.c_vector.x, b.c_vector.x),
+                    fmax(a.c_vector.y, b.c_vector.y),
+                ), True
+            )
+            for i in range(c_candidates.size()):
+                c_node = c_candidates[i].get()
+                if not _c_node_matches_filter(c_node, c_filter):
+                    continue
+                c_bbox = c_node.bounding_box()
+                if c_bbox.is_nan():
+                    continue
+                c_entry = _c_segment_entry(c_bbox, a.c_vector, b.c_vector)
+                if c_entry >= 0.:
+                    c_found.push_back(pair[double, CNodeRawPtr](c_entry, c_node))
+            c_sort(c_found.begin(), c_found.end())
+            if first_hit_only and c_found.size() > 1:
+                c_found.resize(1)
+        return [get_node_wrapper(CNodePtr(c_item.second)) for c_item in c_found]
+
+    def query_bounding_box_many(self, bounding_boxes not None,
+                                bool include_shapeless=True, *,
+                                node_types=None, bint visible_only=False,
+                                z_index_range=None, viewport_mask=None,
+                                predicate_mask=None):
+        cdef:
+            CSpatialIndex* c_spatial_index = self.get_c_spatial_index()
+            vector[CBoundingBox] c_bounding_boxes = \
+                _c_bounding_boxes_from(bounding_boxes)
+            CSpatialQueryFilter c_filter = _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+            vector[CNodePtr] c_found_nodes
+            vector[CNodePtr] c_nodes
+            vector[size_t] c_offsets
+            size_t i
+
+        with nogil:
+            c_offsets.push_back(0)
+            for i in range(c_bounding_boxes.size()):
+                c_found_nodes = c_spatial_index.query_bounding_box(
+                    c_bounding_boxes[i], include_shapeless
+                )
+                _c_filter_nodes(c_found_nodes, c_filter, c_nodes)
+                c_offsets.push_back(c_nodes.size())
+        return _SpatialQueryResults.create(
+            self._get_node_data_storage(), c_nodes, c_offsets
+        )
+
+    def query_point_many(self, points not None, *, node_types=None,
+                         bint visible_only=False, z_index_range=None,
+                         viewport_mask=None, predicate_mask=None):
+        cdef:
+            CSpatialIndex* c_spatial_index = self.get_c_spatial_index()
+            vector[CDVec2] c_points = _c_query_points_from(points)
+            CSpatialQueryFilter c_filter = _make_spatial_query_filter(
+                node_types, visible_only, z_index_range, viewport_mask,
+                predicate_mask
+            )
+            vector[CNodePtr] c_found_nodes
+            vector[CNodePtr] c_nodes
+            vector[size_t] c_offsets
+            size_t i
+
+        with nogil:
+            c_offsets.push_back(0)
+            for i in range(c_points.size()):
+                c_found_nodes = c_spatial_index.query_point(c_points[i])
+                _c_filter_nodes(c_found_nodes, c_filter, c_nodes)
+                c_offsets.push_back(c_nodes.size())
+        return _SpatialQueryResults.create(
+            self._get_node_data_storage(), c_nodes, c_offsets
+        )
+
+
+cdef vector[CBoundingBox] _c_bounding_boxes_from(object bounding_boxes) except *:
+    cdef:
+        vector[CBoundingBox] c_bounding_boxes
+        const double[:, :] c_values_view
+        Py_ssize_t i
+
+    if PyObject_CheckBuffer(bounding_boxes):
+        c_values_view = bounding_boxes
+        if c_values_view.shape[1] != 4:
+            raise ValueError('Bounding boxes array must have Nx4 shape.')
+        c_bounding_boxes.reserve(c_values_view.shape[0])
+        for i in range(c_values_view.shape[0]):
+            c_bounding_boxes.push_back(CBoundingBox(
+                c_values_view[i, 0], c_values_view[i, 1],
+                c_values_view[i, 2], c_values_view[i, 3]
+            ))
+    else:
+        for bounding_box in bounding_boxes:
+            c_bounding_boxes.push_back(
+                (<BoundingBox?>bounding_box).c_bounding_box
+            )
+    return c_bounding_boxes
+
+
+cdef vector[CDVec2] _c_query_points_from(object points) except *:
+    cdef:
+        vector[CDVec2] c_points
+        const double[:, :] c_points_view
+        Py_ssize_t i
+
+    if isinstance(points, VectorArray) or not PyObject_CheckBuffer(points):
+        return _c_points_from(points)
+
+    c_points_view = points
+    if c_points_view.shape[1] != 2:
+        raise ValueError('Points array must have Nx2 shape.')
+    c_points.reserve(c_points_view.shape[0])
+    for i in range(c_points_view.shape[0]):
+        c_points.push_back(CDVec2(c_points_view[i, 0], c_points_view[i, 1]))
+    return c_points
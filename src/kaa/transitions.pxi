@@ -2,6 +2,7 @@ from enum import IntEnum
 
 import cython
 from libc.stdint cimport int16_t
+from libcpp.string cimport string
 from libcpp.vector cimport vector
 from libcpp.utility cimport move as cmove
 
@@ -315,11 +316,17 @@ cdef class _NodeTransitionsManager:
             return get_transition_wrapper(cmove(c_transition))
 
     def set(self, str transition_name, NodeTransitionBase transition):
+        cdef:
+            string c_name = transition_name.encode('ascii')
+            CPyNodeWrapper* c_wrapper = _get_c_node_wrapper(self.c_node.get())
         if transition is not None:
             self.c_node.get().transitions_manager().set(
-                transition_name.encode('ascii'), transition.c_handle
+                c_name, transition.c_handle
             )
+            c_wrapper.transition_names.insert(c_name)
         else:
             self.c_node.get().transitions_manager().set(
-                transition_name.encode('ascii'), CNodeTransitionHandle()
+                c_name, CNodeTransitionHandle()
             )
+            c_wrapper.transition_names.erase(c_name)
+        _mark_c_node_changed(self.c_node.get())
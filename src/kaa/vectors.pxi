@@ -1,12 +1,16 @@
 import cython
 from numbers import Number
 
+from libcpp.vector cimport vector
+from cpython.buffer cimport PyObject_CheckBuffer
+
 from .kaacore.vectors cimport (
     CDVec2, c_vector_dot, c_vector_distance, c_vector_length, c_vector_normalize,
     c_vector_rotate_angle, c_vector_oriented_angle
 )
 from .kaacore.math cimport radians, degrees
 from .kaacore.hashing cimport c_calculate_hash
+from .kaacore.geometry cimport CTransformation
 
 
 DEF VECTOR_FREELIST_SIZE = 32
@@ -128,3 +132,373 @@ cdef class Vector:
 
     def transform(self, Transformation transformation not None):
         return transformation._mul_vector(self)
+
+
+# Vector which can be modified in place, for hot loops where creating
+# new Vector for each operation would be too costly.
+@cython.final
+cdef class MutableVector:
+    cdef CDVec2 c_vector
+
+    def __init__(self, double x=0., double y=0.):
+        self.c_vector = CDVec2(x, y)
+
+    @staticmethod
+    cdef MutableVector from_c_vector(CDVec2 c_vector):
+        cdef MutableVector mutable_vector = MutableVector.__new__(MutableVector)
+        mutable_vector.c_vector = c_vector
+        return mutable_vector
+
+    @property
+    def x(self):
+        return self.c_vector.x
+
+    @x.setter
+    def x(self, double value):
+        self.c_vector.x = value
+
+    @property
+    def y(self):
+        return self.c_vector.y
+
+    @y.setter
+    def y(self, double value):
+        self.c_vector.y = value
+
+    def __repr__(self):
+        return "MV[{x}, {y}]".format(x=self.x, y=self.y)
+
+    def __eq__(self, other):
+        return self.c_vector == _get_c_vector(other)
+
+    def to_vector(self):
+        return Vector.from_c_vector(self.c_vector)
+
+    def set(self, double x, double y):
+        self.c_vector = CDVec2(x, y)
+        return self
+
+    def set_from(self, other):
+        self.c_vector = _get_c_vector(other)
+        return self
+
+    def iadd(self, other):
+        self.c_vector = self.c_vector + _get_c_vector(other)
+        return self
+
+    def __iadd__(self, other):
+        return self.iadd(other)
+
+    def isub(self, other):
+        self.c_vector = self.c_vector - _get_c_vector(other)
+        return self
+
+    def __isub__(self, other):
+        return self.isub(other)
+
+    def imul(self, double operand):
+        self.c_vector = self.c_vector * operand
+        return self
+
+    def __imul__(self, double operand):
+        return self.imul(operand)
+
+    def rotate_inplace(self, double angle_rad):
+        self.c_vector = c_vector_rotate_angle(self.c_vector, angle_rad)
+        return self
+
+    def rotate_inplace_degrees(self, double angle_deg):
+        return self.rotate_inplace(radians(angle_deg))
+
+    def normalize_inplace(self):
+        self.c_vector = c_vector_normalize(self.c_vector)
+        return self
+
+    def transform_inplace(self, transformation not None):
+        self.c_vector = self.c_vector | _get_c_transformation(transformation)
+        return self
+
+    def dot(self, other):
+        cdef CDVec2 c_other = _get_c_vector(other)
+        return c_vector_dot(self.c_vector, c_other)
+
+    def distance(self, other):
+        cdef CDVec2 c_other = _get_c_vector(other)
+        return c_vector_distance(self.c_vector, c_other)
+
+    def length(self):
+        return c_vector_length(self.c_vector)
+
+
+cdef CDVec2 _get_c_vector(object vector) except *:
+    if isinstance(vector, Vector):
+        return (<Vector>vector).c_vector
+    elif isinstance(vector, MutableVector):
+        return (<MutableVector>vector).c_vector
+    raise TypeError(f'Expected Vector or MutableVector, got: {type(vector)}.')
+
+
+# Contiguous array of 2D vectors, exposed through the buffer protocol
+# as float64 Nx2 array. Operations are done on the whole array at once,
+# without creating Vector object for each item.
+@cython.final
+cdef class VectorArray:
+    cdef:
+        vector[CDVec2] c_vectors
+        Py_ssize_t c_shape[2]
+        Py_ssize_t c_strides[2]
+
+    def __init__(self, points=()):
+        cdef:
+            const double[:, :] c_points_view
+            Py_ssize_t i
+
+        if isinstance(points, VectorArray):
+            self.c_vectors = (<VectorArray>points).c_vectors
+        elif PyObject_CheckBuffer(points):
+            c_points_view = points
+            if c_points_view.shape[1] != 2:
+                raise ValueError(
+                    'Array passed to VectorArray must have Nx2 shape.'
+                )
+            self.c_vectors.resize(c_points_view.shape[0])
+            for i in range(c_points_view.shape[0]):
+                self.c_vectors[i] = CDVec2(
+                    c_points_view[i, 0], c_points_view[i, 1]
+                )
+        else:
+            for point in points:
+                self.c_vectors.push_back((<Vector?>point).c_vector)
+        self._update_shape()
+
+    @staticmethod
+    cdef VectorArray create(Py_ssize_t size):
+        cdef VectorArray vector_array = VectorArray.__new__(VectorArray)
+        vector_array.c_vectors.resize(size)
+        vector_array._update_shape()
+        return vector_array
+
+    @staticmethod
+    cdef VectorArray from_c_vectors(const vector[CDVec2]& c_vectors):
+        cdef VectorArray vector_array = VectorArray.__new__(VectorArray)
+        vector_array.c_vectors = c_vectors
+        vector_array._update_shape()
+        return vector_array
+
+    cdef void _update_shape(self):
+        self.c_shape[0] = self.c_vectors.size()
+        self.c_shape[1] = 2
+        self.c_strides[0] = sizeof(CDVec2)
+        self.c_strides[1] = sizeof(double)
+
+    def __getbuffer__(self, Py_buffer* buffer, int flags):
+        # array is never resized, so exported buffer stays valid
+        buffer.buf = self.c_vectors.data()
+        buffer.obj = self
+        buffer.len = self.c_shape[0] * self.c_strides[0]
+        buffer.readonly = 0
+        buffer.itemsize = sizeof(double)
+        if flags & PyBUF_FORMAT:
+            buffer.format = b'd'
+        else:
+            buffer.format = NULL
+        buffer.ndim = 2
+        buffer.shape = self.c_shape
+        buffer.strides = self.c_strides
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+
+    def __releasebuffer__(self, Py_buffer* buffer):
+        pass
+
+    def __len__(self):
+        return self.c_vectors.size()
+
+    def __repr__(self):
+        return '<{}: {}>'.format(self.__class__.__name__, self.tolist())
+
+    cdef Py_ssize_t _check_index(self, Py_ssize_t index) except -1:
+        cdef Py_ssize_t size = self.c_vectors.size()
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('VectorArray index out of range.')
+        return index
+
+    def __getitem__(self, Py_ssize_t index):
+        return Vector.from_c_vector(self.c_vectors[self._check_index(index)])
+
+    def __setitem__(self, Py_ssize_t index, Vector vector not None):
+        self.c_vectors[self._check_index(index)] = vector.c_vector
+
+    def __iter__(self):
+        cdef CDVec2 c_vector
+        for c_vector in self.c_vectors:
+            yield Vector.from_c_vector(c_vector)
+
+    def tolist(self):
+        return list(self)
+
+    cdef const CDVec2* _other_c_vectors(self, object other) except NULL:
+        if isinstance(other, VectorArray):
+            if (<VectorArray>other).c_vectors.size() != self.c_vectors.size():
+                raise ValueError('VectorArray operands must have equal length.')
+            return (<VectorArray>other).c_vectors.data()
+        raise TypeError(f'Unsupported operand type: {type(other)}.')
+
+    def add(self, other):
+        cdef:
+            VectorArray result = VectorArray.create(self.c_vectors.size())
+            CDVec2 c_other
+            const CDVec2* c_others
+            size_t i
+
+        if isinstance(other, Vector):
+            c_other = (<Vector>other).c_vector
+            for i in range(self.c_vectors.size()):
+                result.c_vectors[i] = self.c_vectors[i] + c_other
+        else:
+            c_others = self._other_c_vectors(other)
+            for i in range(self.c_vectors.size()):
+                c_other = c_others[i]
+                result.c_vectors[i] = self.c_vectors[i] + c_other
+        return result
+
+    def __add__(self, other):
+        return self.add(other)
+
+    def sub(self, other):
+        cdef:
+            VectorArray result = VectorArray.create(self.c_vectors.size())
+            CDVec2 c_other
+            const CDVec2* c_others
+            size_t i
+
+        if isinstance(other, Vector):
+            c_other = (<Vector>other).c_vector
+            for i in range(self.c_vectors.size()):
+                result.c_vectors[i] = self.c_vectors[i] - c_other
+        else:
+            c_others = self._other_c_vectors(other)
+            for i in range(self.c_vectors.size()):
+                c_other = c_others[i]
+                result.c_vectors[i] = self.c_vectors[i] - c_other
+        return result
+
+    def __sub__(self, other):
+        return self.sub(other)
+
+    def mul(self, double operand):
+        cdef:
+            VectorArray result = VectorArray.create(self.c_vectors.size())
+            size_t i
+
+        for i in range(self.c_vectors.size()):
+            result.c_vectors[i] = self.c_vectors[i] * operand
+        return result
+
+    def __mul__(self, double operand):
+        return self.mul(operand)
+
+    def __rmul__(self, double operand):
+        return self.mul(operand)
+
+    def rotate_angle(self, double angle_rad):
+        cdef:
+            VectorArray result = VectorArray.create(self.c_vectors.size())
+            size_t i
+
+        for i in range(self.c_vectors.size()):
+            result.c_vectors[i] = c_vector_rotate_angle(
+                self.c_vectors[i], angle_rad
+            )
+        return result
+
+    def rotate_angle_degrees(self, double angle_deg):
+        return self.rotate_angle(radians(angle_deg))
+
+    def normalize(self):
+        cdef:
+            VectorArray result = VectorArray.create(self.c_vectors.size())
+            size_t i
+
+        for i in range(self.c_vectors.size()):
+            result.c_vectors[i] = c_vector_normalize(self.c_vectors[i])
+        return result
+
+    def length(self):
+        cdef:
+            _ArrayBuffer result = _ArrayBuffer.create(
+                b'd', sizeof(double), self.c_vectors.size()
+            )
+            double* c_result = <double*>result.c_data
+            size_t i
+
+        for i in range(self.c_vectors.size()):
+            c_result[i] = c_vector_length(self.c_vectors[i])
+        return result
+
+    def dot(self, other):
+        cdef:
+            _ArrayBuffer result = _ArrayBuffer.create(
+                b'd', sizeof(double), self.c_vectors.size()
+            )
+            double* c_result = <double*>result.c_data
+            CDVec2 c_other
+            const CDVec2* c_others
+            size_t i
+
+        if isinstance(other, Vector):
+            c_other = (<Vector>other).c_vector
+            for i in range(self.c_vectors.size()):
+                c_result[i] = c_vector_dot(self.c_vectors[i], c_other)
+        else:
+            c_others = self._other_c_vectors(other)
+            for i in range(self.c_vectors.size()):
+                c_other = c_others[i]
+                c_result[i] = c_vector_dot(self.c_vectors[i], c_other)
+        return result
+
+    def distance(self, other):
+        cdef:
+            _ArrayBuffer result = _ArrayBuffer.create(
+                b'd', sizeof(double), self.c_vectors.size()
+            )
+            double* c_result = <double*>result.c_data
+            CDVec2 c_other
+            const CDVec2* c_others
+            size_t i
+
+        if isinstance(other, Vector):
+            c_other = (<Vector>other).c_vector
+            for i in range(self.c_vectors.size()):
+                c_result[i] = c_vector_distance(self.c_vectors[i], c_other)
+        else:
+            c_others = self._other_c_vectors(other)
+            for i in range(self.c_vectors.size()):
+                c_other = c_others[i]
+                c_result[i] = c_vector_distance(self.c_vectors[i], c_other)
+        return result
+
+    def transform(self, Transformation transformation not None):
+        cdef:
+            VectorArray result = VectorArray.create(self.c_vectors.size())
+            CTransformation c_transformation = \
+                transformation.c_transformation
+            size_t i
+
+        for i in range(self.c_vectors.size()):
+            result.c_vectors[i] = self.c_vectors[i] | c_transformation
+        return result
+
+
+cdef vector[CDVec2] _c_points_from(object points) except *:
+    # VectorArray is copied without creating python objects
+    if isinstance(points, VectorArray):
+        return (<VectorArray>points).c_vectors
+
+    cdef vector[CDVec2] c_points
+    c_points.reserve(len(points))
+    for point in points:
+        c_points.push_back((<Vector?>point).c_vector)
+    return c_points
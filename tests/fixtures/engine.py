@@ -6,5 +6,5 @@ from kaa.geometry import Vector
 
 @pytest.fixture
 def test_engine():
-    with Engine(Vector.xy(1)) as engine:
+    with Engine(Vector.xy(1), headless=True) as engine:
         yield engine
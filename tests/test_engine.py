@@ -1,8 +1,14 @@
 import os
+import asyncio
 
 import pytest
 
-from kaa.engine import get_persistent_path
+from kaa.engine import Engine, Scene, get_persistent_path
+from kaa.geometry import Vector
+from kaa.nodes import Node
+from kaa.transitions import NodePositionTransition
+
+from tests.utils import TestScene
 
 
 def test_persistent_path():
@@ -26,3 +32,109 @@ def test_persistent_path_invalid():
         os.path.join(get_persistent_path('@:/'), 'test_file')
 
     assert str(e.value) == '@, :, / characters are not allowed.'
+
+
+def test_headless_engine():
+    environment_before = dict(os.environ)
+    with Engine(Vector.xy(1), headless=True) as engine:
+        assert engine.headless
+        assert dict(os.environ) == environment_before
+
+        scene = TestScene(lambda scene, dt: None)
+        scene.run_on_engine(3)
+
+
+class StepScene(Scene):
+    def __init__(self):
+        self.dts = []
+        self.events = []
+
+    def on_enter(self):
+        self.events.append('enter')
+
+    def update(self, dt):
+        self.dts.append(dt)
+
+    def on_exit(self):
+        self.events.append('exit')
+
+
+def test_step(test_engine):
+    scene = StepScene()
+    dts = scene.dts
+
+    test_engine.step_many(3, scene=scene)
+    assert len(dts) == 3
+
+    test_engine.step()
+    assert len(dts) == 4
+
+    test_engine.step_many(0)
+    assert len(dts) == 4
+    # scene stays entered between steps
+    assert scene.events == ['enter']
+
+    other_scene = StepScene()
+    test_engine.step(scene=other_scene)
+    assert scene.events == ['enter', 'exit']
+    assert other_scene.events == ['enter']
+
+
+def test_run_async(test_engine):
+    loop = asyncio.new_event_loop()
+    results = []
+
+    class AsyncScene(Scene):
+        def on_enter(self):
+            self.node = self.root.add_child(Node())
+            loop.create_task(self.logic())
+
+        async def logic(self):
+            await self.sleep(0.01)
+            results.append('slept')
+            node = await self.node.run_transition(
+                NodePositionTransition(Vector(10, 10), 0.01)
+            )
+            results.append(node.position)
+            self.engine.quit()
+
+        def update(self, dt):
+            pass
+
+    test_engine.run_async(AsyncScene(), loop=loop)
+    loop.close()
+    assert results == ['slept', Vector(10, 10)]
+
+
+def test_run_async_default_loop(test_engine):
+    results = []
+    events = []
+
+    class AsyncScene(Scene):
+        def on_enter(self):
+            self.engine.event_loop.create_task(self.logic())
+
+        async def logic(self):
+            try:
+                await self.sleep(1000.)
+            finally:
+                events.append('cancelled')
+
+        def update(self, dt):
+            if not results:
+                # engine's loop is used even though it's not running
+                results.append(self.sleep(1.))
+            else:
+                self.engine.quit()
+
+    scene = AsyncScene()
+    # there is no running loop to make the future for
+    with pytest.raises(RuntimeError):
+        scene.sleep(1.)
+
+    assert test_engine.event_loop is None
+    test_engine.run_async(scene)
+    assert test_engine.event_loop is None
+    assert results[0].get_loop().is_closed()
+    # pending tasks are cancelled before the loop gets closed
+    assert events == ['cancelled']
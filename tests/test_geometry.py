@@ -1,8 +1,12 @@
+import array
 import math
 
 import pytest
 
-from kaa.geometry import Vector, Transformation, normalize_angle, normalize_angle_degrees, AngleSign
+from kaa.geometry import (
+    Vector, MutableVector, VectorArray, Transformation, MutableTransformation, BoundingBox, BoundingBoxArray,
+    normalize_angle, normalize_angle_degrees, AngleSign,
+)
 
 
 def test_vector():
@@ -86,3 +90,91 @@ def test_transformation_matmul():
     v1 = Vector.xy(0)
     v2 = Vector.xy(10)
     assert Transformation(translate=v2) @ v1 == v2
+
+
+def test_vector_array():
+    points = VectorArray([Vector(1., 0.), Vector(0., 2.)])
+    assert len(points) == 2
+    assert points[1] == Vector(0., 2.)
+    assert points.tolist() == [Vector(1., 0.), Vector(0., 2.)]
+    assert memoryview(points).shape == (2, 2)
+    assert VectorArray(memoryview(array.array('d', [1., 2., 3., 4.])).cast('B').cast('d', (2, 2)))[1] == Vector(3., 4.)
+
+    assert (points + Vector.xy(1.)).tolist() == [Vector(2., 1.), Vector(1., 3.)]
+    assert (points - points).tolist() == [Vector.xy(0.), Vector.xy(0.)]
+    assert (points * 2).tolist() == [Vector(2., 0.), Vector(0., 4.)]
+    assert points.length().tolist() == [1., 2.]
+    assert points.dot(Vector(1., 1.)).tolist() == [1., 2.]
+    assert points.distance(points).tolist() == [0., 0.]
+    assert points.normalize()[1] == Vector(0., 1.)
+    rotated = points.rotate_angle_degrees(90)
+    assert pytest.approx(rotated[0].y) == 1.
+    translated = Transformation(translate=Vector.xy(10.)) @ points
+    assert translated.tolist() == [Vector(11., 10.), Vector(10., 12.)]
+
+    assert BoundingBox.from_points(points) == BoundingBox(0., 0., 1., 2.)
+    with pytest.raises(ValueError):
+        points.add(VectorArray([Vector.xy(1.)]))
+
+
+def test_mutable_vector():
+    v = MutableVector(1., 0.)
+    assert v.iadd(Vector(1., 1.)) is v
+    assert v == Vector(2., 1.)
+    v *= 2
+    v -= MutableVector(1., 1.)
+    assert v.to_vector() == Vector(3., 1.)
+    v.set(0., 2.).rotate_inplace_degrees(90)
+    assert pytest.approx(v.x) == -2.
+    assert v.normalize_inplace().length() == pytest.approx(1.)
+    v.set(1., 1.).transform_inplace(Transformation(translate=Vector.xy(1.)))
+    assert v == Vector.xy(2.)
+    with pytest.raises(TypeError):
+        v.iadd((1, 1))
+
+
+def test_mutable_transformation():
+    tmn = MutableTransformation()
+    tmn.scale_inplace(Vector.xy(2.)).translate_inplace(Vector(1., 0.))
+    expected = Transformation(scale=Vector.xy(2.)) | Transformation(translate=Vector(1., 0.))
+    assert tmn == expected
+    assert tmn.to_transformation() == expected
+    tmn |= Transformation(translate=Vector(0., 1.))
+    assert Vector.xy(1.) | tmn.to_transformation() == Vector(3., 3.)
+    assert tmn.reset() == Transformation()
+
+
+def test_transformation_many():
+    transformations = [Transformation(scale=Vector.xy(2.)), Transformation(translate=Vector(1., 0.))]
+    composed = Transformation.compose_many(transformations)
+    assert composed == transformations[0] | transformations[1]
+    assert Transformation.compose_many([]) == Transformation()
+
+    points = VectorArray([Vector(0., 0.), Vector(1., 1.)])
+    assert composed.apply_many(points).tolist() == [Vector(1., 0.), Vector(3., 2.)]
+    buffer = array.array('d', [0., 0., 1., 1.])
+    view = memoryview(buffer).cast('B').cast('d', (2, 2))
+    assert composed.apply_many(view, out=view) is view
+    assert buffer.tolist() == [1., 0., 3., 2.]
+    with pytest.raises(ValueError):
+        composed.apply_many(points, out=VectorArray([Vector.xy(0.)]))
+
+
+def test_bounding_box_array():
+    boxes = BoundingBoxArray([BoundingBox(0., 0., 1., 1.), BoundingBox(2., 2., 3., 3.)])
+    assert len(boxes) == 2
+    assert boxes[1] == BoundingBox(2., 2., 3., 3.)
+    assert memoryview(boxes).shape == (2, 4)
+    assert BoundingBoxArray(memoryview(boxes)).tolist() == boxes.tolist()
+
+    assert boxes.intersects(BoundingBox(0.5, 0.5, 2.5, 2.5)).tolist() == [True, True]
+    assert boxes.intersects(BoundingBox(2.5, 2.5, 4., 4.)).tolist() == [False, True]
+    assert boxes.contains(Vector.xy(0.5)).tolist() == [True, False]
+    assert boxes.contains(VectorArray([Vector.xy(0.5), Vector.xy(2.5)])).tolist() == [True, True]
+    assert boxes.merge_all() == BoundingBox(0., 0., 3., 3.)
+    assert BoundingBoxArray().merge_all().is_nan()
+    assert boxes.overlap_mask().tolist() == [[True, False], [False, True]]
+    assert boxes.overlap_mask(BoundingBoxArray([BoundingBox(0., 0., 5., 5.)])).tolist() == [[True], [True]]
+    empty_mask = boxes.overlap_mask(BoundingBoxArray())
+    assert empty_mask.shape == (2, 0)
+    assert empty_mask.tolist() == [[], []]
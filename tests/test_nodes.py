@@ -0,0 +1,688 @@
+import array
+
+import pytest
+
+from kaa.colors import Color
+from kaa.engine import Scene
+from kaa.fonts import TextNode
+from kaa.geometry import BoundingBox, BoundingBoxArray, Circle, MutableVector, Polygon, Transformation, Vector
+from kaa.nodes import Node, NodeBatch, NodePool, NodeChanges
+from kaa.physics import BodyNode, BodyNodeType, HitboxNode, SpaceNode
+from kaa.statistics import get_global_statistics_manager
+from kaa.transitions import NodePositionTransition
+
+from tests.utils import TestScene
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_batch():
+    nodes = [
+        Node(position=Vector(i, -i), rotation=0.5, color=Color(1, 0, 0, 1))
+        for i in range(3)
+    ]
+    batch = NodeBatch(nodes)
+    assert len(batch) == 3
+    assert list(batch) == nodes
+
+    positions = memoryview(batch.positions)
+    assert positions.shape == (3, 2)
+    assert positions.tolist() == [[0, 0], [1, -1], [2, -2]]
+    assert batch.rotations.tolist() == [0.5, 0.5, 0.5]
+    assert batch.scales.tolist() == [[1, 1]] * 3
+    assert batch.colors.tolist() == [[1, 0, 0, 1]] * 3
+
+    positions[1, 0] = 10.
+    batch.push(['positions'])
+    assert nodes[1].position == Vector(10, -1)
+
+    nodes[2].position = Vector(5, 5)
+    batch.pull(['positions'])
+    assert positions[2, 0] == positions[2, 1] == 5.
+
+    with pytest.raises(ValueError):
+        batch.pull(['velocities'])
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_batch_with_deleted_nodes():
+    scene = TestScene(lambda scene, dt: None)
+    nodes = [scene.root.add_child(Node(position=Vector(i, 0))) for i in range(3)]
+    batch = NodeBatch(nodes)
+    nodes[1].delete()
+
+    assert batch.alive.tolist() == [True, False, True]
+    assert list(batch) == [nodes[0], None, nodes[2]]
+    assert batch[1] is None
+
+    positions = memoryview(batch.positions)
+    positions[0, 0] = positions[1, 0] = positions[2, 0] = 10.
+    batch.push(['positions'])
+    nodes[2].position = Vector(20, 0)
+    batch.pull(['positions'])
+    assert batch.positions.tolist() == [[10., 0.], [10., 0.], [20., 0.]]
+    assert nodes[0].position == Vector(10, 0)
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_empty_node_batch():
+    batch = NodeBatch([])
+    assert len(batch) == 0
+    assert batch.positions.shape == (0, 2)
+    batch.push()
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_spawn_children():
+    parent = Node()
+    positions = memoryview(bytearray(8 * 6)).cast('d', (3, 2))
+    for i in range(3):
+        positions[i, 0] = positions[i, 1] = i
+
+    batch = parent.spawn_children(
+        3, positions=positions, rotation=0.5, z_index=2,
+        color=Color(0, 1, 0, 1),
+    )
+    assert len(batch) == 3
+    children = list(parent.children)
+    assert children == list(batch)
+    assert [node.position for node in children] == [
+        Vector(0, 0), Vector(1, 1), Vector(2, 2)
+    ]
+    assert all(node.rotation == 0.5 for node in children)
+    assert all(node.z_index == 2 for node in children)
+    assert all(node.color == Color(0, 1, 0, 1) for node in children)
+
+    with pytest.raises(ValueError):
+        parent.spawn_children(2, positions=positions)
+    with pytest.raises(ValueError):
+        parent.spawn_children(2, unknown_option=1)
+
+
+def test_spawn_children_with_lifetime(test_engine):
+    class LifetimeScene(Scene):
+        def update(self, dt):
+            pass
+
+    scene = LifetimeScene()
+    # every frame outlasts the short lifetime and none gets near the long one
+    lifetimes = array.array('d', [1e-9, 1e9])
+    batch = scene.root.spawn_children(2, lifetimes=memoryview(lifetimes))
+    test_engine.step_many(3, scene=scene)
+
+    assert batch.alive.tolist() == [False, True]
+    assert batch[0] is None
+    batch.pull()
+    batch.push()
+    assert batch.positions.tolist() == [[0., 0.], [0., 0.]]
+    assert list(scene.root.children) == [batch[1]]
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_pool_release_resets_node():
+    scene = TestScene(lambda scene, dt: None)
+    scene.declare_node_field('hp', 'float32')
+    pool = NodePool(lambda: Node(tags=0b1), 2, scene.root)
+
+    node = pool.acquire(tags=0b110)
+    child = node.add_child(Node(lifetime=5.))
+    child.transitions_manager.set('move', NodePositionTransition(Vector(10, 0), 1.))
+    node.transitions_manager.set('move', NodePositionTransition(Vector(10, 0), 1.))
+    node.data['hp'] = 10.
+    handle = node.handle
+    batch = NodeBatch([node])
+
+    pool.release(node)
+    assert node.tags == 0b1
+    assert node.transitions_manager.get('move') is None
+    assert scene.resolve(handle) is None
+    assert node.handle != handle
+    assert node.data['hp'] == 0.
+    assert batch.alive.tolist() == [False]
+    # rest of the subtree is frozen
+    assert child.lifetime == 0.
+    assert child.transitions_manager.get('move') is None
+    with pytest.raises(ValueError):
+        pool.release(node)
+
+    assert pool.acquire() is node
+    assert node.visible
+    assert child.lifetime == 5.
+    assert child.transitions_manager.get('move') is not None
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_clone():
+    prefab = Node(position=Vector(1, 2), z_index=3, color=Color(1, 0, 0, 1))
+    child = prefab.add_child(Node(position=Vector(5, 5), visible=False))
+    child.add_child(Node(rotation=1.))
+
+    cloned = prefab.clone()
+    assert cloned != prefab
+    assert type(cloned) is Node
+    assert cloned.position == Vector(1, 2)
+    assert cloned.z_index == 3
+    assert cloned.color == Color(1, 0, 0, 1)
+
+    cloned_child, = cloned.children
+    assert cloned_child != child
+    assert cloned_child.position == Vector(5, 5)
+    assert cloned_child.visible is False
+    cloned_grandchild, = cloned_child.children
+    assert cloned_grandchild.rotation == 1.
+
+    shallow = prefab.clone(deep=False)
+    assert list(shallow.children) == []
+
+    parent = Node()
+    assert parent.add_child(cloned) is cloned
+    assert cloned.parent == parent
+
+    class Prefab(Node):
+        pass
+
+    # copies are instances of base classes
+    assert type(Prefab().clone()) is Node
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_clone_physics_and_text_nodes():
+    body = BodyNode(mass=5., moment=100., velocity=Vector(1, 0))
+    body.add_child(HitboxNode(
+        shape=Circle(10.), mask=0b10, collision_mask=0b01, sensor=True,
+    ))
+    cloned_body = body.clone()
+    assert type(cloned_body) is BodyNode
+    assert cloned_body.mass == 5.
+    assert cloned_body.moment == 100.
+    assert cloned_body.velocity == Vector(1, 0)
+    cloned_hitbox, = cloned_body.children
+    assert type(cloned_hitbox) is HitboxNode
+    assert cloned_hitbox.shape == Circle(10.)
+    assert cloned_hitbox.mask == 0b10
+    assert cloned_hitbox.collision_mask == 0b01
+    assert cloned_hitbox.sensor is True
+
+    # non-dynamic bodies have no mass to copy
+    for body_type in (BodyNodeType.kinematic, BodyNodeType.static):
+        cloned_body = BodyNode(body_type=body_type).clone()
+        assert cloned_body.body_type == body_type
+
+    text = TextNode(content='hello', font_size=12., line_width=100.)
+    cloned_text = text.clone()
+    assert type(cloned_text) is TextNode
+    assert cloned_text.content == 'hello'
+    assert cloned_text.font_size == 12.
+    assert cloned_text.line_width == 100.
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_pool():
+    parent = Node()
+    pool = NodePool(lambda: Node(z_index=1), 1, parent, name='test_pool')
+
+    first = pool.acquire(position=Vector(1, 1))
+    second = pool.acquire()
+    assert first.parent == parent
+    assert first.position == Vector(1, 1)
+    assert pool.misses == 2 and pool.hits == 0
+
+    first.setup(z_index=5, lifetime=10.)
+    pool.release(first)
+    assert first and not first.visible and not first.indexable
+    assert first.z_index == 1 and first.position == Vector(0, 0)
+    assert first.lifetime == 0.
+    with pytest.raises(ValueError):
+        pool.release(first)
+
+    # pool is full, so the second node gets deleted
+    pool.release(second)
+    assert not second
+    assert len(pool) == pool.free_count == 1
+
+    assert pool.acquire() is first
+    assert first.visible and first.indexable
+    assert pool.hits == 1 and len(pool) == 0
+    with pytest.raises(ValueError):
+        pool.release(Node())
+
+    stats = dict(get_global_statistics_manager().get_last_all())
+    assert stats['test_pool:hits'] == 1
+    assert stats['test_pool:misses'] == 2
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_wrapper_identity():
+    parent = Node()
+    batch = parent.spawn_children(2)
+    first, second = parent.children
+    assert first is batch[0]
+    assert second is batch[1]
+    assert first.parent is parent
+
+    first.delete()
+    assert not first
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_walk():
+    class CustomNode(Node):
+        pass
+
+    root = Node()
+    a = root.add_child(Node())
+    a1 = a.add_child(CustomNode())
+    a2 = a.add_child(Node(visible=False))
+    a2_1 = a2.add_child(Node())
+    b = root.add_child(SpaceNode())
+
+    assert root.descendants_count() == 5
+    assert list(root.walk()) == [a, a1, a2, a2_1, b]
+    assert list(root.walk(order='breadth')) == [a, b, a1, a2, a2_1]
+    assert list(root.walk(max_depth=1)) == [a, b]
+    assert list(root.walk(visible_only=True)) == [a, a1, b]
+    assert list(root.walk(types=SpaceNode)) == [b]
+    assert list(root.walk(types=[CustomNode])) == [a1]
+
+    with pytest.raises(ValueError):
+        root.walk(order='random')
+    with pytest.raises(TypeError):
+        root.walk(types=[int])
+
+    # deleted descendants are skipped
+    visited = []
+    for node in root.walk():
+        visited.append(node)
+        node.delete()
+    assert visited == [a, b]
+    assert root.descendants_count() == 0
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_recreate_under():
+    root = Node()
+    old_parent = root.add_child(Node(position=Vector(10, 0)))
+    new_parent = root.add_child(Node(position=Vector(0, 10)))
+    node = old_parent.add_child(Node(position=Vector(1, 1), z_index=2))
+    child = node.add_child(Node(position=Vector(2, 2)))
+
+    assert node.recreate_under(new_parent) is node
+    assert node.parent is new_parent
+    assert node.absolute_position == Vector(11, 1)
+    assert node.position == Vector(11, -9)
+    assert node.z_index == 2
+    assert list(node.children) == [child]
+    assert child.position == Vector(2, 2)
+    assert list(old_parent.children) == []
+
+    node.recreate_under(old_parent, keep_absolute_transform=False)
+    assert node.parent is old_parent
+    assert node.position == Vector(11, -9)
+
+    with pytest.raises(ValueError):
+        node.recreate_under(child)
+
+    child.transitions_manager.set('move', NodePositionTransition(Vector(10, 0), 1.))
+    with pytest.raises(ValueError):
+        node.recreate_under(new_parent)
+    child.transitions_manager.set('move', None)
+    child.add_child(SpaceNode())
+    with pytest.raises(ValueError):
+        node.recreate_under(new_parent)
+    assert node.parent is old_parent
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_batch_update():
+    node = Node(position=Vector(1, 1))
+    batch = NodeBatch([node])
+
+    with node.batch_update() as updated_node:
+        assert updated_node is node
+        node.position = Vector(2, 2)
+        node.position = Vector(3, 3)
+        node.visible = False
+        # batch applies pending writes before reading the values
+        batch.pull(['positions'])
+        assert batch.positions.tolist() == [[3., 3.]]
+        # reading applies pending writes
+        assert node.position == Vector(3, 3)
+        node.transformation = Transformation.translate(Vector(5, 5))
+        node.rotation = 1.
+
+    assert node.position == Vector(5, 5)
+    assert node.rotation == 1.
+    assert node.visible is False
+
+    # values pushed by batch are not overwritten by pending writes
+    with node.batch_update():
+        node.position = Vector(6, 6)
+        node.rotation = 2.
+        batch.pull(['positions'])
+        memoryview(batch.positions)[0, 0] = 7.
+        batch.push(['positions'])
+        node.scale = Vector(2, 2)
+
+    assert node.position == Vector(7, 6)
+    assert node.rotation == 2.
+    assert node.scale == Vector(2, 2)
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_scene_deferred_updates():
+    scene = TestScene(lambda scene, dt: None)
+    node = scene.root.add_child(Node())
+    outside_node = Node()
+    batch = NodeBatch([node, outside_node])
+
+    with scene.deferred_updates():
+        node.position = Vector(1, 1)
+        outside_node.position = Vector(2, 2)
+        batch.pull(['positions'])
+        assert batch.positions.tolist() == [[1., 1.], [2., 2.]]
+        with pytest.raises(RuntimeError):
+            with scene.deferred_updates():
+                pass
+
+    batch.pull(['positions'])
+    assert batch.positions.tolist() == [[1., 1.], [2., 2.]]
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_consume_changes():
+    scene = TestScene(lambda scene, dt: None)
+    first = scene.root.add_child(Node(position=Vector(1, 2)))
+    second = scene.root.add_child(Node())
+
+    changes = scene.consume_changes()
+    assert set(changes) == {first, second}
+    assert all(flags == 0b1111 for flags in changes.changed_fields.tolist())
+    assert len(scene.consume_changes()) == 0
+    # each set of fields is a separate consumer
+    assert set(scene.consume_changes(['transform'])) == {first, second}
+
+    first.position = Vector(3, 4)
+    second.color = Color(1, 0, 0, 1)
+    changes = scene.consume_changes(['transform'])
+    assert list(changes) == [first]
+    assert changes.node_ids.tolist() == [first.handle]
+    assert changes.changed_fields.tolist() == [NodeChanges.TRANSFORM]
+    assert changes.positions.tolist() == [[3., 4.]]
+    assert changes.colors is None
+    assert set(scene.consume_changes()) == {first, second}
+
+    # deferred writes are applied before comparing
+    with scene.deferred_updates():
+        first.position = Vector(5, 6)
+        changes = scene.consume_changes(['transform'])
+        assert list(changes) == [first]
+        assert changes.positions.tolist() == [[5., 6.]]
+    assert list(scene.consume_changes()) == [first]
+
+    second_id = second.handle
+    second.delete()
+    assert list(changes) == [first]
+    for fields in (None, ['transform']):
+        changes = scene.consume_changes(fields)
+        assert len(changes) == 0
+        assert changes.removed_node_ids.tolist() == [second_id]
+
+    # new node may take place of the deleted one, but gets a new id
+    third = scene.root.add_child(Node())
+    first_id = first.handle
+    first.delete()
+    changes = scene.consume_changes()
+    assert list(changes) == [third]
+    assert changes.node_ids.tolist() == [third.handle]
+    assert changes.removed_node_ids.tolist() == [first_id]
+    third.delete()
+    assert list(changes) == [None]
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_data():
+    scene = TestScene(lambda scene, dt: None)
+    scene.declare_node_field('hp', 'float32')
+    scene.declare_node_field('team', 'uint8')
+    with pytest.raises(ValueError):
+        scene.declare_node_field('hp', 'float64')
+    with pytest.raises(ValueError):
+        scene.declare_node_field('name', 'str')
+
+    nodes = scene.root.spawn_children(100)
+    for i, node in enumerate(nodes):
+        node.data['hp'] = i - 10.
+    nodes[0].data['team'] = 3
+
+    assert nodes[15].data['hp'] == 5.
+    assert nodes[0].data['team'] == 3
+    assert nodes[1].data['team'] == 0
+    assert set(nodes[0].data) == {'hp', 'team'}
+    with pytest.raises(KeyError):
+        nodes[0].data['unknown']
+    with pytest.raises(ValueError):
+        Node().data['hp']
+
+    hp = scene.get_node_field('hp').tolist()
+    mask = scene.get_node_field_mask().tolist()
+    dead_rows = [i for i, (alive, value) in enumerate(zip(mask, hp))
+                 if alive and value < 0]
+    assert scene.get_node_field_nodes(dead_rows) == list(nodes)[:10]
+
+    nodes[0].delete()
+    assert scene.get_node_field_nodes(dead_rows)[0] is None
+    new_node = scene.root.add_child(Node())
+    assert new_node.data['team'] == 0
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_handles():
+    scene = TestScene(lambda scene, dt: None)
+    first = scene.root.add_child(Node())
+    second = scene.root.add_child(Node())
+
+    handles = [first.handle, second.handle]
+    assert handles[0] != handles[1]
+    assert first.handle == handles[0]
+    assert scene.resolve(handles[0]) is first
+    assert scene.resolve(0) is None
+
+    first.delete()
+    third = scene.root.add_child(Node())
+    # slot of deleted node is reused, but with a new generation
+    assert third.handle & 0xFFFFFFFF == handles[0] & 0xFFFFFFFF
+    assert third.handle != handles[0]
+    assert scene.resolve(handles[0]) is None
+
+    assert scene.resolve_many(handles) == [None, second]
+    assert scene.resolve_many(array.array('Q', handles)) == [None, second]
+    with pytest.raises(ValueError):
+        Node().handle
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_frozen():
+    scene = TestScene(lambda scene, dt: None)
+    parent = scene.root.add_child(Node())
+    child = parent.add_child(Node(lifetime=5.))
+    frozen_child = child.add_child(Node(lifetime=3.))
+    frozen_child.frozen = True
+
+    parent.frozen = True
+    assert parent.frozen
+    assert not parent.visible
+    assert child.lifetime == 0.
+    assert not child.frozen
+
+    # inner nodes can't change their status once outer one is frozen
+    with pytest.raises(ValueError):
+        child.frozen = True
+    with pytest.raises(ValueError):
+        frozen_child.frozen = False
+    assert not child.frozen
+    assert frozen_child.frozen
+
+    frozen_child.delete()
+    parent.frozen = False
+    assert not parent.frozen
+    assert parent.visible
+    assert child.lifetime == 5.
+
+    child.frozen = True
+    assert child.lifetime == 0.
+    child.frozen = False
+    assert child.lifetime == 5.
+
+    with pytest.raises(ValueError):
+        Node().frozen = True
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_viewports_and_render_passes_masks():
+    scene = TestScene(lambda scene, dt: None)
+    node = scene.root.add_child(Node(viewports={0, 1}, render_passes={0, 2}))
+    child = node.add_child(Node())
+
+    assert node.render_passes_mask == 0b101
+    assert child.render_passes_mask is None
+    assert child.effective_render_passes_mask == 0b101
+    assert child.effective_viewports_mask == node.viewports_mask
+
+    child.viewports_mask = node.viewports_mask << 1
+    assert child.viewports == {1, 2}
+    child.render_passes_mask = 0b10
+    assert child.render_passes == {1}
+    child.render_passes_mask = None
+    assert child.render_passes is None
+
+    batch = node.spawn_children(2, render_passes_mask=0b11)
+    assert all(spawned.render_passes == {0, 1} for spawned in batch)
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_node_position_mutable_vector():
+    node = Node(position=Vector(1., 2.))
+    position = MutableVector()
+    assert node.read_position_into(position) is position
+    assert position == Vector(1., 2.)
+    node.write_position_from(position.iadd(Vector.xy(1.)))
+    assert node.position == Vector(2., 3.)
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_bounding_box_array_from_nodes():
+    box = Polygon.from_box(Vector.xy(2.))
+    nodes = [Node(position=Vector.xy(10.), shape=box), Node(position=Vector.xy(20.), shape=box)]
+    boxes = BoundingBoxArray.from_nodes(nodes)
+    assert boxes.tolist() == [node.bounding_box for node in nodes]
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_spatial_index_query_many():
+    scene = TestScene(lambda scene, dt: None)
+    box = Polygon.from_box(Vector.xy(2.))
+    first = scene.root.add_child(Node(position=Vector.xy(0.), shape=box))
+    second = scene.root.add_child(Node(position=Vector.xy(10.), shape=box))
+    scene.run_on_engine(1)
+
+    results = scene.spatial_index.query_point_many([Vector.xy(0.), Vector.xy(10.), Vector.xy(5.)])
+    assert len(results) == 3
+    assert results.offsets.tolist() == [0, 1, 2, 2]
+    assert results.handles.tolist() == [first.handle, second.handle]
+    assert list(results) == [[first], [second], []]
+
+    boxes = array.array('d', [-1., -1., 11., 11.])
+    results = scene.spatial_index.query_bounding_box_many(memoryview(boxes).cast('B').cast('d', (1, 4)))
+    assert set(results[0]) == {first, second}
+
+    results = scene.spatial_index.query_point_many([Vector.xy(0.), Vector.xy(10.)])
+    handles = results.handles.tolist()
+    first.delete()
+    with pytest.raises(RuntimeError):
+        results[1]
+    with pytest.raises(RuntimeError):
+        list(results)
+    # handles taken before the deletion stay safe to use
+    assert scene.resolve_many(handles) == [None, second]
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_spatial_index_query_filters():
+    scene = TestScene(lambda scene, dt: None)
+    box = Polygon.from_box(Vector.xy(2.))
+    tagged = scene.root.add_child(Node(shape=box, tags=0b01, z_index=1))
+    hidden = scene.root.add_child(Node(shape=box, tags=0b10, visible=False))
+    scene.run_on_engine(1)
+
+    point = Vector.xy(0.)
+    assert set(scene.spatial_index.query_point(point)) == {tagged, hidden}
+    assert scene.spatial_index.query_point(point, predicate_mask=0b01) == [tagged]
+    assert scene.spatial_index.query_point(point, predicate_mask=0b100) == []
+    assert scene.spatial_index.query_point(point, visible_only=True) == [tagged]
+    assert scene.spatial_index.query_point(point, z_index_range=(0, 0)) == [hidden]
+    assert scene.spatial_index.query_point(point, node_types=SpaceNode) == []
+    assert set(scene.spatial_index.query_point(point, node_types=Node)) == {tagged, hidden}
+    assert scene.spatial_index.query_point(point, viewport_mask=1 << 17) == []
+
+    results = scene.spatial_index.query_point_many([point, point], predicate_mask=0b10)
+    assert list(results) == [[hidden], [hidden]]
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_spatial_index_query_nearest_and_radius():
+    scene = TestScene(lambda scene, dt: None)
+    box = Polygon.from_box(Vector.xy(2.))
+    near = scene.root.add_child(Node(position=Vector(10., 0.), shape=box))
+    nearest = scene.root.add_child(Node(position=Vector(0., 0.), shape=box))
+    far = scene.root.add_child(Node(position=Vector(30., 0.), shape=box))
+    very_far = scene.root.add_child(Node(position=Vector(1000., 0.), shape=box))
+    scene.run_on_engine(1)
+
+    point = Vector(0., 0.)
+    assert scene.spatial_index.query_nearest(point, 2) == [nearest, near]
+    assert scene.spatial_index.query_nearest(point, 10) == [nearest, near, far, very_far]
+    assert scene.spatial_index.query_nearest(point, 10, max_distance=20.) == [nearest, near]
+    assert scene.spatial_index.query_nearest(point, 1, predicate_mask=0b1) == []
+    with pytest.raises(ValueError):
+        scene.spatial_index.query_nearest(point, 0)
+
+    assert scene.spatial_index.query_radius(point, 30.) == [nearest, near, far]
+    assert set(scene.spatial_index.query_radius(point, 9., sort=False)) == {nearest, near}
+    assert scene.spatial_index.query_radius(Vector(500., 0.), 10.) == []
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_spatial_index_query_segment():
+    scene = TestScene(lambda scene, dt: None)
+    box = Polygon.from_box(Vector.xy(2.))
+    second = scene.root.add_child(Node(position=Vector(10., 0.), shape=box))
+    first = scene.root.add_child(Node(position=Vector(0., 0.), shape=box))
+    scene.root.add_child(Node(position=Vector(10., 10.), shape=box))
+    scene.run_on_engine(1)
+
+    assert scene.spatial_index.query_segment(Vector(-5., 0.), Vector(20., 0.)) == [first, second]
+    assert scene.spatial_index.query_segment(Vector(20., 0.), Vector(-5., 0.)) == [second, first]
+    assert scene.spatial_index.query_segment(
+        Vector(-5., 0.), Vector(20., 0.), first_hit_only=True,
+    ) == [first]
+    assert scene.spatial_index.query_segment(Vector(-5., 5.), Vector(20., 5.)) == []
+
+
+@pytest.mark.usefixtures('test_engine')
+def test_spatial_index_count_queries():
+    scene = TestScene(lambda scene, dt: None)
+    box = Polygon.from_box(Vector.xy(2.))
+    scene.root.add_child(Node(position=Vector(0., 0.), shape=box, tags=0b1))
+    scene.root.add_child(Node(position=Vector(1., 0.), shape=box))
+    scene.run_on_engine(1)
+
+    area = BoundingBox(-5., -5., 5., 5.)
+    empty_area = BoundingBox(50., 50., 60., 60.)
+    assert scene.spatial_index.count_bounding_box(area) == 2
+    assert scene.spatial_index.count_bounding_box(area, predicate_mask=0b1) == 1
+    assert scene.spatial_index.count_bounding_box(empty_area) == 0
+    assert scene.spatial_index.any_in_bounding_box(area) is True
+    assert scene.spatial_index.any_in_bounding_box(area, predicate_mask=0b10) is False
+    assert scene.spatial_index.any_in_bounding_box(empty_area) is False
+    assert scene.spatial_index.count_point(Vector(0.5, 0.)) == 2
+    assert scene.spatial_index.count_point(Vector(-0.5, 0.)) == 1
+    assert scene.spatial_index.count_point(Vector(50., 0.)) == 0